@@ -0,0 +1,29 @@
+# Benchmarks are run from the directory where manage.py is, e.g.:  python -m benchmarks.bench_sampling
+# They never touch db.sqlite3, every run works on a throwaway test database.
+
+import atexit
+import os
+import tempfile
+import time
+
+
+def setup_django(on_disk=False):            # on_disk: benchmarks that write from several threads need a database file, SQLite's shared memory database locks whole tables
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mathchallenger.settings')
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    if on_disk and connection.vendor == 'sqlite':
+        directory = tempfile.TemporaryDirectory()
+        atexit.register(directory.cleanup)
+        connection.settings_dict['TEST']['NAME'] = os.path.join(directory.name, 'benchmark.sqlite3')
+    connection.creation.create_test_db(verbosity=0)
+
+
+def timeit(func, repeat=200):           # returns the mean time of one call in microseconds
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
@@ -0,0 +1,48 @@
+# Compares a quiz round trip (open a quiz, submit the answers) through the HTML page and the JSON API:
+# server time and bytes sent per request.
+# Usage:  python -m benchmarks.bench_api
+
+import json
+from benchmarks import setup_django, timeit
+
+
+def main():
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from django.urls import reverse
+    from quiz.models import Profile, QuesModel
+
+    QuesModel.objects.bulk_create([
+        QuesModel(question='What is %d + 1?' % i, op1=str(i), op2=str(i + 1), op3=str(i + 2), op4=str(i + 3),
+                  ans=str(i + 1), difficulty='beginner')
+        for i in range(1000)
+    ])
+    user = User.objects.create(username='student')
+    Profile.objects.create(user=user, user_type='student')
+    client = Client()
+    client.force_login(user)
+    url, api_url = reverse('play-quiz') + '?skill=beginner', reverse('api-quiz') + '?skill=beginner'
+
+    def html_round_trip():
+        page = client.get(url)
+        answers = {'attempt': page.context['attempt'].id}
+        answers.update({'q%d' % q.id: q.ans for q in page.context['questions']})
+        result = client.post(url, data=answers)
+        return len(page.content), len(result.content)
+
+    def api_round_trip():
+        quiz = client.get(api_url)
+        data = json.loads(quiz.content)
+        answers = {str(q['id']): 1 for q in data['questions']}
+        result = client.post(reverse('api-quiz'), data=json.dumps({'attempt': data['attempt'], 'answers': answers}), content_type='application/json')
+        return len(quiz.content), len(result.content)
+
+    print('%6s %22s %22s %22s' % ('', 'round trip (us)', 'quiz (bytes)', 'result (bytes)'))
+    for name, round_trip in [('html', html_round_trip), ('api', api_round_trip)]:
+        quiz_bytes, result_bytes = round_trip()
+        print('%6s %22.0f %22d %22d' % (name, timeit(round_trip, repeat=200), quiz_bytes, result_bytes))
+
+
+if __name__ == '__main__':
+    main()
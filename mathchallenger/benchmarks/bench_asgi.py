@@ -0,0 +1,79 @@
+# Compares requests per second of the quiz views served through the WSGI and the ASGI handler,
+# with a class of concurrent students that each open a quiz and the leaderboard.
+# Usage:  python -m benchmarks.bench_asgi [students] [WSGI worker threads]
+
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks import setup_django
+
+setup_django(on_disk=True)
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client, AsyncClient
+from django.urls import reverse
+from quiz.models import Profile, QuesModel, Leaderboard
+
+
+def seed(students):
+    QuesModel.objects.bulk_create([
+        QuesModel(question='What is %d + 1?' % i, op1=str(i), op2=str(i + 1), op3=str(i + 2), op4=str(i + 3),
+                  ans=str(i + 1), difficulty='beginner')
+        for i in range(2000)
+    ])
+    users = User.objects.bulk_create([User(username='student%d' % i) for i in range(students)])
+    Profile.objects.bulk_create([Profile(user=user, user_type='student') for user in users])
+    Leaderboard.objects.bulk_create([Leaderboard(user=user, score=(i * 7) % 200, difficulty='beginner') for i, user in enumerate(users)])
+    return users
+
+
+URLS = [reverse('play-quiz') + '?skill=beginner', reverse('leaderboard'), reverse('leaderboard') + '?difficulty=beginner']
+
+
+def run_wsgi(users, workers):
+    clients = []
+    for user in users:
+        client = Client()
+        client.force_login(user)
+        clients.append(client)
+
+    def student(client):
+        for url in URLS:
+            assert client.get(url).status_code == 200
+        connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:        # like a threaded WSGI server, at most `workers` requests run at once
+        list(pool.map(student, clients))
+    return len(users) * len(URLS) / (time.perf_counter() - start)
+
+
+async def run_asgi(users):
+    clients = []
+    for user in users:
+        client = AsyncClient()
+        await client.aforce_login(user)
+        clients.append(client)
+
+    async def student(client):
+        for url in URLS:
+            assert (await client.get(url)).status_code == 200
+
+    start = time.perf_counter()
+    await asyncio.gather(*[student(client) for client in clients])        # every student is in flight at the same time
+    return len(users) * len(URLS) / (time.perf_counter() - start)
+
+
+def main():
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    users = seed(students)
+    print('%d concurrent students, %d requests each' % (students, len(URLS)))
+    print('WSGI (%d threads): %8.1f requests/s' % (workers, run_wsgi(users, workers)))
+    print('ASGI:              %8.1f requests/s' % asyncio.run(run_asgi(users)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# Compares the write throughput of the database profiles: concurrent students submit quizzes directly
+# (without the write-behind buffer). With the SQLite profile, SQLite's default settings (rollback journal,
+# synchronous=FULL) are compared with the pragmas of settings.SQLITE_PRAGMAS. For PostgreSQL, run it with
+# MATHCHALLENGER_DB=postgres (the benchmark creates and drops a test database).
+# Usage:  python -m benchmarks.bench_databases [students] [submissions per student]
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks import setup_django
+
+setup_django(on_disk=True)
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, connections, OperationalError
+from quiz.models import Leaderboard
+from quiz.scoring import record_submission
+
+SQLITE_DEFAULTS = {'journal_mode': 'delete', 'synchronous': 'full', 'cache_size': -2000, 'temp_store': 'default'}
+
+
+def run(users, submissions):
+    errors = []
+
+    def student(user):
+        for i in range(submissions):
+            try:
+                record_submission(user, 'beginner', (i * 10) % 110, (i * 10) % 110)
+            except OperationalError:
+                errors.append(user)
+        connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(users)) as pool:
+        list(pool.map(student, users))
+    return time.perf_counter() - start, len(errors)
+
+
+def main():
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    submissions = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    users = User.objects.bulk_create([User(username='student%d' % i) for i in range(students)])
+
+    if connection.vendor == 'sqlite':
+        profiles = [('sqlite defaults', SQLITE_DEFAULTS), ('sqlite tuned', settings.SQLITE_PRAGMAS)]
+    else:
+        profiles = [(connection.vendor, None)]
+
+    print('%16s %18s %18s %18s' % ('profile', 'submissions/s', 'locked errors', 'rows written'))
+    for name, pragmas in profiles:
+        if pragmas is not None:
+            settings.SQLITE_PRAGMAS = pragmas
+            connections.close_all()                 # new connections get the pragmas of this profile
+        Leaderboard.objects.all().delete()
+        seconds, errors = run(users, submissions)
+        print('%16s %18.0f %18d %18d' % (name, students * submissions / seconds, errors, Leaderboard.objects.count()))
+
+
+if __name__ == '__main__':
+    main()
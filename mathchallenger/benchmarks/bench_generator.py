@@ -0,0 +1,18 @@
+# Measures how long generating a batch of questions and grading it from the seed takes.
+# Usage:  python -m benchmarks.bench_generator
+
+from benchmarks import timeit
+from quiz.generator import generate_questions, answer_key
+
+
+def main():
+    print('%18s %10s %22s %22s' % ('difficulty', 'batch', 'generate (us/question)', 'grade (us/question)'))
+    for difficulty in ['beginner', 'medium', 'advanced', 'human_calculator']:
+        for count in [20, 1000, 10000]:
+            generate = timeit(lambda: generate_questions(difficulty, 12345, count), repeat=20)
+            grade = timeit(lambda: answer_key(difficulty, 12345, count), repeat=20)
+            print('%18s %10d %22.2f %22.2f' % (difficulty, count, generate / count, grade / count))
+
+
+if __name__ == '__main__':
+    main()
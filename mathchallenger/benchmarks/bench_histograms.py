@@ -0,0 +1,37 @@
+# Compares the percentile and rank of a score from the score histogram with counting the Leaderboard rows of the difficulty.
+# Usage:  python -m benchmarks.bench_histograms
+
+import random
+from benchmarks import setup_django, timeit
+
+
+def main():
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.db.models import Count, Q
+    from quiz.models import Leaderboard
+    from quiz.histograms import add_scores, score_position
+
+    users = User.objects.bulk_create([User(username='player%d' % i) for i in range(1000)])
+
+    print('%10s %22s %22s' % ('scores', 'histogram (us)', 'COUNT(*) (us)'))
+    total = 0
+    for scores in [10000, 100000, 1000000]:
+        for start in range(total, scores, 50000):
+            batch = [(random.choice(users), random.randrange(0, 11) * 10) for _ in range(start, min(start + 50000, scores))]
+            Leaderboard.objects.bulk_create([Leaderboard(user=user, score=score, difficulty='beginner') for user, score in batch], batch_size=5000)
+            add_scores([('beginner', score) for user, score in batch])
+        total = scores
+
+        histogram = timeit(lambda: score_position('beginner', random.randrange(0, 11) * 10), repeat=500)
+
+        def count():                            # what play_quiz would need without the histogram
+            score = random.randrange(0, 11) * 10
+            return Leaderboard.objects.filter(difficulty='beginner').aggregate(
+                lower=Count('id', filter=Q(score__lt=score)), higher=Count('id', filter=Q(score__gt=score)), total=Count('id'))
+        counting = timeit(count, repeat=10)
+        print('%10d %22.2f %22.2f' % (scores, histogram, counting))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+# Imports a generated JSON Lines file with the import_questions command and prints its rows per second.
+# Usage:  python -m benchmarks.bench_import [number of questions] [batch size]
+
+import json
+import os
+import sys
+import tempfile
+from benchmarks import setup_django
+
+setup_django()
+
+from django.core.management import call_command
+
+
+def write_questions(path, count):
+    difficulties = ['beginner', 'medium', 'advanced', 'human_calculator']
+    with open(path, 'w') as file:
+        for i in range(count):
+            file.write(json.dumps({'question': 'What is %d * 7?' % i, 'op1': str(i * 7), 'op2': str(i * 7 + 1),
+                                   'op3': str(i * 7 - 1), 'op4': str(i * 6), 'ans': str(i * 7),
+                                   'difficulty': difficulties[i % 4]}) + '\n')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    batch_size = sys.argv[2] if len(sys.argv) > 2 else '5000'
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'questions.jsonl')
+        write_questions(path, count)
+        print('first import:')
+        call_command('import_questions', path, '--batch-size', batch_size)
+        print('second import (everything is a duplicate):')
+        call_command('import_questions', path, '--batch-size', batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+# Measures the time the metrics middleware adds to a request (the goal is well below 50us).
+# Usage:  python -m benchmarks.bench_metrics
+
+from benchmarks import setup_django, timeit
+
+setup_django()
+
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import resolve
+from quiz.metrics import MetricsMiddleware, collect, render_prometheus
+
+
+def main():
+    request = RequestFactory().get('/leaderboard/')
+    request.resolver_match = resolve('/leaderboard/')
+    response = HttpResponse(b'x' * 5000)
+    view = lambda request: response
+    middleware = MetricsMiddleware(view)
+
+    plain = timeit(lambda: view(request), repeat=100000)
+    measured = timeit(lambda: middleware(request), repeat=100000)
+    print('middleware overhead per request: %.2f us' % (measured - plain))
+    print('rendering /metrics:              %.2f us' % timeit(lambda: render_prometheus(collect()), repeat=1000))
+
+
+if __name__ == '__main__':
+    main()
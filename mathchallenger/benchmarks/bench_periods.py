@@ -0,0 +1,45 @@
+# Compares this week's top 10 from the PeriodScore table with grouping the timestamped scores of the Leaderboard table,
+# as the history grows (1,000 players, 2,000 scores per day).
+# Usage:  python -m benchmarks.bench_periods
+
+import random
+from datetime import datetime, time, timedelta
+from benchmarks import setup_django, timeit
+
+
+def main():
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.db.models import Max
+    from django.utils import timezone
+    from quiz.models import Leaderboard, PeriodScore
+    from quiz.periods import period_starts, add_period_scores, compact
+
+    users = User.objects.bulk_create([User(username='player%d' % i) for i in range(1000)])
+    now = timezone.now()
+    week = period_starts()['week']
+    since = timezone.make_aware(datetime.combine(week, time.min))
+
+    print('%10s %14s %26s %26s' % ('days', 'scores', 'PeriodScore top 10 (ms)', 'Leaderboard GROUP BY (ms)'))
+    days = 0
+    for history in [7, 90, 365]:
+        for day in range(days, history):
+            moment = now - timedelta(days=day)
+            scores = [(random.choice(users).id, 'beginner', random.randrange(0, 11) * 10, moment) for _ in range(2000)]
+            Leaderboard.objects.bulk_create([Leaderboard(user_id=user_id, difficulty=difficulty, score=score, created_at=created_at)
+                                             for user_id, difficulty, score, created_at in scores], batch_size=5000)
+            add_period_scores(scores)
+        compact()                               # what the daily job keeps: the rows of this day and week
+        days = history
+
+        def rollup():
+            return list(PeriodScore.objects.filter(period='week', start=week, difficulty='beginner').order_by('-best', '-id')[:10])
+
+        def group_by():                         # without the rollup: every score of the week, grouped per player
+            return list(Leaderboard.objects.filter(difficulty='beginner', created_at__gte=since).values('user_id')
+                        .annotate(best=Max('score')).order_by('-best', 'user_id')[:10])
+        print('%10d %14d %26.3f %26.3f' % (history, Leaderboard.objects.count(), timeit(rollup, 200) / 1000, timeit(group_by, 20) / 1000))
+
+
+if __name__ == '__main__':
+    main()
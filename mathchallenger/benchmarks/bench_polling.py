@@ -0,0 +1,37 @@
+# Measures how many polls of the leaderboard and participants pages per second a process answers:
+# rendering every poll, serving the cached page, and answering a conditional request with 304 Not Modified.
+# Usage:  python -m benchmarks.bench_polling
+
+from benchmarks import setup_django, timeit
+
+
+def main():
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+    from django.test import Client
+    from django.urls import reverse
+    from quiz.models import Leaderboard, Statistic
+
+    users = User.objects.bulk_create([User(username='student%d' % i) for i in range(2000)])
+    Leaderboard.objects.bulk_create([Leaderboard(user=user, score=(i * 7) % 200, difficulty='beginner') for i, user in enumerate(users)])
+    Statistic.objects.bulk_create([Statistic(user=user, score_sum=(i * 13) % 100, entries=1, difficulty='beginner') for i, user in enumerate(users)])
+    client = Client()
+
+    print('%14s %20s %20s %20s %14s %14s' % ('page', 'rendered (polls/s)', 'cached (polls/s)', '304 (polls/s)', '200 (bytes)', '304 (bytes)'))
+    for name in ['leaderboard', 'participants']:
+        url = reverse(name)
+        etag = client.get(url)['ETag']
+
+        def rendered():
+            cache.clear()
+            client.get(url)
+
+        not_modified = timeit(lambda: client.get(url, HTTP_IF_NONE_MATCH=etag), repeat=2000)
+        cached = timeit(lambda: client.get(url), repeat=2000)
+        sizes = len(client.get(url).content), len(client.get(url, HTTP_IF_NONE_MATCH=etag).content)
+        print('%14s %20.0f %20.0f %20.0f %14d %14d' % (name, 1e6 / timeit(rendered, repeat=100), 1e6 / cached, 1e6 / not_modified, sizes[0], sizes[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+# Compares the rank lookup of the ranking backend with counting the better players in the database.
+# Usage:  python -m benchmarks.bench_ranking
+
+import random
+from benchmarks import setup_django, timeit
+
+
+def main():
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.db.models import Max
+    from quiz.models import Leaderboard
+    from quiz.ranking import MemoryRanking
+
+    print('%10s %22s %22s %22s' % ('players', 'add (us)', 'rank lookup (us)', 'SQL rank (us)'))
+    total = 0
+    for players in [1000, 10000, 100000]:
+        users = User.objects.bulk_create([User(username='player%d' % i) for i in range(total, players)])
+        Leaderboard.objects.bulk_create([Leaderboard(user=user, score=random.randrange(0, 1000) * 10, difficulty='beginner') for user in users], batch_size=5000)
+        total = players
+
+        ranking = MemoryRanking()
+        ranking.rebuild(Leaderboard.objects.values('difficulty', 'user_id').annotate(best=Max('score')).values_list('difficulty', 'user_id', 'best'))
+        user_ids = list(Leaderboard.objects.values_list('user_id', flat=True)[:1000])
+        add = timeit(lambda: ranking.add('beginner', random.choice(user_ids), random.randrange(0, 10000)), repeat=2000)
+        lookup = timeit(lambda: ranking.rank('beginner', random.choice(user_ids)), repeat=2000)
+
+        def sql_rank():             # what the rank costs without the backend: count the players with a better best score
+            user_id = random.choice(user_ids)
+            best = Leaderboard.objects.filter(user_id=user_id, difficulty='beginner').aggregate(best=Max('score'))['best']
+            return (Leaderboard.objects.filter(difficulty='beginner').values('user_id')
+                    .annotate(best=Max('score')).filter(best__gt=best).count() + 1)
+        sql = timeit(sql_rank, repeat=20)
+        print('%10d %22.2f %22.2f %22.2f' % (players, add, lookup, sql))
+
+
+if __name__ == '__main__':
+    main()
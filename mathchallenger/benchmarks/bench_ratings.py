@@ -0,0 +1,45 @@
+# Measures drawing an adaptive quiz through the rating index and rating a submitted quiz as the question bank grows.
+# Usage:  python -m benchmarks.bench_ratings
+
+import random
+from asgiref.sync import async_to_sync
+from benchmarks import setup_django, timeit
+
+
+def main():
+    setup_django()
+    from django.contrib.auth.models import User
+    from quiz.models import Profile, QuesModel
+    from quiz.ratings import START_RATINGS, apply_ratings, initial_rating
+    from quiz.sampling import asample_adaptive_ids
+
+    user = User.objects.create(username='student')
+    Profile.objects.create(user=user, user_type='student')
+    difficulties = list(START_RATINGS)
+
+    print('%10s %22s %22s %22s' % ('questions', 'adaptive draw (us)', 'band scan (us)', 'rate a quiz (us)'))
+    total = 0
+    for questions in [10000, 100000, 1000000]:
+        for start in range(total, questions, 50000):
+            QuesModel.objects.bulk_create([
+                QuesModel(question='q%d' % i, op1='1', op2='2', op3='3', op4='4', ans='1', difficulty=difficulties[i % 4],
+                          rating=initial_rating(difficulties[i % 4]))          # like new questions: every difficulty within one point of its start rating
+                for i in range(start, min(start + 50000, questions))
+            ], batch_size=5000)
+        total = questions
+
+        draw = timeit(lambda: async_to_sync(asample_adaptive_ids)(random.choice(list(START_RATINGS.values())), 10), repeat=200)
+
+        def band_scan():            # what the draw costs without the index seeks: every question in the band, then a sample
+            rating = random.choice(list(START_RATINGS.values()))
+            ids = list(QuesModel.objects.filter(rating__range=(rating - 50, rating + 50)).values_list('id', flat=True))
+            return random.sample(ids, min(10, len(ids)))
+        scan = timeit(band_scan, repeat=10)
+
+        ids = list(QuesModel.objects.values_list('id', flat=True)[:1000])
+        rate = timeit(lambda: apply_ratings([(user.id, 'adaptive', [(pk, random.random() < 0.5) for pk in random.sample(ids, 10)])]), repeat=200)
+        print('%10d %22.2f %22.2f %22.2f' % (questions, draw, scan, rate))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# Measures the time a role check adds to a request: @require_role with the role kept in the session, the former
+# request.user.profile lookup, and the rejection of an anonymous request. The session and the user are loaded
+# for every variant, so the difference to "no check" is the check alone.
+# Usage:  python -m benchmarks.bench_roles
+
+from benchmarks import setup_django, timeit
+
+setup_django()
+
+from django.conf import settings
+from django.contrib.auth import login
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from quiz.models import Profile
+from quiz.roles import require_role, RoleMiddleware
+
+ENGINES = ['django.contrib.sessions.backends.db', 'django.contrib.sessions.backends.cached_db']
+
+
+def view(request):
+    return HttpResponse(b'ok')
+
+
+def profile_view(request):
+    if request.user.profile.user_type != 'teacher':
+        return HttpResponse(status=302)
+    return view(request)
+
+
+def count_queries(func):
+    queries = []
+
+    def count(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+    with connection.execute_wrapper(count):
+        func()
+    return len(queries)
+
+
+def main():
+    factory = RequestFactory()
+    teacher = User.objects.create_user(username='teacher', password='password123')
+    Profile.objects.create(user=teacher, user_type='teacher')
+    checked = require_role('teacher')(view)
+    variants = [
+        ('no check', view),
+        ('require_role', checked),
+        ('require_role + middleware', lambda request: RoleMiddleware(checked).process_view(request, checked, (), {}) or checked(request)),
+        ('request.user.profile', profile_view),
+    ]
+
+    print('%12s %28s %14s %10s' % ('sessions', 'check', 'us/request', 'queries'))
+    for engine in ENGINES:
+        settings.SESSION_ENGINE = engine
+        request = factory.get('/')
+        SessionMiddleware(view).process_request(request)
+        login(request, teacher)                                     # stores the role in the session
+        request.session.save()
+        session_key = request.session.session_key
+
+        def handle(check, session_key=session_key):
+            request = factory.get('/', HTTP_COOKIE='%s=%s' % (settings.SESSION_COOKIE_NAME, session_key or ''))
+            SessionMiddleware(view).process_request(request)
+            AuthenticationMiddleware(view).process_request(request)
+            request.user.is_authenticated                           # every variant loads the session and the user
+            return check(request)
+
+        for label, check in variants:
+            print('%12s %28s %14.1f %10d' % (engine.rsplit('.', 1)[1], label, timeit(lambda: handle(check), repeat=5000), count_queries(lambda: handle(check))))
+        print('%12s %28s %14.1f %10d' % (engine.rsplit('.', 1)[1], 'anonymous, rejected', timeit(lambda: handle(checked, None), repeat=5000),
+                                         count_queries(lambda: handle(checked, None))))
+
+
+if __name__ == '__main__':
+    main()
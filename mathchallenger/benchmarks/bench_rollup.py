@@ -0,0 +1,49 @@
+# Compares the teachers' hardest-questions query on the rolled up counters with aggregating the answer log,
+# and measures how long rolling up the answers of 1,000 quizzes takes as the log grows.
+# Usage:  python -m benchmarks.bench_rollup
+
+import random
+import time
+from benchmarks import setup_django, timeit
+
+
+def main():
+    setup_django()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.db.models import Avg, Count, FloatField
+    from django.db.models.functions import Cast
+    from quiz.models import AnswerEvent, QuesModel
+    from quiz.analytics import rollup_question_stats, hardest_questions
+    settings.ROLLUP_DELAY = 0
+
+    user = User.objects.create(username='student')
+    QuesModel.objects.bulk_create([QuesModel(question='q%d' % i, op1='1', op2='2', op3='3', op4='4', ans='1') for i in range(10000)], batch_size=5000)
+    question_ids = list(QuesModel.objects.values_list('id', flat=True))
+
+    def log(count):
+        AnswerEvent.objects.bulk_create([AnswerEvent(user=user, question_id=random.choice(question_ids), correct=random.random() < 0.6,
+                                                     seconds=random.uniform(2, 20)) for _ in range(count)], batch_size=5000)
+
+    print('%12s %24s %24s %24s' % ('answers', 'rollup of 10,000 (ms)', 'counters query (ms)', 'raw log query (ms)'))
+    total = 0
+    for answers in [100000, 1000000, 3000000]:
+        log(answers - total - 10000)
+        rollup_question_stats()
+        log(10000)                              # the answers of 1,000 quizzes since the last run
+        total = answers
+        start = time.perf_counter()
+        rollup_question_stats()
+        rollup = (time.perf_counter() - start) * 1000
+
+        counters = timeit(lambda: hardest_questions(None, 10), repeat=50) / 1000
+
+        def raw_log():                          # what the page would cost without the rollup
+            return list(AnswerEvent.objects.values('question_id').annotate(attempts=Count('id'), rate=Avg(Cast('correct', FloatField())))
+                        .filter(attempts__gte=settings.QUESTION_STATS_MIN_ATTEMPTS).order_by('rate')[:10])
+        raw = timeit(raw_log, repeat=3) / 1000
+        print('%12d %24.2f %24.2f %24.2f' % (answers, rollup, counters, raw))
+
+
+if __name__ == '__main__':
+    main()
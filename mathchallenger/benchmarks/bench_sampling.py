@@ -0,0 +1,45 @@
+# Compares drawing a quiz with the cached id index against loading and shuffling the whole pool.
+# Usage:  python -m benchmarks.bench_sampling [max pool size]
+
+import random
+import sys
+from benchmarks import setup_django, timeit
+
+setup_django()
+
+from quiz.models import QuesModel
+from quiz.sampling import question_ids, sample_questions
+
+
+def fill_pool(size):
+    missing = size - QuesModel.objects.filter(difficulty='beginner').count()
+    batch = []
+    for i in range(missing):
+        batch.append(QuesModel(question='q%d' % i, op1='1', op2='2', op3='3', op4='4', ans='2', difficulty='beginner'))
+        if len(batch) == 10000:
+            QuesModel.objects.bulk_create(batch)
+            batch = []
+    QuesModel.objects.bulk_create(batch)
+    question_ids('beginner')                    # warm the id index, like the first quiz after a change does
+
+
+def full_pool_shuffle():
+    questions = list(QuesModel.objects.filter(difficulty='beginner'))
+    random.shuffle(questions)
+    return questions[:10]
+
+
+def main():
+    max_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print('%10s %18s %18s' % ('pool size', 'sampled (us)', 'full shuffle (us)'))
+    size = 100
+    while size <= max_size:
+        fill_pool(size)
+        sampled = timeit(lambda: sample_questions('beginner', 10))
+        full = timeit(full_pool_shuffle, repeat=max(1, 20000 // size)) if size <= 100000 else float('nan')
+        print('%10d %18.1f %18.1f' % (size, sampled, full))
+        size *= 10
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# Measures the teachers' question search (FTS5 on SQLite) against an icontains scan as the bank grows to
+# 1,000,000 questions, for a rare, a medium and a very common word.
+# Usage:  python -m benchmarks.bench_search [max bank size]
+
+import random
+import sys
+from benchmarks import setup_django, timeit
+
+setup_django()
+
+from quiz.models import QuesModel
+from quiz.search import search_questions
+
+TOPICS = ['triangle', 'prime', 'fraction', 'circle', 'percent', 'square', 'angle', 'volume', 'median', 'decimal',
+          'factor', 'multiple', 'integer', 'perimeter', 'equation', 'ratio', 'cube', 'digit', 'radius', 'sum']
+DIFFICULTIES = ['beginner', 'medium', 'advanced', 'human_calculator']
+QUERIES = [('rare', '4711'), ('medium', 'prime'), ('common', 'what')]
+
+
+def fill_bank(size):
+    rng = random.Random(size)
+    missing = size - QuesModel.objects.count()
+    batch = []
+    for i in range(missing):
+        a, b = rng.randrange(10000), rng.randrange(100)
+        batch.append(QuesModel(question='What is the %s of %d and %d?' % (rng.choice(TOPICS), a, b),
+                               op1=str(a + b), op2=str(a - b), op3=str(a * b), op4=str(a + 1), ans=str(a + b),
+                               difficulty=DIFFICULTIES[i % 4]))
+        if len(batch) == 10000:
+            QuesModel.objects.bulk_create(batch)
+            batch = []
+    QuesModel.objects.bulk_create(batch)
+
+
+def icontains(word):
+    return list(QuesModel.objects.filter(question__icontains=word).order_by('id')[:21])
+
+
+def main():
+    max_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print('%10s %8s %18s %22s %18s' % ('bank size', 'word', 'search (ms)', 'search medium (ms)', 'icontains (ms)'))
+    size = 10000
+    while size <= max_size:
+        fill_bank(size)
+        for name, word in QUERIES:
+            search = timeit(lambda: search_questions(word), repeat=20) / 1000
+            filtered = timeit(lambda: search_questions(word, 'medium'), repeat=20) / 1000
+            scan = timeit(lambda: icontains(word), repeat=5) / 1000
+            print('%10d %8s %18.2f %22.2f %18.2f' % (size, name, search, filtered, scan))
+        size *= 10
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+# Measures the static files after collectstatic: the bytes sent for each encoding, and the requests per second of
+# StaticFilesApplication (precompressed file, 304 for a revalidation) compared with Django's static serve view.
+# Usage:  python -m benchmarks.bench_static
+
+import tempfile
+from benchmarks import setup_django, timeit
+
+
+def main():
+    setup_django()
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.test import RequestFactory
+    from django.views.static import serve
+    from quiz.staticfiles import StaticFilesApplication, brotli
+
+    root = tempfile.TemporaryDirectory()
+    settings.STATIC_ROOT = root.name
+    call_command('collectstatic', interactive=False, verbosity=0)
+    from django.contrib.staticfiles.storage import staticfiles_storage
+
+    def django_app(environ, start_response):
+        start_response('404 Not Found', [])
+        return [b'']
+    app = StaticFilesApplication(django_app, root=root.name, prefix='/static/')
+    factory = RequestFactory()
+
+    def request(path, **environ):
+        body = app({'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'wsgi.file_wrapper': None, **environ}, lambda status, headers: None)
+        return sum(len(chunk) for chunk in body)
+
+    print('%28s %12s %12s %12s %16s %16s %16s' % ('file', 'raw (bytes)', 'gzip', 'br', 'served (req/s)', '304 (req/s)', 'serve view'))
+    for name in ['quiz/css/bootstrap.min.css', 'quiz/js/timer.js']:
+        path = '/static/' + staticfiles_storage.stored_name(name)
+        static_file = app.files[path]
+        sizes = {encoding: size for encoding, _, size, _ in static_file.variants}
+        served = timeit(lambda: request(path, HTTP_ACCEPT_ENCODING='gzip, br'), repeat=2000)
+        not_modified = timeit(lambda: request(path, HTTP_IF_NONE_MATCH=static_file.etag), repeat=2000)
+        view = timeit(lambda: b''.join(serve(factory.get(path), staticfiles_storage.stored_name(name), document_root=root.name)), repeat=2000)
+        print('%28s %12d %12s %12s %16.0f %16.0f %16.0f' % (name, static_file.size, sizes.get('gzip', '-'), sizes.get('br', '-') if brotli else 'no brotli',
+                                                         1e6 / served, 1e6 / not_modified, 1e6 / view))
+    root.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# Compares quiz submissions per second written directly and through the write-behind buffer, for a class of
+# students that submit at the same time, and counts the "database is locked" errors of both.
+# Usage:  python -m benchmarks.bench_writebehind [students] [submissions per student]
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks import setup_django
+
+setup_django(on_disk=True)
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, OperationalError
+from quiz import writebehind
+from quiz.models import Leaderboard
+from quiz.scoring import record_submission
+
+
+def run(users, submissions):
+    errors = []
+
+    def student(user):
+        for i in range(submissions):
+            try:
+                record_submission(user, 'beginner', (i * 10) % 110, (i * 10) % 110)
+            except OperationalError:
+                errors.append(user)
+        connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(users)) as pool:
+        list(pool.map(student, users))
+    return time.perf_counter() - start, len(errors)
+
+
+def main():
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    submissions = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    users = User.objects.bulk_create([User(username='student%d' % i) for i in range(students)])
+    total = students * submissions
+
+    print('%10s %18s %18s %18s' % ('mode', 'submissions/s', 'locked errors', 'rows written'))
+    seconds, errors = run(users, submissions)
+    print('%10s %18.0f %18d %18d' % ('direct', total / seconds, errors, Leaderboard.objects.count()))
+
+    Leaderboard.objects.all().delete()
+    settings.SUBMISSION_BUFFER = True
+    seconds, errors = run(users, submissions)
+    writebehind.get_buffer().stop()                 # what a shutdown does: the rest of the queue is written
+    print('%10s %18.0f %18d %18d' % ('buffered', total / seconds, errors, Leaderboard.objects.count()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+# Simulates a classroom rush: teachers and students going through the pages of quiz/urls.py at the same time.
+# Runs in-process against a throwaway test database (the default) or over HTTP against a running server:
+#
+#   python -m benchmarks.loadtest --students 200 --concurrency 20
+#   python -m benchmarks.loadtest --target http://127.0.0.1:8000 --students 50
+#
+# For every URL name it reports p50/p95/p99 latency, throughput and (in-process only) the SQL queries per request.
+# --save-baseline stores the result as JSON, --baseline compares against a stored result and exits with 1 on a regression.
+
+import argparse
+import html
+import http.cookiejar
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+PASSWORD = 'Load-Test-9731x'
+URLS = {}                           # URL name -> path, filled from quiz/urls.py by load_urls()
+DIFFICULTIES = ['beginner', 'medium', 'advanced', 'human_calculator']
+ATTEMPT_RE = re.compile(r'name="attempt" value="(\d+)"')
+OPTION_RE = re.compile(r'type="radio" name="(q\d+)" id="[^"]*" value="([^"]*)"')
+
+
+def load_urls():                    # every named page of quiz/urls.py, so a renamed or moved page fails the run instead of measuring 404s
+    from django.urls import reverse
+    from quiz.urls import urlpatterns
+    URLS.update((pattern.name, reverse(pattern.name)) for pattern in urlpatterns)
+
+
+class UnknownURL(Exception):
+    pass
+
+
+def path_of(name):
+    if name not in URLS:
+        raise UnknownURL('%r is not a URL name of quiz/urls.py (known: %s)' % (name, ', '.join(sorted(URLS))))
+    return URLS[name]
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}                  # URL name -> list of (seconds, queries or None, ok)
+
+    def add(self, name, seconds, queries, ok):
+        with self.lock:
+            self.requests.setdefault(name, []).append((seconds, queries, ok))
+
+
+class InProcessSession:             # a django test Client, which calls the WSGI handler directly
+    def __init__(self, results):
+        from django.test import Client
+        self.client = Client(raise_request_exception=False)           # server errors are counted like over HTTP
+        self.results = results
+
+    def request(self, name, method, query='', data=None, body=None):          # body: posted as JSON instead of a form
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        path = path_of(name) + query
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            if method == 'GET':
+                response = self.client.get(path)
+            elif body is not None:
+                response = self.client.post(path, json.dumps(body), content_type='application/json')
+            else:
+                response = self.client.post(path, data or {})
+            seconds = time.perf_counter() - start
+        ok = response.status_code < 400
+        self.results.add(name, seconds, len(queries), ok)
+        return response.status_code, response.content.decode() if ok else ''
+
+    def close(self):
+        from django.db import connection
+        connection.close()
+
+
+class HttpSession:                  # a browser-like session over HTTP, with cookies and CSRF tokens
+    def __init__(self, results, target):
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+        self.results = results
+        self.target = target.rstrip('/')
+
+    def request(self, name, method, query='', data=None, body=None):
+        url = self.target + path_of(name) + query
+        headers = {'Referer': url}
+        if method == 'POST' and body is not None:
+            headers.update({'Content-Type': 'application/json', 'X-CSRFToken': self.csrf_token()})      # like the mobile clients of the API
+            body = json.dumps(body).encode()
+        elif method == 'POST':
+            data = dict(data or {})
+            data['csrfmiddlewaretoken'] = self.csrf_token()
+            body = urllib.parse.urlencode(data).encode()
+        start = time.perf_counter()
+        try:
+            with self.opener.open(urllib.request.Request(url, data=body, headers=headers)) as response:
+                status, text = response.status, response.read().decode()
+        except urllib.error.HTTPError as error:
+            status, text = error.code, ''
+        seconds = time.perf_counter() - start
+        self.results.add(name, seconds, None, status < 400)
+        return status, text
+
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        self.request('login-page', 'GET')           # any page with a form sets the cookie
+        return self.csrf_token()
+
+    def close(self):
+        pass
+
+
+def student_flow(session, username, rng):
+    session.request('landing-page', 'GET')
+    session.request('register-page', 'GET')
+    session.request('register-page', 'POST', data={'username': username, 'password1': PASSWORD,
+                                                   'password2': PASSWORD, 'user_type': 'student'})
+    session.request('logout-page', 'POST')
+    session.request('login-page', 'GET')
+    session.request('login-page', 'POST', data={'username': username, 'password': PASSWORD})
+    session.request('skills-page', 'GET')
+    difficulty = rng.choice(DIFFICULTIES)
+    status, page = session.request('play-quiz', 'GET', '?skill=' + difficulty)
+    attempt = ATTEMPT_RE.search(page)
+    if attempt:
+        answers = {}
+        for field, value in OPTION_RE.findall(page):
+            if field not in answers or rng.random() < 0.3:          # students pick a random option from time to time
+                answers[field] = html.unescape(value)
+        answers['attempt'] = attempt.group(1)
+        session.request('play-quiz', 'POST', '?skill=' + difficulty, answers)
+    session.request('leaderboard', 'GET')
+    session.request('leaderboard', 'GET', '?difficulty=' + difficulty)
+    status, text = session.request('api-quiz', 'GET', '?skill=' + difficulty)           # a second quiz from the mobile app
+    if status == 200:
+        quiz = json.loads(text)
+        answers = {str(question['id']): rng.randrange(len(question['options'])) for question in quiz['questions']}
+        session.request('api-quiz', 'POST', body={'attempt': quiz['attempt'], 'answers': answers})
+
+
+def teacher_flow(session, username, rng):
+    session.request('login-page', 'GET')
+    session.request('login-page', 'POST', data={'username': username, 'password': PASSWORD})
+    session.request('teachersite', 'GET')
+    session.request('participants', 'GET')
+    session.request('participants', 'GET', '?sort=' + rng.choice(['average', 'entries']))
+    session.request('question-search', 'GET', '?q=' + urllib.parse.quote('What is %d' % rng.randrange(10)))
+    session.request('question-stats', 'GET', '?difficulty=' + rng.choice(DIFFICULTIES))
+    session.request('add-question', 'GET')
+    session.request('leaderboard', 'GET')
+
+
+def scrape_flow(session, username, rng):        # a Prometheus server polling the metrics during the rush
+    for _ in range(5):
+        session.request('metrics', 'GET')
+
+
+def seed_in_process(teachers, students, questions, prefix):
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from quiz.models import Profile, QuesModel
+    from quiz.scoring import record_submission
+
+    password = make_password(PASSWORD)
+    users = User.objects.bulk_create(
+        [User(username='%s_teacher%d' % (prefix, i), password=password) for i in range(teachers)]
+        + [User(username='%s_student%d' % (prefix, i), password=password) for i in range(students)]
+    )
+    Profile.objects.bulk_create([Profile(user=user, user_type='teacher' if i < teachers else 'student')
+                                 for i, user in enumerate(users)])
+    QuesModel.objects.bulk_create([
+        QuesModel(question='What is %d + %d?' % (i, i), op1=str(i), op2=str(2 * i), op3=str(2 * i + 1),
+                  op4=str(3 * i), ans=str(2 * i), difficulty=DIFFICULTIES[i % 4])
+        for i in range(questions)
+    ], batch_size=1000)
+    for i, user in enumerate(users[teachers:]):               # earlier quizzes of the seeded students fill the leaderboard and the statistics
+        record_submission(user, DIFFICULTIES[i % 4], (i * 10) % 110, (i * 10) % 110)
+    return [user.username for user in users[:teachers]]
+
+
+def seed_over_http(results, target, teachers, questions, prefix):
+    names = []
+    for i in range(teachers):
+        session = HttpSession(results, target)
+        username = '%s_teacher%d' % (prefix, i)
+        session.request('register-page', 'POST', data={'username': username, 'password1': PASSWORD,
+                                                       'password2': PASSWORD, 'user_type': 'teacher'})
+        for number in range(i, questions, teachers):          # the teachers share the work of adding the question pool
+            session.request('add-question', 'POST', data={'question': 'What is %d + %d?' % (number, number),
+                                                          'op1': str(number), 'op2': str(2 * number),
+                                                          'op3': str(2 * number + 1), 'op4': str(3 * number),
+                                                          'ans': str(2 * number), 'difficulty': DIFFICULTIES[number % 4]})
+        names.append(username)
+    results.requests.clear()                                  # seeding isn't part of the measurement
+    return names
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(results, seconds):
+    summary = {}
+    for name, requests in sorted(results.requests.items()):
+        latencies = [request[0] * 1000 for request in requests]
+        queries = [request[1] for request in requests if request[1] is not None]
+        summary[name] = {
+            'requests': len(requests),
+            'errors': sum(1 for request in requests if not request[2]),
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'queries': round(sum(queries) / len(queries), 2) if queries else None,
+            'throughput': round(len(requests) / seconds, 1),
+        }
+    return summary
+
+
+def print_summary(summary, seconds):
+    print('%-15s %8s %7s %9s %9s %9s %9s %10s' % ('url name', 'requests', 'errors', 'p50 ms', 'p95 ms', 'p99 ms',
+                                                  'queries', 'req/s'))
+    total = 0
+    for name, row in summary.items():
+        total += row['requests']
+        print('%-15s %8d %7d %9.2f %9.2f %9.2f %9s %10.1f' % (
+            name, row['requests'], row['errors'], row['p50_ms'], row['p95_ms'], row['p99_ms'],
+            '-' if row['queries'] is None else '%.1f' % row['queries'], row['throughput']))
+    print('%d requests in %.1f s: %.1f requests/s' % (total, seconds, total / seconds))
+
+
+def regressions(summary, baseline, tolerance):
+    problems = []
+    for name, old in baseline.items():
+        new = summary.get(name)
+        if new is None:
+            continue
+        if new['p95_ms'] > old['p95_ms'] * (1 + tolerance):
+            problems.append('%s: p95 %.2f ms, baseline %.2f ms' % (name, new['p95_ms'], old['p95_ms']))
+        if new['queries'] is not None and old['queries'] is not None and new['queries'] > old['queries']:
+            problems.append('%s: %.1f queries per request, baseline %.1f' % (name, new['queries'], old['queries']))
+        if new['errors'] > old['errors']:
+            problems.append('%s: %d errors, baseline %d' % (name, new['errors'], old['errors']))
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test of the MathChallenger quiz pages.')
+    parser.add_argument('--target', help='base URL of a running server, e.g. http://127.0.0.1:8000 (default: in-process)')
+    parser.add_argument('--teachers', type=int, default=5)
+    parser.add_argument('--students', type=int, default=100, help='number of seeded students and of student flows replayed')
+    parser.add_argument('--questions', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=10, help='flows running at the same time')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--real-password-hashing', action='store_true',
+                        help='in-process only: keep the slow production password hasher instead of MD5')
+    parser.add_argument('--save-baseline', metavar='FILE')
+    parser.add_argument('--baseline', metavar='FILE')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 increase against the baseline (0.25 = 25%%)')
+    args = parser.parse_args(argv)
+
+    results = Results()
+    prefix = 'load%d' % int(time.time())
+    rng = random.Random(args.seed)
+
+    if args.target:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mathchallenger.settings')
+        import django
+        django.setup()                              # only for the URL names, the server has its own database
+        load_urls()
+        teachers = seed_over_http(results, args.target, args.teachers, args.questions, prefix)
+        new_session = lambda: HttpSession(results, args.target)
+    else:
+        from benchmarks import setup_django
+        setup_django(on_disk=True)
+        from django.conf import settings
+        if not args.real_password_hashing:
+            settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+        settings.ALLOWED_HOSTS = ['testserver']
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)     # server errors are reported in the summary instead
+        load_urls()
+        teachers = seed_in_process(args.teachers, args.students, args.questions, prefix)
+        new_session = lambda: InProcessSession(results)
+
+    flows = [(student_flow, '%s_new%d' % (prefix, i)) for i in range(args.students)]
+    flows += [(teacher_flow, teachers[i % len(teachers)]) for i in range(args.teachers * 4)] if teachers else []
+    flows += [(scrape_flow, 'scraper%d' % i) for i in range(args.teachers)]
+    rng.shuffle(flows)
+
+    def run(flow):
+        function, username = flow
+        session = new_session()
+        try:
+            function(session, username, random.Random(username))
+        except UnknownURL:
+            raise                                   # a flow out of date with quiz/urls.py stops the run
+        except Exception as error:                  # e.g. the server went away, the flow is cut short but the run goes on
+            results.add('flow-errors', 0, None, False)
+            print('%s: %r' % (username, error), file=sys.stderr)
+        finally:
+            session.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(run, flows))
+    seconds = time.perf_counter() - start
+
+    summary = summarize(results, seconds)
+    print_summary(summary, seconds)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as file:
+            json.dump(summary, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            problems = regressions(summary, json.load(file), args.tolerance)
+        for problem in problems:
+            print('REGRESSION ' + problem)
+        if problems:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,6 +11,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
 
@@ -39,11 +41,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'quiz.metrics.MetricsMiddleware',                   # first, so the latency covers all other middleware
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'quiz.roles.RoleMiddleware',                        # rejects users of the wrong role before the views of @require_role run
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -70,12 +74,74 @@ TEMPLATES = [
 WSGI_APPLICATION = 'mathchallenger.wsgi.application'
 
 
-
-DATABASES = {
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',       # per process, a shared backend (e.g. memcached or redis) keeps several workers in sync
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('MATHCHALLENGER_CACHE_ENTRIES', 100000)),     # about one per logged-in user (cached_db session) plus the pages; once full, a third is dropped
+        },
+    },
+    'versions': {                   # the version stamps (quiz/versions.py), apart so that pages and sessions don't push them out
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'versions',
+        'OPTIONS': {
+            'MAX_ENTRIES': sys.maxsize,         # never culled: one stamp per kind of data and difficulty, and one per profile
+        },
+    },
+}
+WORKER_PROCESSES = int(os.environ.get('MATHCHALLENGER_WORKERS', 1))     # more than one needs a shared cache backend (system check quiz.E001)
+PAGE_CACHE_TIMEOUT = 300            # seconds a rendered leaderboard or participants page is kept
+
+RANKING_BACKEND = 'quiz.ranking.MemoryRanking'      # or 'quiz.ranking.RedisRanking' with RANKING_OPTIONS = {'url': 'redis://...'}
+RANKING_OPTIONS = {}
+
+SUBMISSION_BUFFER = False                   # True: quiz results are queued and written in batches by a background thread (see quiz/writebehind.py)
+SUBMISSION_BUFFER_INTERVAL = 0.5            # seconds between two flushes of the queue
+SUBMISSION_BUFFER_ROWS = 500                # flush earlier once this many results are queued
+SUBMISSION_BUFFER_SPOOL_DIR = None          # directory of the spool files that keep queued results across crashes, None keeps them in memory only
+
+SESSION_ENGINES = {                 # chosen with the environment variable MATHCHALLENGER_SESSIONS, see the README
+    'db': 'django.contrib.sessions.backends.db',                        # a query per request
+    'cached_db': 'django.contrib.sessions.backends.cached_db',          # read from the cache, written through to the database
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',    # kept by the browser, no server storage
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get('MATHCHALLENGER_SESSIONS', 'db')]
+
+
+
+# The database is chosen with the environment variable MATHCHALLENGER_DB ('sqlite' or 'postgres'), see the README.
+DATABASE_PROFILE = os.environ.get('MATHCHALLENGER_DB', 'sqlite')
+
+if DATABASE_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('MATHCHALLENGER_DB_NAME', 'mathchallenger'),
+            'USER': os.environ.get('MATHCHALLENGER_DB_USER', 'mathchallenger'),
+            'PASSWORD': os.environ.get('MATHCHALLENGER_DB_PASSWORD', ''),
+            'HOST': os.environ.get('MATHCHALLENGER_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('MATHCHALLENGER_DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('MATHCHALLENGER_DB_CONN_MAX_AGE', 600)),     # keep connections open between requests
+            'CONN_HEALTH_CHECKS': True,                 # and check them before a request reuses them
+        }
     }
+elif DATABASE_PROFILE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('MATHCHALLENGER_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('MATHCHALLENGER_DB_CONN_MAX_AGE', 0)),
+            'OPTIONS': {'timeout': 20},                 # seconds a writer waits for the lock before "database is locked"
+        }
+    }
+else:
+    raise ValueError('Unknown MATHCHALLENGER_DB %r, use sqlite or postgres' % DATABASE_PROFILE)
+
+SQLITE_PRAGMAS = {                  # set on every new SQLite connection by quiz/database.py
+    'journal_mode': 'wal',          # readers don't block the writer and the writer doesn't block readers
+    'synchronous': 'normal',        # with WAL, only a power cut can lose the last commits, and never corrupts the database
+    'cache_size': -64000,           # 64 MB page cache per connection (negative values are KiB)
+    'temp_store': 'memory',
 }
 
 
@@ -111,11 +177,37 @@ USE_TZ = True
 
 
 STATIC_URL = 'static/'
+STATIC_ROOT = os.environ.get('MATHCHALLENGER_STATIC_ROOT', BASE_DIR / 'staticfiles')      # filled by collectstatic, served by wsgi.py
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'quiz.staticfiles.CompressedManifestStaticFilesStorage'},       # hashed names, .gz and .br files
+}
 LOGOUT_REDIRECT_URL = "landing-page"
 LOGIN_REDIRECT_URL = 'landing-page'
 LOGIN_URL = 'login-page'
 
 
+QUIZ_LENGTH = {                 # number of questions drawn per quiz for each difficulty
+    'beginner': 10,
+    'medium': 10,
+    'advanced': 15,
+    'human_calculator': 20,
+}
+QUIZ_LENGTH_DEFAULT = 10                # also the length of adaptive quizzes
+ADAPTIVE_BAND = 50                      # adaptive quizzes draw from the questions up to this many rating points away from the student, doubled while too few
+
+LEADERBOARD_PAGE_SIZE = 50
+PARTICIPANTS_PAGE_SIZE = 50
+SEARCH_PAGE_SIZE = 20
+SEARCH_CANDIDATES = 1000           # searches with more matches show the newest questions first instead of the best matches
+QUESTION_STATS_ROWS = 10                # hardest and easiest questions shown to the teachers
+QUESTION_STATS_MIN_ATTEMPTS = 5         # questions with fewer answers are not ranked
+ROLLUP_BATCH_SIZE = 10000               # answer events added to the question counters per transaction
+ROLLUP_DELAY = 5                        # seconds, the rollup leaves younger events for its next run
+
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR')       # set for servers with several worker processes, e.g. gunicorn
+
+
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -13,4 +13,6 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mathchallenger.settings')
 
-application = get_wsgi_application()
+from quiz.staticfiles import StaticFilesApplication       # noqa: E402, needs the settings
+
+application = StaticFilesApplication(get_wsgi_application())
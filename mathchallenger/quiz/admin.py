@@ -1,9 +1,13 @@
 from django.contrib import admin
-from .models import QuesModel,Profile,Leaderboard, Statistic
+from .models import QuesModel,Profile,Leaderboard, Statistic, QuizAttempt, AnswerEvent, QuestionStats, PeriodScore, ScoreHistogram
 
 
 admin.site.register(QuesModel)
 admin.site.register(Profile)
 admin.site.register(Leaderboard)
 admin.site.register(Statistic)
-
+admin.site.register(QuizAttempt)
+admin.site.register(AnswerEvent)
+admin.site.register(QuestionStats)
+admin.site.register(PeriodScore)
+admin.site.register(ScoreHistogram)
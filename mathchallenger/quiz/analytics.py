@@ -0,0 +1,86 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+from .models import AnswerEvent, QuestionStats, QuesModel, RollupMark
+
+
+# Per-question analytics for the teachers. Every submission appends its answers to AnswerEvent (one INSERT),
+# and rollup_question_stats() adds the events logged since its last run to the counters in QuestionStats.
+# The rollup remembers the id of the last event it read (a RollupMark), so every run only reads the new
+# events, and the teachers' page reads the counters instead of aggregating the whole log.
+# Ids are handed out before a transaction commits, so a slow submission can commit an event below ids that
+# are already visible. The rollup only reads events older than ROLLUP_DELAY seconds to not skip those.
+
+MARK = 'question_stats'
+RETRIES = 3                         # batches dropped in a row because other rollups moved the mark, before leaving the rest to them
+
+
+def answer_events(user_id, outcomes, seconds):     # the log rows of a submission, generated questions (id None) are not logged
+    logged = [(question_id, correct) for question_id, correct in outcomes if question_id is not None]
+    if not logged:
+        return []
+    per_answer = (seconds or 0) / len(logged)          # the time of the quiz is shared by the logged answers, so the log adds up to it
+    return [AnswerEvent(user_id=user_id, question_id=question_id, correct=correct, seconds=per_answer) for question_id, correct in logged]
+
+
+def rollup_question_stats(batch_size=None):     # returns the number of events that were added to the counters
+    batch_size = batch_size or settings.ROLLUP_BATCH_SIZE
+    RollupMark.objects.get_or_create(name=MARK)
+    rolled_up = retries = 0
+    while True:
+        read = rollup_batch(batch_size)
+        if read is None:
+            retries += 1
+            if retries > RETRIES:
+                return rolled_up                # the other rollups keep moving the mark, they roll up the rest
+            continue                            # another rollup moved the mark first, start again from its mark
+        retries = 0
+        rolled_up += read
+        if read < batch_size:
+            return rolled_up
+
+
+def rollup_batch(batch_size):       # adds the next batch_size events to the counters, None if a concurrent rollup got in the way
+    mark = RollupMark.objects.get(name=MARK)
+    cutoff = timezone.now() - timedelta(seconds=settings.ROLLUP_DELAY)
+    events = AnswerEvent.objects.filter(id__gt=mark.last_id, created_at__lte=cutoff)      # a range scan of the primary key from the mark on
+    end = events.order_by('id').values_list('id', flat=True)[batch_size - 1:batch_size]
+    end = end[0] if end else events.aggregate(end=Max('id'))['end']
+    if end is None:
+        return 0
+
+    with transaction.atomic():
+        batch = events.filter(id__lte=end)
+        totals = {row['question_id']: row for row in batch.values('question_id').annotate(
+            attempts=Count('id'), correct=Count('id', filter=Q(correct=True)), seconds=Sum('seconds'))}
+        stats = QuestionStats.objects.in_bulk(list(totals))
+        new_ids = set(QuesModel.objects.filter(id__in=[pk for pk in totals if pk not in stats]).values_list('id', flat=True))     # deleted questions get no counters
+        stats.update({pk: QuestionStats(question_id=pk) for pk in new_ids})
+        for pk, row in stats.items():
+            row.attempts += totals[pk]['attempts']
+            row.correct += totals[pk]['correct']
+            row.total_seconds += totals[pk]['seconds']
+            row.correct_rate = row.correct / row.attempts
+        QuestionStats.objects.bulk_create(list(stats.values()), batch_size=500, update_conflicts=True, unique_fields=['question'],
+                                          update_fields=['attempts', 'correct', 'total_seconds', 'correct_rate'])      # INSERT ... ON CONFLICT DO UPDATE, much faster than bulk_update's CASE WHEN
+        if not RollupMark.objects.filter(name=MARK, last_id=mark.last_id).update(last_id=end):
+            transaction.set_rollback(True)      # the mark moved since we read it: drop our counts instead of adding the events twice
+            return None
+    return sum(row['attempts'] for row in totals.values())
+
+
+def hardest_questions(difficulty=None, count=10):
+    return ranked_questions('correct_rate', difficulty, count)
+
+
+def easiest_questions(difficulty=None, count=10):
+    return ranked_questions('-correct_rate', difficulty, count)
+
+
+def ranked_questions(order, difficulty, count):
+    stats = QuestionStats.objects.filter(attempts__gte=settings.QUESTION_STATS_MIN_ATTEMPTS).select_related('question')     # too few answers say little about a question
+    if difficulty:
+        stats = stats.filter(question__difficulty=difficulty)
+    return list(stats.order_by(order, '-attempts')[:count])
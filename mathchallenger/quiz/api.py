@@ -0,0 +1,128 @@
+import json
+import random
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.http import HttpResponse
+from .models import Profile, QuesModel, QuizAttempt
+from .sampling import asample_question_ids, asample_adaptive_ids, quiz_length
+from .scoring import aopen_attempt, submit_attempt, grade
+from .ranking import player_position
+from .histograms import score_position
+from .generator import generate_questions, LEVELS
+from .ratings import ADAPTIVE
+from .roles import auser_role
+
+try:
+    import orjson           # optional, several times faster than the json module
+except ImportError:
+    orjson = None
+
+
+# JSON version of play_quiz for the mobile clients.
+#   GET  /api/quiz/?skill=beginner[&generated=1]  (or skill=adaptive)  ->  {"attempt": token, "difficulty": ..., "questions": [{"id", "question", "options"}]}
+#   POST /api/quiz/  {"attempt": token, "answers": {"<question id>": <index of the chosen option>}}  ->  the result
+# The client logs in like the website does (session cookie) and sends the CSRF token in the X-CSRFToken header.
+
+TOKEN_SALT = 'quiz.api.attempt'
+OPTION_FIELDS = ('op1', 'op2', 'op3', 'op4')
+
+
+def json_response(data, status=200):
+    if orjson is not None:
+        body = orjson.dumps(data)
+    else:
+        body = json.dumps(data, separators=(',', ':'))
+    return HttpResponse(body, status=status, content_type='application/json')
+
+
+def error(message, status=400):
+    return json_response({'error': message}, status=status)
+
+
+def parse_body(body):
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+async def quiz(request):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return error('Please log in!', status=401)           # no database query for anonymous clients
+    if await auser_role(request) != 'student':              # the role stored in the session, like @require_role('student') on play_quiz
+        return error('Only students can play quizzes!', status=403)
+
+    if request.method == 'POST':
+        return await submit_quiz(request, user)
+    if request.method != 'GET':
+        return error('Method not allowed!', status=405)
+
+    skill = request.GET.get('skill')
+    if skill not in dict(QuesModel.SELECTION) and skill != ADAPTIVE:
+        return error('Unknown difficulty!')
+
+    if request.GET.get('generated') and skill in LEVELS:
+        seed = random.randrange(2 ** 62)
+        questions = [{'id': q['id'], 'question': q['question'], 'options': [q[field] for field in OPTION_FIELDS]}
+                     for q in generate_questions(skill, seed, quiz_length(skill))]
+    else:
+        seed = None
+        if skill == ADAPTIVE:
+            rating = await Profile.objects.filter(user_id=user.id).values_list('rating', flat=True).afirst()
+            ids = await asample_adaptive_ids(rating, quiz_length(skill))
+        else:
+            ids = await asample_question_ids(skill)
+        rows = {row[0]: row async for row in QuesModel.objects.filter(id__in=ids).values_list('id', 'question', *OPTION_FIELDS)}    # tuples, no model instances
+        questions = [{'id': rows[pk][0], 'question': rows[pk][1], 'options': list(rows[pk][2:])} for pk in ids if pk in rows]
+    attempt = await QuizAttempt.objects.acreate(user=user, difficulty=skill, seed=seed, question_ids=[q['id'] for q in questions])
+    return json_response({
+        'attempt': signing.dumps(attempt.id, salt=TOKEN_SALT),          # signed, so clients can't submit attempts by guessing ids
+        'difficulty': skill,
+        'questions': questions,
+    })
+
+
+async def submit_quiz(request, user):
+    try:
+        data = parse_body(request.body)
+        attempt_id = int(signing.loads(data['attempt'], salt=TOKEN_SALT))
+        selected = {int(question_id): index for question_id, index in data['answers'].items()}
+    except (ValueError, KeyError, TypeError, AttributeError, signing.BadSignature):
+        return error('Expected {"attempt": token, "answers": {question id: option index}}!')
+
+    attempt = await aopen_attempt(user, attempt_id)
+    if attempt is None:
+        return error('Unknown or already submitted attempt!', status=409)
+    skill = attempt.difficulty
+
+    if attempt.seed is not None:
+        rows = [[q['id']] + [q[field] for field in OPTION_FIELDS] + [q['ans']] for q in generate_questions(skill, attempt.seed, len(attempt.question_ids))]
+    else:
+        rows = [row async for row in QuesModel.objects.filter(id__in=attempt.question_ids).values_list('id', *OPTION_FIELDS, 'ans')]
+    answers = {row[0]: list(row[1:5]).index(row[5]) for row in rows if row[5] in row[1:5]}       # question id -> index of the correct option
+    score, correct, wrong, total, outcomes = grade(attempt.question_ids, answers, selected)
+    if total == 0:
+        return error('The questions of this quiz were deleted!', status=409)
+    if attempt.seed is not None:
+        outcomes = [(None, right) for question_id, right in outcomes]
+    percent = (score/total) * 10
+    seconds = (attempt.submitted_at - attempt.started_at).total_seconds()
+
+    if not await sync_to_async(submit_attempt)(attempt, user, score, percent, outcomes, seconds):
+        return error('Unknown or already submitted attempt!', status=409)
+    rank, players = await sync_to_async(player_position)(skill, user.id)
+    beaten, score_rank, scores_count = await sync_to_async(score_position)(skill, score, settings.SUBMISSION_BUFFER and skill != ADAPTIVE)
+    rating = await Profile.objects.filter(user_id=user.id).values_list('rating', flat=True).afirst()
+    return json_response({
+        'score': score,
+        'percent': round(percent),
+        'time': round(seconds),
+        'correct': correct,
+        'wrong': wrong,
+        'total': total,
+        'rank': rank,
+        'players': players,
+        'beaten': beaten,               # percent of all quizzes of the difficulty with a lower score
+        'rating': round(rating),
+    })
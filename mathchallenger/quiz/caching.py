@@ -0,0 +1,67 @@
+import asyncio
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+# Whole-page caching for pages that only change when a quiz is submitted (leaderboard, participants).
+# The cache key contains the version stamps of the data a page shows (see quiz.versions), so a submission
+# makes exactly the affected pages unreachable. When many readers miss the same page at once, only the
+# first one renders it; the others get the previous copy of the page or wait for the new one.
+# The version stamps also make the ETag and Last-Modified headers of a page, so a client that polls a page
+# gets a 304 Not Modified from the stamps alone, without the page being read from the cache or the database.
+
+LOCK_TIMEOUT = 10           # seconds, in case the request holding the lock dies
+WAIT_STEP = 0.01
+
+
+def validators(versions):            # the ETag and Last-Modified of a page that shows the data of these version stamps
+    etag = '"%s"' % '-'.join('%x' % version for version in versions)
+    last_modified = max(versions) // 10 ** 9                # stamps are time.time_ns() of the last write, HTTP dates have whole seconds
+    return etag, last_modified
+
+
+def add_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'no-cache'             # browsers may keep the page but have to revalidate it on every request
+    return response
+
+
+async def cached_page(page, versions, render_page, request=None):
+    etag, last_modified = validators(versions)
+    if request is not None:
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return add_validators(response, etag, last_modified)         # the client already has this version of the page
+
+    key = 'quiz:page:%s:%s' % (page, ':'.join(str(version) for version in versions))
+    content = await cache.aget(key)
+    if content is not None:
+        return add_validators(HttpResponse(content), etag, last_modified)
+
+    lock = key + ':lock'
+    stale = 'quiz:stale:%s' % page                     # the last rendered copy of the page, whatever its versions
+    waited = 0
+    while not await cache.aadd(lock, 1, LOCK_TIMEOUT):
+        content = await cache.aget(stale)              # someone else is rendering, serve the old copy meanwhile (without validators, it is not this version)
+        if content is not None:
+            return HttpResponse(content)
+        await asyncio.sleep(WAIT_STEP)
+        waited += WAIT_STEP
+        content = await cache.aget(key)
+        if content is not None:
+            return add_validators(HttpResponse(content), etag, last_modified)
+        if waited > LOCK_TIMEOUT:
+            break
+
+    try:
+        response = await render_page()
+        if response.status_code == 200:
+            await cache.aset_many({key: response.content, stale: response.content}, settings.PAGE_CACHE_TIMEOUT)
+            add_validators(response, etag, last_modified)
+        return response
+    finally:
+        await cache.adelete(lock)
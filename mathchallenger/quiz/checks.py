@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core import checks
+from django.utils.module_loading import import_string
+from .ranking import MemoryRanking
+from .versions import versions_cache, versions_shared
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    # The version stamps (quiz/versions.py) invalidate the stored roles, the question id indexes and the cached pages.
+    # A per-process cache keeps them apart in every worker, so the other workers would go on using old data.
+    if getattr(settings, 'WORKER_PROCESSES', 1) > 1 and not versions_shared():
+        return [checks.Error(
+            '%s is kept per process, but WORKER_PROCESSES is %d.' % (settings.CACHES[versions_cache()]['BACKEND'], settings.WORKER_PROCESSES),
+            hint='Configure a shared cache backend (e.g. memcached or redis) in CACHES ("versions", or "default" without it), so that all workers see the same version stamps.',
+            id='quiz.E001',
+        )]
+    return []
+
+
+@checks.register()
+def check_shared_ranking(app_configs, **kwargs):
+    # Every worker fills its own MemoryRanking from the Leaderboard when it starts and only adds the scores it records
+    # itself, so the ranks shown by the workers drift apart until they are restarted.
+    if getattr(settings, 'WORKER_PROCESSES', 1) > 1 and issubclass(import_string(settings.RANKING_BACKEND), MemoryRanking):
+        return [checks.Warning(
+            '%s is kept per process, but WORKER_PROCESSES is %d.' % (settings.RANKING_BACKEND, settings.WORKER_PROCESSES),
+            hint="Set RANKING_BACKEND = 'quiz.ranking.RedisRanking', so that all workers rank the same scores.",
+            id='quiz.W001',
+        )]
+    return []
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+# Applies settings.SQLITE_PRAGMAS to every new SQLite connection. The pragmas are run on the sqlite3
+# connection itself, so they never show up as queries of a request (or in the query counts of the tests).
+
+@receiver(connection_created)
+def set_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute('PRAGMA %s = %s' % (name, value))
+
+
+def lock_tables(*models):           # keeps submissions out of these tables until the transaction ends, pages can still read
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('LOCK TABLE %s IN EXCLUSIVE MODE' % ', '.join(connection.ops.quote_name(model._meta.db_table) for model in models))
+    # SQLite has a single writer: the DELETE that follows takes the write lock before the Leaderboard is read
@@ -0,0 +1,86 @@
+import random
+
+
+# Arithmetic questions generated from a seed. The same (difficulty, seed, count) always gives the same
+# questions, so a generated quiz is graded by generating it again instead of storing it in the database.
+
+LEVELS = {                  # difficulty -> list of (operation, range of the first operand, range of the second operand)
+    'beginner': [('+', (1, 20), (1, 20)), ('-', (5, 30), (1, 5))],
+    'medium': [('+', (10, 100), (10, 100)), ('-', (20, 100), (1, 20)), ('*', (2, 12), (2, 12))],
+    'advanced': [('*', (12, 99), (3, 12)), ('/', (2, 20), (2, 12)), ('-', (100, 999), (10, 99))],
+    'human_calculator': [('*', (100, 999), (11, 99)), ('/', (12, 99), (11, 49)), ('^', (11, 99), (2, 2)),
+                         ('+', (1000, 9999), (1000, 9999))],
+}
+
+
+def generate_questions(difficulty, seed, count):
+    rng = random.Random('%s:%d' % (difficulty, seed))           # independent of the global random state and of the other difficulties
+    levels = LEVELS[difficulty]
+    randint = rng.randint
+    choice = rng.choice
+    shuffle = rng.shuffle
+
+    questions = []
+    for index in range(count):
+        operation, (low_a, high_a), (low_b, high_b) = choice(levels)
+        a = randint(low_a, high_a)
+        b = randint(low_b, high_b)
+        if operation == '+':
+            answer = a + b
+            text = 'What is %d + %d?' % (a, b)
+        elif operation == '-':
+            answer = a - b
+            text = 'What is %d - %d?' % (a, b)
+        elif operation == '*':
+            answer = a * b
+            text = 'What is %d * %d?' % (a, b)
+        elif operation == '/':
+            answer = a
+            text = 'What is %d / %d?' % (a * b, b)          # the dividend is built from the answer, so the division is always exact
+        else:
+            answer = a * a
+            text = 'What is %d squared?' % a
+
+        options = distractors(answer, a, b, operation, randint)
+        options.append(answer)
+        shuffle(options)
+        options = [str(option) for option in options]
+        questions.append({
+            'id': index,
+            'question': text,
+            'op1': options[0], 'op2': options[1], 'op3': options[2], 'op4': options[3],
+            'ans': str(answer),
+        })
+    return questions
+
+
+def distractors(answer, a, b, operation, randint):       # three wrong answers that look like typical mistakes
+    candidates = [
+        answer + 10 if answer < 100 else answer + 100,          # carry mistake
+        answer - 1,                                             # off by one
+        answer + 1,
+        a + b if operation != '+' else a * b,                   # wrong operation
+        answer + randint(2, 9),
+        answer - randint(2, 9),
+    ]
+    if answer >= 10:
+        digits = str(answer)
+        swapped = int(digits[:-2] + digits[-1] + digits[-2])      # swapped last two digits
+        candidates.insert(0, swapped)
+
+    wrong = []
+    for candidate in candidates:
+        if candidate != answer and candidate >= 0 and candidate not in wrong:
+            wrong.append(candidate)
+        if len(wrong) == 3:
+            return wrong
+    offset = 2
+    while len(wrong) < 3:                                       # only happens for very small answers
+        if answer + offset not in wrong:
+            wrong.append(answer + offset)
+        offset += 1
+    return wrong
+
+
+def answer_key(difficulty, seed, count):
+    return {question['id']: question['ans'] for question in generate_questions(difficulty, seed, count)}
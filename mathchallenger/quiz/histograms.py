@@ -0,0 +1,53 @@
+from django.db import connection, transaction
+from django.db.models import Count, F
+from .database import lock_tables
+from .models import Leaderboard, ScoreHistogram
+
+
+# "Your score beats 83% of all quizzes at this difficulty" without counting the Leaderboard rows: every submission
+# adds one to the bucket of its score in the same transaction, and a percentile or rank reads the few buckets
+# of the difficulty. Scores added, changed or deleted in the admin move between the buckets (quiz/signals.py),
+# scores changed with a bulk update need a rebuild: python manage.py rebuild_histograms
+
+def add_scores(scores):             # scores: (difficulty, score), one INSERT ... ON CONFLICT DO UPDATE for all buckets
+    counts = {}
+    for difficulty, score in scores:
+        counts[(difficulty, score)] = counts.get((difficulty, score), 0) + 1
+    if not counts:
+        return
+    buckets = sorted(counts.items())                        # always the same order, so concurrent batches can't deadlock
+    table = connection.ops.quote_name(ScoreHistogram._meta.db_table)
+    sql = ('INSERT INTO {table} (difficulty, score, count) VALUES {values} '
+           'ON CONFLICT (difficulty, score) DO UPDATE SET count = {table}.count + excluded.count'
+           ).format(table=table, values=', '.join(['(%s, %s, %s)'] * len(buckets)))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [value for (difficulty, score), count in buckets for value in (difficulty, score, count)])
+
+
+def remove_score(difficulty, score):
+    ScoreHistogram.objects.filter(difficulty=difficulty, score=score, count__gt=0).update(count=F('count') - 1)
+
+
+def score_position(difficulty, score, unwritten=False):      # (percent of the scores that are lower, rank of the score, number of scores) in O(buckets)
+    lower = higher = 0
+    total = 1 if unwritten else 0               # the player's own score, still queued by the write-behind buffer (quiz/writebehind.py)
+    for bucket_score, count in ScoreHistogram.objects.filter(difficulty=difficulty).values_list('score', 'count'):
+        total += count
+        if bucket_score < score:
+            lower += count
+        elif bucket_score > score:
+            higher += count
+    if not total:
+        return None, None, 0
+    return round(lower / total * 100), higher + 1, total
+
+
+def rebuild():                      # the histograms computed again from the Leaderboard table, returns the number of buckets
+    with transaction.atomic():
+        lock_tables(Leaderboard, ScoreHistogram)        # a submission meanwhile would be counted twice or not at all
+        ScoreHistogram.objects.all().delete()
+        buckets = list(Leaderboard.objects.exclude(difficulty=None).values('difficulty', 'score')
+                       .annotate(count=Count('id')).values_list('difficulty', 'score', 'count'))
+        rows = ScoreHistogram.objects.bulk_create([ScoreHistogram(difficulty=difficulty, score=score, count=count)
+                                                   for difficulty, score, count in buckets])
+    return len(rows)
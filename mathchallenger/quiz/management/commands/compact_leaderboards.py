@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from quiz import periods
+
+
+class Command(BaseCommand):
+    help = ("Deletes the daily and weekly leaderboard rows of past days and weeks. Run it once a day, e.g. from cron. "
+            "With --rebuild, the rows of the current day and week are computed again from the Leaderboard table.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='recompute the current rows, e.g. after scores were changed with a bulk update')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            rows = periods.rebuild()
+            self.stdout.write(self.style.SUCCESS('%d rows rebuilt.' % rows))
+        else:
+            deleted = periods.compact()
+            self.stdout.write(self.style.SUCCESS('%d rows of past periods deleted.' % deleted))
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from quiz.writebehind import SubmissionBuffer
+
+
+class Command(BaseCommand):
+    help = 'Writes the quiz results left in the spool files of stopped or crashed processes to the database.'
+
+    def handle(self, *args, **options):
+        if not settings.SUBMISSION_BUFFER_SPOOL_DIR:
+            raise CommandError('SUBMISSION_BUFFER_SPOOL_DIR is not set.')
+        buffer = SubmissionBuffer(settings.SUBMISSION_BUFFER_SPOOL_DIR)        # picks up the spool files of processes that are gone
+        written = buffer.flush()
+        buffer.stop()
+        self.stdout.write(self.style.SUCCESS('%d quiz results written.' % written))
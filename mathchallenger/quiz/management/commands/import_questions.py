@@ -0,0 +1,109 @@
+import csv
+import json
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from quiz.models import QuesModel
+from quiz.versions import bump_version
+from quiz.ratings import initial_rating
+
+
+FIELDS = ['question', 'op1', 'op2', 'op3', 'op4', 'ans', 'difficulty']
+
+
+class Command(BaseCommand):
+    help = 'Imports quiz questions from a JSON Lines or CSV file, skipping questions that already exist.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="file to import, '-' reads JSON Lines from stdin")
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='input format, guessed from the file extension by default')
+        parser.add_argument('--batch-size', type=int, default=1000, help='number of questions inserted per transaction')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or ('csv' if options['path'].endswith('.csv') else 'jsonl')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        self.read = self.created = self.duplicates = self.invalid = 0
+        self.difficulties = set()
+        start = time.perf_counter()
+
+        if options['path'] == '-':
+            self.import_rows(read_jsonl(sys.stdin), batch_size)
+        else:
+            try:
+                with open(options['path'], newline='', encoding='utf-8') as file:
+                    rows = read_csv(file) if file_format == 'csv' else read_jsonl(file)
+                    self.import_rows(rows, batch_size)
+            except OSError as error:
+                raise CommandError(error)
+
+        for difficulty in self.difficulties:
+            bump_version('questions', difficulty)           # bulk_create sends no signals, so the cached question ids are invalidated here
+
+        seconds = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            'Read %d rows in %.1f seconds (%.0f rows/s): %d imported, %d duplicates skipped, %d invalid'
+            % (self.read, seconds, self.read / seconds if seconds else 0, self.created, self.duplicates, self.invalid)
+        ))
+
+    def import_rows(self, rows, batch_size):              # rows are streamed, only one batch is kept in memory
+        batch = []
+        for line, row in rows:
+            self.read += 1
+            question = self.build_question(line, row)
+            if question is not None:
+                batch.append(question)
+            if len(batch) >= batch_size:
+                self.insert_batch(batch)
+                batch = []
+        if batch:
+            self.insert_batch(batch)
+
+    def build_question(self, line, row):
+        if row is None or not isinstance(row, dict):
+            self.invalid += 1
+            self.stderr.write('line %d: not a question object' % line)
+            return None
+        question = QuesModel(**{field: row.get(field) for field in FIELDS})
+        if question.difficulty is None:
+            question.difficulty = 'beginner'
+        errors = question.validation_errors()
+        if errors:
+            self.invalid += 1
+            self.stderr.write('line %d: %s' % (line, ' '.join(errors)))
+            return None
+        question.content_hash = question.make_content_hash()
+        question.rating = initial_rating(question.difficulty)          # bulk_create skips the pre_save signal that sets both
+        return question
+
+    def insert_batch(self, batch):
+        unique = {}
+        for question in batch:
+            unique.setdefault(question.content_hash, question)       # duplicates inside the batch
+
+        with transaction.atomic():
+            existing = set(QuesModel.objects.filter(content_hash__in=list(unique)).values_list('content_hash', flat=True))
+            new_questions = [question for content_hash, question in unique.items() if content_hash not in existing]
+            QuesModel.objects.bulk_create(new_questions, ignore_conflicts=True)       # the unique content_hash skips questions another import stored meanwhile (still counted as imported)
+
+        self.created += len(new_questions)
+        self.duplicates += len(batch) - len(new_questions)
+        self.difficulties.update(question.difficulty for question in new_questions)
+
+
+def read_jsonl(file):
+    for line, text in enumerate(file, start=1):
+        if not text.strip():
+            continue
+        try:
+            yield line, json.loads(text)
+        except ValueError:
+            yield line, None
+
+
+def read_csv(file):                 # the header row names the columns, e.g. question,op1,op2,op3,op4,ans,difficulty
+    for line, row in enumerate(csv.DictReader(file), start=2):
+        yield line, row
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from quiz.histograms import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the score histograms from the Leaderboard table, e.g. after scores were changed in the admin.'
+
+    def handle(self, *args, **options):
+        buckets = rebuild()
+        self.stdout.write(self.style.SUCCESS('Score histograms rebuilt (%d buckets).' % buckets))
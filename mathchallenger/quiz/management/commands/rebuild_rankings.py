@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from quiz.ranking import get_ranking, best_scores
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the player rankings from the Leaderboard table, e.g. after scores were deleted in the admin.'
+
+    def handle(self, *args, **options):
+        ranking = get_ranking()
+        ranking.rebuild(best_scores())
+        self.stdout.write(self.style.SUCCESS('Rankings rebuilt.'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from quiz.analytics import rollup_question_stats
+
+
+class Command(BaseCommand):
+    help = 'Adds the answers logged since the last run to the per-question statistics. Run it regularly, e.g. every minute from cron.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='answers per transaction (default: ROLLUP_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        count = rollup_question_stats(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Rolled up %d answers.' % count))
@@ -0,0 +1,213 @@
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+
+# Per-request metrics, exported in the Prometheus text format at /metrics.
+# Every thread writes only to its own counters, so recording a request takes no lock. The counters of all
+# threads are added up when /metrics is read. When a thread ends (the servers replace their threads now and then),
+# its counters are added to those of the ended threads and dropped, so the threads kept track of don't pile up. With several worker processes (gunicorn), every process
+# dumps its counters to METRICS_MULTIPROC_DIR about once per second and /metrics adds up all the files.
+
+HISTOGRAMS = {                  # name -> (help text, upper bounds of the buckets)
+    'request_duration_seconds': ('Request latency per URL name.',
+                                 (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)),
+    'request_sql_queries': ('SQL queries per request and URL name.',
+                            (0, 1, 2, 3, 5, 10, 20, 50, 100)),
+    'request_sql_duration_seconds': ('Time spent in SQL queries per request and URL name.',
+                                     (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)),
+    'response_size_bytes': ('Response body size per URL name.',
+                            (1000, 5000, 10000, 50000, 100000, 500000, 1000000)),
+}
+PREFIX = 'mathchallenger_'
+
+_local = threading.local()
+_stores = {}                                # id -> the counters of every running thread that served a request
+_retired = {}                               # the counters of the threads that ended, added up
+_stores_lock = threading.Lock()             # only taken the first and the last time a thread records a request
+_dump_lock = threading.Lock()
+_last_dump = [0.0]
+_current_sql = contextvars.ContextVar('quiz_metrics_sql', default=None)     # [query count, seconds] of the running request
+
+
+class _Owner:                    # kept in the thread-local, collected when the thread ends
+    __slots__ = ('store', '__weakref__')
+
+
+def _thread_store():
+    owner = getattr(_local, 'owner', None)
+    if owner is None:
+        owner = _Owner()
+        owner.store = {}
+        with _stores_lock:
+            _stores[id(owner.store)] = owner.store
+        weakref.finalize(owner, _retire, owner.store)
+        _local.owner = owner
+    return owner.store
+
+
+def _retire(store):
+    with _stores_lock:
+        _stores.pop(id(store), None)
+        for key, series in store.items():
+            merge(_retired, key, series)
+
+
+def observe(store, name, url_name, value):
+    series = store.get((name, url_name))
+    if series is None:
+        series = store[(name, url_name)] = [0] * (len(HISTOGRAMS[name][1]) + 3)     # bucket counts incl. +Inf, sum, count
+    series[bisect_left(HISTOGRAMS[name][1], value)] += 1
+    series[-2] += value
+    series[-1] += 1
+
+
+def record(url_name, seconds, queries, sql_seconds, size):
+    store = _thread_store()
+    observe(store, 'request_duration_seconds', url_name, seconds)
+    observe(store, 'request_sql_queries', url_name, queries)
+    observe(store, 'request_sql_duration_seconds', url_name, sql_seconds)
+    observe(store, 'response_size_bytes', url_name, size)
+    if settings.METRICS_MULTIPROC_DIR and time.monotonic() - _last_dump[0] > 1.0:
+        dump()
+
+
+def sql_wrapper(execute, sql, params, many, context):           # installed on every database connection
+    counter = _current_sql.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        counter[0] += 1
+        counter[1] += time.perf_counter() - start
+
+
+@receiver(connection_created)
+def install_sql_wrapper(sender, connection, **kwargs):
+    if sql_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_wrapper)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = [0, 0.0]
+        token = _current_sql.set(counter)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_sql.reset(token)
+        self.finish(request, response, time.perf_counter() - start, counter)
+        return response
+
+    async def __acall__(self, request):
+        counter = [0, 0.0]
+        token = _current_sql.set(counter)           # sync_to_async copies the context, so queries in ORM threads are counted too
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_sql.reset(token)
+        self.finish(request, response, time.perf_counter() - start, counter)
+        return response
+
+    def finish(self, request, response, seconds, counter):
+        match = request.resolver_match
+        url_name = match.url_name if match is not None and match.url_name else 'unmatched'
+        size = 0 if response.streaming else len(response.content)
+        record(url_name, seconds, counter[0], counter[1], size)
+
+
+def snapshot():                 # the counters of this process: {(name, url_name): series}
+    totals = {}
+    with _stores_lock:                          # a thread's counters are either in _stores or in _retired
+        for key, series in _retired.items():
+            merge(totals, key, series)
+        for store in _stores.values():
+            for key, series in list(store.items()):
+                merge(totals, key, series)
+    return totals
+
+
+def merge(totals, key, series):
+    current = totals.get(key)
+    if current is None:
+        totals[key] = list(series)
+    else:
+        for i, value in enumerate(series):
+            current[i] += value
+
+
+def dump():                     # writes the counters of this process for the other workers' /metrics
+    if not _dump_lock.acquire(blocking=False):
+        return                                  # another thread of this process is already writing the file
+    try:
+        _last_dump[0] = time.monotonic()
+        path = os.path.join(settings.METRICS_MULTIPROC_DIR, 'metrics-%d.json' % os.getpid())
+        data = [[name, url_name, series] for (name, url_name), series in snapshot().items()]
+        with open(path + '.tmp', 'w') as file:
+            json.dump(data, file)
+        os.replace(path + '.tmp', path)         # readers never see a half written file
+    finally:
+        _dump_lock.release()
+
+
+def collect():
+    if not settings.METRICS_MULTIPROC_DIR:
+        return snapshot()
+    dump()
+    totals = {}
+    for path in glob.glob(os.path.join(settings.METRICS_MULTIPROC_DIR, 'metrics-*.json')):
+        try:
+            with open(path) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            continue
+        for name, url_name, series in data:
+            if name in HISTOGRAMS:
+                merge(totals, (name, url_name), series)
+    return totals
+
+
+def render_prometheus(totals):
+    lines = []
+    for name, (help_text, bounds) in HISTOGRAMS.items():
+        lines.append('# HELP %s%s %s' % (PREFIX, name, help_text))
+        lines.append('# TYPE %s%s histogram' % (PREFIX, name))
+        for (series_name, url_name), series in sorted(totals.items()):
+            if series_name != name:
+                continue
+            label = url_name.replace('\\', '\\\\').replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(list(bounds) + ['+Inf'], series[:-2]):       # Prometheus buckets count everything up to their bound
+                cumulative += count
+                lines.append('%s%s_bucket{url_name="%s",le="%s"} %d' % (PREFIX, name, label, bound, cumulative))
+            lines.append('%s%s_sum{url_name="%s"} %s' % (PREFIX, name, label, repr(float(series[-2]))))
+            lines.append('%s%s_count{url_name="%s"} %d' % (PREFIX, name, label, series[-1]))
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    return HttpResponse(render_prometheus(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
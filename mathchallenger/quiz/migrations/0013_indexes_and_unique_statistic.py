@@ -0,0 +1,46 @@
+# Generated by Django 5.0.6 on 2026-10-17 17:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def merge_duplicate_statistics(apps, schema_editor):       # concurrent submissions could create several rows per player and difficulty, merge them before adding the constraint
+    Statistic = apps.get_model('quiz', 'Statistic')
+    duplicates = (Statistic.objects.values('user', 'difficulty')
+                  .annotate(rows=models.Count('id')).filter(rows__gt=1))
+    for duplicate in duplicates:
+        rows = list(Statistic.objects.filter(user=duplicate['user'], difficulty=duplicate['difficulty']).order_by('id'))
+        kept = rows[0]
+        entries = sum(row.entries for row in rows)
+        kept.average = sum(row.average * row.entries for row in rows) // max(entries, 1)
+        kept.entries = entries
+        kept.save()
+        Statistic.objects.filter(id__in=[row.id for row in rows[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0012_quizattempt'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['difficulty', '-score', '-id'], name='leaderboard_difficulty_score'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['-score', '-id'], name='leaderboard_score'),
+        ),
+        migrations.AddIndex(
+            model_name='quesmodel',
+            index=models.Index(fields=['difficulty', 'id'], name='quesmodel_difficulty_id'),
+        ),
+        migrations.RunPython(merge_duplicate_statistics, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='statistic',
+            constraint=models.UniqueConstraint(fields=('user', 'difficulty'), name='statistic_user_difficulty'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.6 on 2026-10-17 17:17
+
+from django.db import migrations, models
+
+
+def average_to_score_sum(apps, schema_editor):          # the old average was only an approximation, the best we can do is average * entries
+    Statistic = apps.get_model('quiz', 'Statistic')
+    Statistic.objects.update(score_sum=models.F('average') * models.F('entries'))
+
+
+def score_sum_to_average(apps, schema_editor):
+    Statistic = apps.get_model('quiz', 'Statistic')
+    for statistic in Statistic.objects.all():
+        statistic.average = statistic.score_sum // max(statistic.entries, 1)
+        statistic.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0013_indexes_and_unique_statistic'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statistic',
+            name='score_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(average_to_score_sum, score_sum_to_average),
+        migrations.RemoveField(
+            model_name='statistic',
+            name='average',
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.6 on 2026-10-17 17:19
+
+import hashlib
+from django.db import migrations, models
+
+
+def fill_content_hash(apps, schema_editor):         # same hash as QuesModel.make_content_hash, historical models have no custom methods
+    QuesModel = apps.get_model('quiz', 'QuesModel')
+    questions = []
+    for question in QuesModel.objects.all().iterator():
+        content = '\x1f'.join(field or '' for field in [question.question, question.op1, question.op2, question.op3,
+                                                          question.op4, question.ans, question.difficulty])
+        question.content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        questions.append(question)
+    QuesModel.objects.bulk_update(questions, ['content_hash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0014_statistic_score_sum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quesmodel',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(fill_content_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0015_quesmodel_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizattempt',
+            name='seed',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def install_search(apps, schema_editor):
+    from quiz import search
+    search.install(schema_editor.connection)
+
+
+def uninstall_search(apps, schema_editor):
+    from quiz import search
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0016_quizattempt_seed'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),       # FTS5 table and triggers on SQLite, GIN index on PostgreSQL
+    ]
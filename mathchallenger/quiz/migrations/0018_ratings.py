@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-17 18:01
+
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, FloatField, Value
+
+
+START_RATINGS = {'beginner': 1000, 'medium': 1200, 'advanced': 1400, 'human_calculator': 1600}     # as in quiz/ratings.py
+
+
+def fill_question_ratings(apps, schema_editor):     # the start rating of the difficulty, spread by less than a point like ratings.initial_rating does
+    QuesModel = apps.get_model('quiz', 'QuesModel')
+    for difficulty, rating in START_RATINGS.items():
+        spread = ExpressionWrapper((F('id') * 7919 % 1000) / Value(1000.0) + Value(rating - 0.5), output_field=FloatField())
+        QuesModel.objects.filter(difficulty=difficulty, rating=None).update(rating=spread)
+    QuesModel.objects.filter(rating=None).update(rating=1200)
+
+
+def replace_search_triggers(apps, schema_editor):   # the update trigger now only fires for the searched columns, not for rating updates
+    if schema_editor.connection.vendor == 'sqlite':
+        from quiz import search
+        search.install_triggers(schema_editor.connection, replace=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0017_question_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='rating',
+            field=models.FloatField(default=1200),
+        ),
+        migrations.AddField(
+            model_name='quesmodel',
+            name='rating',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(replace_search_triggers, migrations.RunPython.noop),
+        migrations.RunPython(fill_question_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.0.6 on 2026-10-17 18:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0019_answer_events'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leaderboard',
+            name='created_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),      # the existing scores keep null, their time is unknown
+        ),
+        migrations.AlterField(
+            model_name='leaderboard',
+            name='created_at',
+            field=models.DateTimeField(blank=True, db_index=True, default=django.utils.timezone.now, null=True),
+        ),
+        migrations.CreateModel(
+            name='PeriodScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Today'), ('week', 'This week')], max_length=4)),
+                ('start', models.DateField()),
+                ('difficulty', models.CharField(max_length=20)),
+                ('best', models.IntegerField()),
+                ('total', models.IntegerField()),
+                ('entries', models.IntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'start', 'difficulty', '-best', '-id'], name='periodscore_best')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='periodscore',
+            constraint=models.UniqueConstraint(fields=('period', 'start', 'difficulty', 'user'), name='periodscore_player'),
+        ),
+    ]
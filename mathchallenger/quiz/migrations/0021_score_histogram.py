@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-17 18:36
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_histograms(apps, schema_editor):           # the buckets of the scores saved so far, like histograms.rebuild
+    Leaderboard = apps.get_model('quiz', 'Leaderboard')
+    ScoreHistogram = apps.get_model('quiz', 'ScoreHistogram')
+    buckets = (Leaderboard.objects.exclude(difficulty=None).values('difficulty', 'score')
+               .annotate(count=Count('id')).values_list('difficulty', 'score', 'count'))
+    ScoreHistogram.objects.bulk_create([ScoreHistogram(difficulty=difficulty, score=score, count=count)
+                                        for difficulty, score, count in buckets])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0020_period_scores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreHistogram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('difficulty', models.CharField(max_length=20)),
+                ('score', models.IntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='scorehistogram',
+            constraint=models.UniqueConstraint(fields=('difficulty', 'score'), name='scorehistogram_bucket'),
+        ),
+        migrations.RunPython(fill_histograms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 19:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0021_score_histogram'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='statistic',
+            name='score_sum',
+            field=models.FloatField(default=0),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.6 on 2026-10-17 19:10
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):          # keeps the oldest copy of every question, its answers and counters include the copies'
+    QuesModel = apps.get_model('quiz', 'QuesModel')
+    AnswerEvent = apps.get_model('quiz', 'AnswerEvent')
+    QuestionStats = apps.get_model('quiz', 'QuestionStats')
+    groups = (QuesModel.objects.exclude(content_hash=None).values('content_hash')
+              .annotate(copies=Count('id'), keep=Min('id')).filter(copies__gt=1))
+    for group in groups:
+        duplicates = list(QuesModel.objects.filter(content_hash=group['content_hash']).exclude(id=group['keep']).values_list('id', flat=True))
+        AnswerEvent.objects.filter(question_id__in=duplicates).update(question_id=group['keep'])
+        copies = list(QuestionStats.objects.filter(question_id__in=duplicates))
+        if copies:
+            stats, created = QuestionStats.objects.get_or_create(question_id=group['keep'])
+            for copy in copies:
+                stats.attempts += copy.attempts
+                stats.correct += copy.correct
+                stats.total_seconds += copy.total_seconds
+            stats.correct_rate = stats.correct / stats.attempts if stats.attempts else 0
+            stats.save()
+        QuesModel.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0022_statistic_exact_score_sum'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
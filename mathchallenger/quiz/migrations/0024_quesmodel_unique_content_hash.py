@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0023_quesmodel_merge_duplicates'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='quesmodel',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0024_quesmodel_unique_content_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='quizattempt',
+            name='difficulty',
+            field=models.CharField(choices=[('beginner', 'Beginner'), ('medium', 'Medium'), ('advanced', 'Advanced'), ('human_calculator', 'Human Calculator'), ('adaptive', 'Adaptive')], max_length=20),
+        ),
+    ]
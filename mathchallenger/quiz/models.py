@@ -1,10 +1,14 @@
+import hashlib
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class Profile(models.Model):
     SELECTION = (("teacher","Teacher"),("student","Student"))
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     user_type = models.CharField(max_length=8, choices=SELECTION)
+    rating = models.FloatField(default=1200)            # Elo rating of a student, see quiz/ratings.py
 
     def __str__(self):
         return self.user.username + '\' profile'
@@ -14,12 +18,56 @@ class Leaderboard(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     score = models.IntegerField()
     difficulty = models.CharField(max_length=20, null=True)
+    created_at = models.DateTimeField(default=timezone.now, null=True, blank=True, db_index=True)      # null for scores saved before it was recorded
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['difficulty', '-score', '-id'], name='leaderboard_difficulty_score'),   # leaderboard filtered by difficulty
+            models.Index(fields=['-score', '-id'], name='leaderboard_score'),                           # leaderboard of all difficulties
+        ]
 
     def __str__(self):
         return self.user.username + '\' scores'
 
 
 
+class ScoreHistogram(models.Model):         # number of Leaderboard scores per difficulty and score (one row per bucket), kept by quiz/histograms.py
+    difficulty = models.CharField(max_length=20)
+    score = models.IntegerField()                       # scores are multiples of 10, so a difficulty has at most a few dozen buckets
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['difficulty', 'score'], name='scorehistogram_bucket'),
+        ]
+
+    def __str__(self):
+        return '%s %d: %d' % (self.difficulty, self.score, self.count)
+
+
+class PeriodScore(models.Model):            # best and total score of a player per day and per ISO week, kept by quiz/periods.py
+    PERIODS = (('day', 'Today'), ('week', 'This week'))
+    period = models.CharField(max_length=4, choices=PERIODS)
+    start = models.DateField()                          # the day, or the Monday of the week
+    difficulty = models.CharField(max_length=20)        # 'all' for the scores of all difficulties
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    best = models.IntegerField()
+    total = models.IntegerField()
+    entries = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'start', 'difficulty', 'user'], name='periodscore_player'),     # one row per player and period
+        ]
+        indexes = [
+            models.Index(fields=['period', 'start', 'difficulty', '-best', '-id'], name='periodscore_best'),          # top players of a period
+        ]
+
+    def __str__(self):
+        return self.user.username + '\' %s scores' % self.period
+
+
+
 class QuesModel(models.Model):
     SELECTION = (
         ('beginner', 'Beginner'),
@@ -34,17 +82,104 @@ class QuesModel(models.Model):
     op4 = models.CharField(max_length=200, null=True)
     ans = models.CharField(max_length=200, null=True)
     difficulty = models.CharField(max_length=20, choices=SELECTION, default='beginner')
+    content_hash = models.CharField(max_length=64, null=True, blank=True, editable=False, unique=True)       # the same question can't be stored twice
+    rating = models.FloatField(null=True, blank=True, db_index=True)       # Elo rating of the question, adaptive quizzes pick questions near the student's rating
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['difficulty', 'id'], name='quesmodel_difficulty_id'),      # question ids of one difficulty are read straight from the index
+        ]
+
     def __str__(self):
         return self.question
 
+    def make_content_hash(self):
+        content = '\x1f'.join(field or '' for field in
+                               [self.question, self.op1, self.op2, self.op3, self.op4, self.ans, self.difficulty])
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def clean(self):                        # the admin's forms don't check content_hash, which they don't edit
+        duplicates = QuesModel.objects.filter(content_hash=self.make_content_hash()).exclude(pk=self.pk)
+        if duplicates.exists():
+            raise ValidationError('This question already exists!')
+
+    def validation_errors(self):            # the rules a teacher's question has to follow, shared by add_question and the import command
+        errors = []
+        if self.ans not in [self.op1, self.op2, self.op3, self.op4]:
+            errors.append('Submitted answer must match an option!')
+        if any(field in ['', None] for field in [self.question, self.op1, self.op2, self.op3, self.op4]):
+            errors.append('Please enter values for all fields!')
+        if self.difficulty not in dict(self.SELECTION):
+            errors.append('Unknown difficulty!')
+        return errors
+
 
 class Statistic(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    average = models.IntegerField()
+    score_sum = models.FloatField(default=0)            # sum of the exact percentages of all quizzes played, the average is derived from it and rounded for display
     entries = models.IntegerField()
     difficulty = models.CharField(max_length=20, null=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'difficulty'], name='statistic_user_difficulty'),     # one row per player and difficulty
+        ]
+
+    @property
+    def average(self):
+        if not self.entries:
+            return 0
+        return round(self.score_sum / self.entries)
+
     def __str__(self):
         return self.user.username + '\' stats'
 
 
+
+class QuizAttempt(models.Model):
+    SELECTION = QuesModel.SELECTION + (('adaptive', 'Adaptive'),)         # quiz.ratings.ADAPTIVE, questions of every difficulty
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    difficulty = models.CharField(max_length=20, choices=SELECTION)
+    question_ids = models.JSONField()                               # ids of the drawn questions, in the order they were shown
+    seed = models.BigIntegerField(null=True, blank=True)            # set for quizzes from quiz.generator, their questions are not stored
+    started_at = models.DateTimeField(auto_now_add=True)
+    submitted_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.user.username + '\' attempt'
+
+
+class AnswerEvent(models.Model):            # append-only log of the answers to stored questions, rows are never updated
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    question_id = models.IntegerField()                 # no foreign key, the log keeps the answers to deleted questions
+    correct = models.BooleanField()
+    seconds = models.FloatField()                       # time of the quiz divided by its number of logged answers
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.user.username + '\' answer'
+
+
+class QuestionStats(models.Model):          # counters per question, rolled up from AnswerEvent by quiz/analytics.py
+    question = models.OneToOneField(QuesModel, on_delete=models.CASCADE, primary_key=True)
+    attempts = models.IntegerField(default=0)
+    correct = models.IntegerField(default=0)
+    total_seconds = models.FloatField(default=0)
+    correct_rate = models.FloatField(default=0, db_index=True)     # stored, so the hardest and easiest questions are read from the index
+
+    @property
+    def mean_seconds(self):
+        if not self.attempts:
+            return 0
+        return self.total_seconds / self.attempts
+
+    def __str__(self):
+        return str(self.question) + ' stats'
+
+
+class RollupMark(models.Model):             # how far a rollup has read an append-only log (its high-water mark)
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,94 @@
+from datetime import datetime, time, timedelta
+from django.db import connection, transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+from .database import lock_tables
+from .models import Leaderboard, PeriodScore
+
+
+# Leaderboards of the current day and ISO week. Every submission adds its score to a PeriodScore row per period,
+# for its difficulty and for 'all' (one upsert for all four rows), so the top players of a period are read from one small table through the
+# periodscore_best index instead of scanning the timestamps of all scores. Days are those of TIME_ZONE.
+# Scores changed or deleted in the admin have the rows of their player and periods computed again (quiz/signals.py).
+# compact_leaderboards deletes the rows of past periods and can rebuild the table from the Leaderboard table.
+
+PERIODS = ['day', 'week']
+PERIOD_LENGTHS = {'day': timedelta(days=1), 'week': timedelta(days=7)}
+ALL = 'all'
+
+
+def period_starts(moment=None):            # {'day': the date, 'week': the Monday of its ISO week}
+    day = timezone.localdate(moment)
+    return {'day': day, 'week': day - timedelta(days=day.weekday())}
+
+
+def period_stamp(start):            # the start of a period in nanoseconds, like the version stamps, for the validators of its pages
+    return int(timezone.make_aware(datetime.combine(start, time.min)).timestamp()) * 10 ** 9
+
+
+def period_totals(scores):          # scores: (user_id, difficulty, score, created_at) -> {(period, start, difficulty, user_id): [best, total, entries]}
+    totals = {}
+    for user_id, difficulty, score, created_at in scores:
+        for period, start in period_starts(created_at).items():
+            for board in [difficulty, ALL]:
+                row = totals.setdefault((period, start, board, user_id), [score, 0, 0])
+                row[0] = max(row[0], score)
+                row[1] += score
+                row[2] += 1
+    return totals
+
+
+def add_period_scores(scores, batch_size=500):     # called in the transaction of the submission, one INSERT ... ON CONFLICT DO UPDATE per batch_size rows
+    totals = sorted(period_totals(scores).items())          # always the same order, so concurrent batches can't deadlock
+    table = connection.ops.quote_name(PeriodScore._meta.db_table)
+    for first in range(0, len(totals), batch_size):
+        batch = totals[first:first + batch_size]
+        sql = ('INSERT INTO {table} (period, start, difficulty, user_id, best, total, entries) VALUES {values} '
+               'ON CONFLICT (period, start, difficulty, user_id) DO UPDATE SET '          # the same on SQLite and PostgreSQL
+               'best = CASE WHEN excluded.best > {table}.best THEN excluded.best ELSE {table}.best END, '
+               'total = {table}.total + excluded.total, entries = {table}.entries + excluded.entries'      # computed by the database, so no update can be lost
+               ).format(table=table, values=', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(batch)))
+        params = []
+        for (period, start, difficulty, user_id), (best, total, entries) in batch:
+            params += [period, connection.ops.adapt_datefield_value(start), difficulty, user_id, best, total, entries]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
+def refresh_period_scores(user_id, scores):     # scores: (difficulty, created_at) of changed or deleted scores, their rows are computed again
+    rows = set()
+    for difficulty, created_at in scores:
+        if difficulty is not None and created_at is not None:
+            rows.update((period, start, board) for period, start in period_starts(created_at).items() for board in [difficulty, ALL])
+    for period, start, board in sorted(rows):
+        since = timezone.make_aware(datetime.combine(start, time.min))
+        player_scores = Leaderboard.objects.filter(user_id=user_id, created_at__gte=since, created_at__lt=since + PERIOD_LENGTHS[period])
+        player_scores = player_scores.exclude(difficulty=None) if board == ALL else player_scores.filter(difficulty=board)
+        totals = player_scores.aggregate(best=Max('score'), total=Sum('score'), entries=Count('id'))
+        row = PeriodScore.objects.filter(period=period, start=start, difficulty=board, user_id=user_id)
+        if not totals['entries']:
+            row.delete()
+        elif not row.update(**totals):
+            PeriodScore.objects.create(period=period, start=start, difficulty=board, user_id=user_id, **totals)
+
+
+def compact():                      # deletes the rows of the periods that are no longer shown, returns their number
+    deleted = 0
+    for period, start in period_starts().items():
+        deleted += PeriodScore.objects.filter(period=period, start__lt=start).delete()[0]
+    return deleted
+
+
+def rebuild(batch_size=5000):       # the rows of the current periods computed again from the Leaderboard table, e.g. after a bulk update of scores
+    since = timezone.make_aware(datetime.combine(period_starts()['week'], time.min))
+    with transaction.atomic():
+        lock_tables(Leaderboard, PeriodScore)           # a submission meanwhile would be counted twice or not at all
+        PeriodScore.objects.all().delete()
+        scores = (Leaderboard.objects.filter(created_at__gte=since).exclude(difficulty=None)
+                  .values_list('user_id', 'difficulty', 'score', 'created_at'))
+        totals = period_totals(scores.iterator(chunk_size=batch_size))
+        PeriodScore.objects.bulk_create([
+            PeriodScore(period=period, start=start, difficulty=difficulty, user_id=user_id, best=best, total=total, entries=entries)
+            for (period, start, difficulty, user_id), (best, total, entries) in totals.items()
+        ], batch_size=batch_size)
+    return len(totals)
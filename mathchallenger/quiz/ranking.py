@@ -0,0 +1,355 @@
+import random
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Max
+from django.utils.module_loading import import_string
+
+
+# Ranking of the players per difficulty by their best score, for "you are #1,234 of 50,000".
+# Both backends answer insert, top-k, rank of a player and the window around a player in O(log n).
+# Players with the same best score are ordered by their user id in the memory backend; Redis orders
+# them by member name.
+
+class RankingBackend(ABC):
+    @abstractmethod
+    def add(self, difficulty, user_id, score):           # keeps the best score of the player
+        pass
+
+    @abstractmethod
+    def replace(self, difficulty, user_id, score):       # sets the best score of the player, also a lower one; None takes the player out
+        pass
+
+    @abstractmethod
+    def top(self, difficulty, k):                        # [(rank, user_id, score)] of the k best players
+        pass
+
+    @abstractmethod
+    def rank(self, difficulty, user_id):                 # 1 for the best player, None if the player never played
+        pass
+
+    @abstractmethod
+    def around(self, difficulty, user_id, radius):       # [(rank, user_id, score)] from radius players above to radius players below
+        pass
+
+    @abstractmethod
+    def count(self, difficulty):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    def rebuild(self, best_scores):                      # best_scores: iterable of (difficulty, user_id, score)
+        self.clear()
+        for difficulty, user_id, score in best_scores:
+            self.add(difficulty, user_id, score)
+
+    def load(self, best_scores):                         # fills the ranking when a process first uses it
+        self.rebuild(best_scores)
+
+
+class _Node:
+    __slots__ = ('key', 'forward', 'span')
+
+    def __init__(self, key, level):
+        self.key = key
+        self.forward = [None] * level
+        self.span = [0] * level                 # number of nodes skipped by forward[i], which gives the ranks
+
+
+class SkipList:                 # sorted keys with O(log n) insert, delete, rank and lookup by rank
+    MAX_LEVEL = 32
+
+    def __init__(self):
+        self.head = _Node(None, self.MAX_LEVEL)
+        self.level = 1
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def insert(self, key):
+        update = [None] * self.MAX_LEVEL
+        rank = [0] * self.MAX_LEVEL
+        node = self.head
+        for i in range(self.level - 1, -1, -1):
+            rank[i] = 0 if i == self.level - 1 else rank[i + 1]
+            while node.forward[i] is not None and node.forward[i].key < key:
+                rank[i] += node.span[i]
+                node = node.forward[i]
+            update[i] = node
+
+        level = 1
+        while level < self.MAX_LEVEL and random.random() < 0.25:
+            level += 1
+        if level > self.level:
+            for i in range(self.level, level):
+                update[i] = self.head
+                self.head.span[i] = self.length
+            self.level = level
+
+        node = _Node(key, level)
+        for i in range(level):
+            node.forward[i] = update[i].forward[i]
+            update[i].forward[i] = node
+            node.span[i] = update[i].span[i] - (rank[0] - rank[i])
+            update[i].span[i] = rank[0] - rank[i] + 1
+        for i in range(level, self.level):
+            update[i].span[i] += 1
+        self.length += 1
+
+    def delete(self, key):
+        update = [None] * self.MAX_LEVEL
+        node = self.head
+        for i in range(self.level - 1, -1, -1):
+            while node.forward[i] is not None and node.forward[i].key < key:
+                node = node.forward[i]
+            update[i] = node
+        node = node.forward[0]
+        if node is None or node.key != key:
+            return False
+        for i in range(self.level):
+            if update[i].forward[i] is node:
+                update[i].span[i] += node.span[i] - 1
+                update[i].forward[i] = node.forward[i]
+            else:
+                update[i].span[i] -= 1
+        while self.level > 1 and self.head.forward[self.level - 1] is None:
+            self.level -= 1
+        self.length -= 1
+        return True
+
+    def rank(self, key):
+        traversed = 0
+        node = self.head
+        for i in range(self.level - 1, -1, -1):
+            while node.forward[i] is not None and node.forward[i].key <= key:
+                traversed += node.span[i]
+                node = node.forward[i]
+            if node is not self.head and node.key == key:
+                return traversed
+        return None
+
+    def slice(self, start, count):          # the keys from rank start (1-based) on
+        if start < 1 or start > self.length or count < 1:
+            return []
+        traversed = 0
+        node = self.head
+        for i in range(self.level - 1, -1, -1):
+            while node.forward[i] is not None and traversed + node.span[i] <= start:
+                traversed += node.span[i]
+                node = node.forward[i]
+            if traversed == start:
+                break
+        keys = []
+        while node is not None and len(keys) < count:
+            keys.append(node.key)
+            node = node.forward[0]
+        return keys
+
+
+class MemoryRanking(RankingBackend):            # per process, rebuilt from the Leaderboard table when the process starts
+    def __init__(self, **options):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.lists = {}                          # difficulty -> SkipList of (-score, user_id)
+        self.scores = {}                         # difficulty -> {user_id: best score}
+
+    def add(self, difficulty, user_id, score):
+        with self.lock:
+            scores = self.scores.setdefault(difficulty, {})
+            old = scores.get(user_id)
+            if old is not None and old >= score:
+                return
+            skiplist = self.lists.setdefault(difficulty, SkipList())
+            if old is not None:
+                skiplist.delete((-old, user_id))
+            skiplist.insert((-score, user_id))
+            scores[user_id] = score
+
+    def replace(self, difficulty, user_id, score):
+        with self.lock:
+            scores = self.scores.setdefault(difficulty, {})
+            skiplist = self.lists.setdefault(difficulty, SkipList())
+            old = scores.pop(user_id, None)
+            if old is not None:
+                skiplist.delete((-old, user_id))
+            if score is not None:
+                skiplist.insert((-score, user_id))
+                scores[user_id] = score
+
+    def top(self, difficulty, k):
+        return self._window(difficulty, 1, k)
+
+    def rank(self, difficulty, user_id):
+        with self.lock:
+            score = self.scores.get(difficulty, {}).get(user_id)
+            if score is None:
+                return None
+            return self.lists[difficulty].rank((-score, user_id))
+
+    def around(self, difficulty, user_id, radius):
+        rank = self.rank(difficulty, user_id)
+        if rank is None:
+            return []
+        start = max(1, rank - radius)
+        return self._window(difficulty, start, rank + radius - start + 1)
+
+    def count(self, difficulty):
+        return len(self.scores.get(difficulty, {}))
+
+    def _window(self, difficulty, start, count):
+        with self.lock:
+            skiplist = self.lists.get(difficulty)
+            keys = skiplist.slice(start, count) if skiplist is not None else []
+        return [(start + i, user_id, -negative_score) for i, (negative_score, user_id) in enumerate(keys)]
+
+
+# The sorted sets of RedisRanking outlive the processes, so only the first process that finds them missing fills
+# them, holding a lock key (SET NX) meanwhile; the others use what is there. A rebuild writes new sorted sets under
+# temporary keys and then renames them over the old ones in one transaction, so readers never see a half-filled
+# ranking. The first fill merges into the current sets instead, keeping the scores other processes added meanwhile.
+
+class RedisRanking(RankingBackend):             # one sorted set per difficulty, shared by all worker processes
+    BATCH_SIZE = 5000                           # members per ZADD while rebuilding
+    LOCK_TIMEOUT = 600                          # seconds, a process that dies while filling the ranking keeps the lock this long
+
+    def __init__(self, client=None, url=None, prefix='mathchallenger:ranking:', **options):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise ImproperlyConfigured('RedisRanking needs the redis package: pip install redis')
+            client = redis.Redis.from_url(url or 'redis://localhost:6379/0')
+        self.client = client
+        self.prefix = prefix
+
+    def key(self, difficulty):
+        return self.prefix + str(difficulty)
+
+    def add(self, difficulty, user_id, score):
+        self.client.zadd(self.key(difficulty), {str(user_id): score}, gt=True)       # GT: only ever raise a player's score
+
+    def replace(self, difficulty, user_id, score):
+        if score is None:
+            self.client.zrem(self.key(difficulty), str(user_id))
+        else:
+            self.client.zadd(self.key(difficulty), {str(user_id): score})
+
+    def top(self, difficulty, k):
+        return self._window(difficulty, 1, k)
+
+    def rank(self, difficulty, user_id):
+        rank = self.client.zrevrank(self.key(difficulty), str(user_id))
+        return None if rank is None else rank + 1
+
+    def around(self, difficulty, user_id, radius):
+        rank = self.rank(difficulty, user_id)
+        if rank is None:
+            return []
+        start = max(1, rank - radius)
+        return self._window(difficulty, start, rank + radius - start + 1)
+
+    def count(self, difficulty):
+        return self.client.zcard(self.key(difficulty))
+
+    def clear(self):
+        self.client.delete(*[self.key(difficulty) for difficulty in difficulties()])
+
+    def rebuild(self, best_scores):
+        self._build(best_scores, replace=True)
+
+    def load(self, best_scores):
+        if self.client.exists(self.prefix + 'built'):
+            return                              # filled by an earlier process, kept up to date by every add()
+        lock = self.prefix + 'lock'
+        if not self.client.set(lock, 1, nx=True, ex=self.LOCK_TIMEOUT):
+            return                              # another process is filling it
+        try:
+            self._build(best_scores, replace=False)
+        finally:
+            self.client.delete(lock)
+
+    def _build(self, best_scores, replace):
+        temporary = '%srebuild:%s:' % (self.prefix, uuid.uuid4().hex)
+        batches = {}                            # difficulty -> {member: score} not written yet
+        filled = set()
+        for difficulty, user_id, score in best_scores:
+            batch = batches.setdefault(difficulty, {})
+            batch[str(user_id)] = score
+            if len(batch) >= self.BATCH_SIZE:
+                self.client.zadd(temporary + str(difficulty), batch)
+                filled.add(difficulty)
+                batch.clear()
+        for difficulty, batch in batches.items():
+            if batch:
+                self.client.zadd(temporary + str(difficulty), batch)
+                filled.add(difficulty)
+
+        pipeline = self.client.pipeline(transaction=True)       # MULTI/EXEC: all difficulties change at once
+        for difficulty in difficulties() | filled:
+            if difficulty not in filled:
+                if replace:
+                    pipeline.delete(self.key(difficulty))
+            elif replace:
+                pipeline.rename(temporary + str(difficulty), self.key(difficulty))
+            else:
+                pipeline.zunionstore(self.key(difficulty), [self.key(difficulty), temporary + str(difficulty)], aggregate='MAX')
+                pipeline.delete(temporary + str(difficulty))
+        pipeline.set(self.prefix + 'built', 1)
+        pipeline.execute()
+
+    def _window(self, difficulty, start, count):
+        rows = self.client.zrevrange(self.key(difficulty), start - 1, start + count - 2, withscores=True)
+        return [(start + i, int(member), int(score)) for i, (member, score) in enumerate(rows)]
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_ranking():              # the configured backend, filled from the Leaderboard table on first use in this process (see load)
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend = import_string(settings.RANKING_BACKEND)(**settings.RANKING_OPTIONS)
+                backend.load(best_scores())
+                _backend = backend
+    return _backend
+
+
+def reset_ranking():
+    global _backend
+    _backend = None
+
+
+def difficulties():
+    from .models import QuesModel
+    return {difficulty for difficulty, label in QuesModel.SELECTION}
+
+
+def refresh_best_scores(user_id, changed):      # changed: difficulties of scores of the player that were changed or deleted, their best is read again
+    from .models import Leaderboard
+    ranking = get_ranking()
+    for difficulty in set(changed):
+        if difficulty is not None:
+            best = Leaderboard.objects.filter(user_id=user_id, difficulty=difficulty).aggregate(best=Max('score'))['best']
+            ranking.replace(difficulty, user_id, best)
+
+
+def best_scores():
+    from .models import Leaderboard
+    rows = (Leaderboard.objects.exclude(difficulty=None).values('difficulty', 'user_id')
+            .annotate(best=Max('score')).values_list('difficulty', 'user_id', 'best'))
+    return rows.iterator()
+
+
+def player_position(difficulty, user_id):       # (rank, number of players) of a player in a difficulty
+    ranking = get_ranking()
+    return ranking.rank(difficulty, user_id), ranking.count(difficulty)
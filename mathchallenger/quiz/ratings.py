@@ -0,0 +1,52 @@
+import random
+from collections import defaultdict
+from django.db.models import F
+from .models import Profile, QuesModel
+
+
+# Elo ratings of the students and the questions. Every answer is a game between the student and the question:
+# answering correctly wins against the question. A submission moves the student's rating by the sum over its
+# answers and every question by its own answer, so it costs O(answers) and never looks at older submissions.
+
+ADAPTIVE = 'adaptive'           # the quiz "difficulty" of adaptive quizzes, their questions come from all difficulties
+START_RATINGS = {'beginner': 1000, 'medium': 1200, 'advanced': 1400, 'human_calculator': 1600}
+STUDENT_K = 32                  # how far one answer moves a rating
+QUESTION_K = 16                 # questions are answered much more often than a student answers, so they move slower
+
+
+def initial_rating(difficulty):             # the tiny random part keeps questions of the same difficulty in random order in the rating index
+    return START_RATINGS.get(difficulty, 1200) + random.random() - 0.5
+
+
+def expected_score(student_rating, question_rating):        # the probability that the student answers correctly
+    return 1 / (1 + 10 ** ((question_rating - student_rating) / 400))
+
+
+def apply_ratings(submissions):     # submissions: (user_id, difficulty, [(question id, answered correctly)]), question id None for generated questions
+    user_ids = {user_id for user_id, difficulty, outcomes in submissions}
+    question_ids = {question_id for user_id, difficulty, outcomes in submissions for question_id, correct in outcomes if question_id is not None}
+    students = {user_id: (pk, rating) for pk, user_id, rating in Profile.objects.filter(user_id__in=user_ids).values_list('id', 'user_id', 'rating')}
+    questions = dict(QuesModel.objects.filter(id__in=question_ids).exclude(rating=None).values_list('id', 'rating'))
+
+    student_changes = defaultdict(float)
+    question_changes = defaultdict(float)
+    for user_id, difficulty, outcomes in submissions:
+        if user_id not in students:
+            continue
+        student_rating = students[user_id][1]           # all answers of a quiz are rated against the rating before the quiz
+        for question_id, correct in outcomes:
+            if question_id is None:
+                question_rating = START_RATINGS.get(difficulty)         # generated questions are rated by their difficulty
+            else:
+                question_rating = questions.get(question_id)
+            if question_rating is None:
+                continue                                # deleted question
+            surprise = (1 if correct else 0) - expected_score(student_rating, question_rating)
+            student_changes[user_id] += STUDENT_K * surprise
+            if question_id is not None:
+                question_changes[question_id] -= QUESTION_K * surprise
+
+    Profile.objects.bulk_update([Profile(id=students[user_id][0], rating=F('rating') + change)        # F(): concurrent submissions add up
+                                 for user_id, change in student_changes.items()], ['rating'])
+    QuesModel.objects.bulk_update([QuesModel(id=question_id, rating=F('rating') + change)
+                                   for question_id, change in question_changes.items()], ['rating'])
@@ -0,0 +1,111 @@
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import redirect
+from django.utils.deprecation import MiddlewareMixin
+from .models import Profile
+from .versions import get_version, versions_shared
+
+
+# The role of the logged-in user ('teacher' or 'student', None without a Profile) is stored in the session when
+# the user logs in (quiz/signals.py), next to the user id, so the views that check it don't query the Profile table.
+# The stored role carries the version stamp of the user's profile (see quiz.versions), which changes whenever
+# the Profile is saved or deleted (quiz/signals.py). A role with an old stamp is read again from the database.
+# The stamps live in their own cache (settings.CACHES['versions']), so the pages and sessions never push them out.
+# With the cached_db or signed_cookies session engine (MATHCHALLENGER_SESSIONS, see settings.py) the session itself
+# costs no query either, leaving the query for the User.
+#
+# Views are limited to roles with @require_role('teacher'). Anonymous users are sent to the login page without a
+# query (they have no session to read), users of another role or without a Profile (e.g. a superuser made with
+# createsuperuser) to the landing page. The role is resolved at most once per request and kept as request.role.
+# RoleMiddleware checks the role of sync views before any view code runs; async views are checked by the decorator
+# through request.auser(), whose user the view reuses (request.user and request.auser() don't share their cache).
+#
+# A per-process cache (LocMemCache) only sees the profile stamps bumped in its own process, so with it the teacher
+# pages don't trust the stored role and read Profile.user_type again (one query): a teacher made a student in
+# another worker loses the teacher pages right away. The other pages show nothing a role must not see.
+
+VERIFIED_ROLES = ('teacher',)           # views limited to these roles check the role in the database without a shared cache
+
+SESSION_KEY = '_quiz_role'
+
+
+def user_role(request, verify=False):
+    if not hasattr(request, 'role'):
+        request.role = session_role(request.session, request.user, verify)
+    return request.role
+
+
+async def auser_role(request, verify=False):
+    if not hasattr(request, 'role'):
+        user = await request.auser()
+        request.role = await sync_to_async(session_role)(request.session, user, verify) if user.is_authenticated else None     # the session is loaded synchronously, as request.auser() does
+    return request.role
+
+
+def session_role(session, user, verify=False):
+    if not user.is_authenticated:
+        return None                             # without touching the session
+    stored = session.get(SESSION_KEY)
+    if stored is not None and stored[1] == get_version('profile', user.id) and not (verify and not versions_shared()):
+        return stored[0]
+    return store_role(session, user.id)
+
+
+def store_role(session, user_id):
+    version = get_version('profile', user_id)                  # before the query, a change meanwhile makes the stored role old
+    role = Profile.objects.filter(user_id=user_id).values_list('user_type', flat=True).first()
+    if session.get(SESSION_KEY) != [role, version]:            # an unchanged role doesn't save the session again
+        session[SESSION_KEY] = [role, version]
+    return role
+
+
+def verified(roles):
+    return all(role in VERIFIED_ROLES for role in roles)
+
+
+def rejection(request, user):            # the redirect for a user whose role may not see the view
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    return redirect('landing-page')
+
+
+def check_role(request, roles):                 # None if the user may see the view
+    if user_role(request, verified(roles)) in roles:
+        return None
+    return rejection(request, request.user)
+
+
+async def acheck_role(request, roles):
+    if await auser_role(request, verified(roles)) in roles:
+        return None
+    return rejection(request, await request.auser())
+
+
+def require_role(*roles):
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                response = await acheck_role(request, roles)
+                if response is not None:
+                    return response
+                return await view(request, *args, **kwargs)
+        else:
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                response = check_role(request, roles)
+                if response is not None:
+                    return response
+                return view(request, *args, **kwargs)
+        wrapper.required_roles = roles
+        return wrapper
+    return decorator
+
+
+class RoleMiddleware(MiddlewareMixin):          # after AuthenticationMiddleware
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        roles = getattr(view_func, 'required_roles', None)
+        if roles is None or iscoroutinefunction(view_func):
+            return None
+        return check_role(request, roles)       # the decorator then finds request.role
@@ -0,0 +1,105 @@
+import random
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .models import QuesModel
+from .versions import get_version, aget_version
+
+
+_id_index = {}          # difficulty -> (version, list of question ids), kept per process
+DRAW_ATTEMPTS = 3       # random rating points per question of an adaptive quiz, before the band is read in order
+
+
+def quiz_length(difficulty):
+    return settings.QUIZ_LENGTH.get(difficulty, settings.QUIZ_LENGTH_DEFAULT)
+
+
+def question_ids(difficulty):
+    version = get_version('questions', difficulty)
+    cached = _id_index.get(difficulty)
+    if cached is None or cached[0] != version:                # the id list is only reloaded after a question of this difficulty changed
+        ids = list(QuesModel.objects.filter(difficulty=difficulty).values_list('id', flat=True))
+        cached = (version, ids)
+        _id_index[difficulty] = cached
+    return cached[1]
+
+
+def sample_question_ids(difficulty, k=None):
+    ids = question_ids(difficulty)
+    if k is None:
+        k = quiz_length(difficulty)
+    return random.sample(ids, min(k, len(ids)))                # O(k), no table scan and no ORDER BY RANDOM()
+
+
+def sample_questions(difficulty, k=None):
+    ids = sample_question_ids(difficulty, k)
+    rows = QuesModel.objects.filter(difficulty=difficulty).in_bulk(ids)
+    return [rows[pk] for pk in ids if pk in rows]              # keep the drawn order, skip rows deleted or moved to another difficulty since the index was built
+
+
+async def aquestion_ids(difficulty):                          # async versions of the functions above, for the async views
+    version = await aget_version('questions', difficulty)
+    cached = _id_index.get(difficulty)
+    if cached is None or cached[0] != version:
+        ids = [pk async for pk in QuesModel.objects.filter(difficulty=difficulty).values_list('id', flat=True)]
+        cached = (version, ids)
+        _id_index[difficulty] = cached
+    return cached[1]
+
+
+async def asample_question_ids(difficulty, k=None):
+    ids = await aquestion_ids(difficulty)
+    if k is None:
+        k = quiz_length(difficulty)
+    return random.sample(ids, min(k, len(ids)))
+
+
+async def asample_questions(difficulty, k=None):
+    ids = await asample_question_ids(difficulty, k)
+    rows = await QuesModel.objects.filter(difficulty=difficulty).ain_bulk(ids)
+    return [rows[pk] for pk in ids if pk in rows]
+
+
+def sample_adaptive_ids(rating, k):         # questions of any difficulty with a rating near the student's
+    rated = QuesModel.objects.exclude(rating=None)
+    lowest = rated.order_by('rating').values_list('rating', flat=True).first()
+    highest = rated.order_by('-rating').values_list('rating', flat=True).first()
+    if lowest is None:
+        return []
+    band = max(settings.ADAPTIVE_BAND, 1)
+    while True:                                 # the band only grows if it holds fewer questions than the quiz
+        low, high = max(rating - band, lowest), min(rating + band, highest)
+        ids = draw_by_rating(low, high, k)
+        if len(ids) >= k:
+            return ids
+        first = list(QuesModel.objects.filter(rating__gte=low, rating__lte=high)       # did the draws miss, or is the band too small?
+                     .order_by('rating').values_list('id', flat=True)[:k])
+        if len(first) >= k or (low == lowest and high == highest):
+            pool = list(set(ids) | set(first))
+            return random.sample(pool, min(k, len(pool)))
+        band *= 2
+
+
+def draw_by_rating(low, high, k):           # up to k ids drawn at random rating points, one seek of the rating index each
+    ids = []
+    for attempt in range(k * DRAW_ATTEMPTS):
+        point = random.uniform(low, high)
+        if random.random() < 0.5:               # the next question above or below the point, so that the lowest and highest can be drawn too
+            nearest = QuesModel.objects.filter(rating__gte=point, rating__lte=high).order_by('rating')
+        else:
+            nearest = QuesModel.objects.filter(rating__lte=point, rating__gte=low).order_by('-rating')
+        pk = nearest.values_list('id', flat=True).first()
+        if pk is not None and pk not in ids:
+            ids.append(pk)
+            if len(ids) == k:
+                break
+    return ids
+
+
+async def asample_adaptive_ids(rating, k):
+    return await sync_to_async(sample_adaptive_ids)(rating, k)      # one trip to the ORM thread for all the seeks, not one per seek
+
+
+async def asample_adaptive_questions(rating, k):
+    ids = await asample_adaptive_ids(rating, k)
+    rows = await QuesModel.objects.ain_bulk(ids)
+    return [rows[pk] for pk in ids if pk in rows]
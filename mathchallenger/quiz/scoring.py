@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.db.models import F
+from django.utils import timezone
+from .models import Leaderboard, Statistic, QuizAttempt, AnswerEvent
+from .versions import bump_version_on_commit
+from .ranking import get_ranking
+from .ratings import ADAPTIVE, apply_ratings
+from .analytics import answer_events
+from .periods import add_period_scores
+from .histograms import add_scores
+
+
+def record_submission(user, difficulty, score, percent, outcomes=None, seconds=None):       # outcomes: [(question id, answered correctly)] for the ratings and the answer log
+    if settings.SUBMISSION_BUFFER:
+        from .writebehind import get_buffer
+        get_buffer().add(user.id, difficulty, score, percent, outcomes, seconds)        # written to the database by the buffer's next flush
+        if difficulty != ADAPTIVE:
+            get_ranking().add(difficulty, user.id, score)
+        return
+    with transaction.atomic():                  # the leaderboard entry, the statistic, the ratings and the answer log are written together or not at all
+        if difficulty != ADAPTIVE:              # adaptive quizzes mix difficulties, they only change the ratings
+            Leaderboard.objects.create(user=user, score=score, difficulty=difficulty)      # its post_save handler adds it to today's and this week's leaderboards, the histogram and the ranking
+            add_to_statistic(user.id, difficulty, percent)
+        if outcomes:
+            apply_ratings([(user.id, difficulty, outcomes)])
+            AnswerEvent.objects.bulk_create(answer_events(user.id, outcomes, seconds))        # one INSERT for all answers of the quiz
+
+
+def record_submissions(submissions):           # writes a batch of (user_id, difficulty, score, percent[, outcomes[, seconds]]) with one INSERT and one UPDATE per player
+    scored = [submission for submission in submissions if submission[1] != ADAPTIVE]
+    rated = [(submission[0], submission[1], submission[4]) for submission in submissions if len(submission) > 4 and submission[4]]
+    statistics = {}
+    for user_id, difficulty, score, percent, *rest in scored:
+        totals = statistics.setdefault((user_id, difficulty), [0, 0])
+        totals[0] += percent
+        totals[1] += 1
+    with transaction.atomic():
+        entries = Leaderboard.objects.bulk_create([
+            Leaderboard(user_id=user_id, score=score, difficulty=difficulty) for user_id, difficulty, score, percent, *rest in scored
+        ])
+        for (user_id, difficulty), (score_sum, count) in statistics.items():
+            add_to_statistic(user_id, difficulty, score_sum, count)
+        add_period_scores([(entry.user_id, entry.difficulty, entry.score, entry.created_at) for entry in entries])       # one upsert for all players and periods
+        add_scores([(entry.difficulty, entry.score) for entry in entries])
+        for difficulty in {difficulty for user_id, difficulty in statistics} | {'all'}:
+            bump_version_on_commit('leaderboard', difficulty)      # bulk_create sends no post_save signal
+        if rated:
+            apply_ratings(rated)
+            AnswerEvent.objects.bulk_create([event for submission in submissions if len(submission) > 4 and submission[4]
+                                             for event in answer_events(submission[0], submission[4], submission[5] if len(submission) > 5 else None)])
+
+
+def add_to_statistic(user_id, difficulty, score_sum, entries=1):
+    statistics = Statistic.objects.filter(user_id=user_id, difficulty=difficulty)
+    if statistics.update(score_sum=F('score_sum') + score_sum, entries=F('entries') + entries):      # the database adds to the stored values, so no update can be lost
+        bump_version_on_commit('statistics', difficulty)          # update() sends no post_save signal
+        return
+    try:
+        with transaction.atomic():
+            Statistic.objects.create(user_id=user_id, score_sum=score_sum, entries=entries, difficulty=difficulty)     # first quiz of the player at this difficulty
+    except IntegrityError:
+        statistics.update(score_sum=F('score_sum') + score_sum, entries=F('entries') + entries)     # a concurrent submission created the row first
+        bump_version_on_commit('statistics', difficulty)
+
+
+async def aopen_attempt(user, attempt_id):        # the user's attempt that was not submitted yet, with its submission time, or None
+    try:
+        attempt_id = int(attempt_id)
+    except (TypeError, ValueError):
+        return None                             # a missing or malformed id, e.g. from a hand-made form
+    attempt = await QuizAttempt.objects.filter(id=attempt_id, user=user, submitted_at__isnull=True).afirst()
+    if attempt is not None:
+        attempt.submitted_at = timezone.now()   # saved by submit_attempt()
+    return attempt
+
+
+def submit_attempt(attempt, user, score, percent, outcomes=None, seconds=None):        # False if a concurrent request submitted the attempt first
+    with transaction.atomic():                  # a failed write of the score rolls back the claim, so the attempt can be submitted again
+        if not QuizAttempt.objects.filter(id=attempt.id, submitted_at__isnull=True).update(submitted_at=attempt.submitted_at):
+            return False
+        record_submission(user, attempt.difficulty, score, percent, outcomes, seconds)
+    return True
+
+
+def grade(question_ids, answers, selected):     # answers and selected: question id -> correct / chosen answer
+    outcomes = []
+    for question_id in question_ids:
+        if question_id not in answers:
+            continue                            # the question was deleted while the quiz was played
+        outcomes.append((question_id, answers[question_id] == selected.get(question_id)))
+    correct = sum(1 for question_id, right in outcomes if right)
+    total = len(outcomes)
+    return correct * 10, correct, total - correct, total, outcomes          # score, correct, wrong, total, [(question id, answered correctly)]
@@ -0,0 +1,135 @@
+import re
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+from .models import QuesModel
+
+
+# Full-text search over the questions and their options, for the teachers.
+# SQLite: an FTS5 table with the question id as rowid, kept in sync by triggers on quiz_quesmodel, so
+# bulk_create and the import command are covered as well. Some schema changes make Django rebuild the
+# table on SQLite, which drops its triggers, so they are created again after every migrate.
+# PostgreSQL: a GIN index on the tsvector of the question and its options, which PostgreSQL keeps in sync itself.
+# Ranking needs statistics over all matches, so searches with more than SEARCH_CANDIDATES matches are not
+# ranked on SQLite (newest first) and only the newest matches are ranked on PostgreSQL. A word that is in
+# most of the questions then costs as much as a rare one.
+
+FTS_TABLE = 'quiz_quesmodel_fts'
+DOCUMENT = "coalesce({0}question, '') || ' ' || coalesce({0}op1, '') || ' ' || coalesce({0}op2, '') || ' ' || coalesce({0}op3, '') || ' ' || coalesce({0}op4, '')"
+TSVECTOR = "to_tsvector('english', %s)" % DOCUMENT.format('')
+
+SQLITE_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS quiz_quesmodel_fts_insert AFTER INSERT ON quiz_quesmodel BEGIN "
+    "INSERT INTO {table}(rowid, document, difficulty) VALUES (new.id, {new}, new.difficulty); END",
+    "CREATE TRIGGER IF NOT EXISTS quiz_quesmodel_fts_update AFTER UPDATE OF question, op1, op2, op3, op4, difficulty ON quiz_quesmodel BEGIN "
+    "DELETE FROM {table} WHERE rowid = old.id; "
+    "INSERT INTO {table}(rowid, document, difficulty) VALUES (new.id, {new}, new.difficulty); END",
+    "CREATE TRIGGER IF NOT EXISTS quiz_quesmodel_fts_delete AFTER DELETE ON quiz_quesmodel BEGIN "
+    "DELETE FROM {table} WHERE rowid = old.id; END",
+]
+
+
+def install(connection):        # creates the index and fills it with the existing questions (used by migration 0017)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS %s USING fts5(document, difficulty UNINDEXED, prefix='2 3 4')" % FTS_TABLE)       # prefix indexes for the word typed last
+            cursor.execute('DELETE FROM %s' % FTS_TABLE)
+            cursor.execute('INSERT INTO %s(rowid, document, difficulty) SELECT id, %s, difficulty FROM quiz_quesmodel'
+                           % (FTS_TABLE, DOCUMENT.format('')))
+            install_triggers(connection)
+        elif connection.vendor == 'postgresql':
+            cursor.execute('CREATE INDEX IF NOT EXISTS quesmodel_search ON quiz_quesmodel USING GIN ((%s))' % TSVECTOR)
+
+
+def uninstall(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for action in ['insert', 'update', 'delete']:
+                cursor.execute('DROP TRIGGER IF EXISTS quiz_quesmodel_fts_%s' % action)
+            cursor.execute('DROP TABLE IF EXISTS %s' % FTS_TABLE)
+        elif connection.vendor == 'postgresql':
+            cursor.execute('DROP INDEX IF EXISTS quesmodel_search')
+
+
+def install_triggers(connection, replace=False):
+    with connection.cursor() as cursor:
+        if replace:
+            for action in ['insert', 'update', 'delete']:
+                cursor.execute('DROP TRIGGER IF EXISTS quiz_quesmodel_fts_%s' % action)
+        for trigger in SQLITE_TRIGGERS:
+            cursor.execute(trigger.format(table=FTS_TABLE, new=DOCUMENT.format('new.')))
+
+
+@receiver(post_migrate)
+def reinstall_triggers(sender, using='default', **kwargs):
+    target = connections[using]
+    if sender.name == 'quiz' and target.vendor == 'sqlite' and fts_table_exists(target):
+        install_triggers(target)
+
+
+def fts_table_exists(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def fts_query(text):            # the words of the search as an FTS5 query: all of them, the last one may be the start of a word
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    terms = ['"%s"' % word for word in words]
+    if len(words[-1]) > 1:
+        terms[-1] += '*'                        # a single letter would match most of the index
+    return ' '.join(terms)
+
+
+def search_questions(text, difficulty=None, page=1, page_size=20):     # (questions of the page, best match first; is there a next page)
+    offset = (page - 1) * page_size
+    if connection.vendor == 'sqlite':
+        return search_fts(text, difficulty, offset, page_size)
+    if connection.vendor == 'postgresql':
+        if not text.strip():
+            return [], False
+        candidates = "SELECT * FROM quiz_quesmodel WHERE %s @@ websearch_to_tsquery('english', %%s)" % TSVECTOR
+        params = [text]
+        if difficulty:
+            candidates += ' AND difficulty = %s'
+            params.append(difficulty)
+        candidates += ' ORDER BY id DESC LIMIT %s'             # ts_rank reads the tsvector of every row it ranks
+        params += [settings.SEARCH_CANDIDATES, text, page_size + 1, offset]
+        sql = ("SELECT * FROM (%s) q ORDER BY ts_rank(%s, websearch_to_tsquery('english', %%s)) DESC, id DESC LIMIT %%s OFFSET %%s"
+               % (candidates, TSVECTOR))
+        questions = list(QuesModel.objects.raw(sql, params))
+        return questions[:page_size], len(questions) > page_size
+
+    questions = QuesModel.objects.filter(question__icontains=text)          # other databases: no index, only for development
+    if difficulty:
+        questions = questions.filter(difficulty=difficulty)
+    questions = list(questions.order_by('id')[offset:offset + page_size + 1])
+    return questions[:page_size], len(questions) > page_size
+
+
+def search_fts(text, difficulty, offset, page_size):
+    query = fts_query(text)
+    if query is None:
+        return [], False
+    where = '%s MATCH %%s' % FTS_TABLE
+    params = [query]
+    if difficulty:
+        where += ' AND difficulty = %s'
+        params.append(difficulty)
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT rowid FROM %s WHERE %s ORDER BY rowid DESC LIMIT %%s' % (FTS_TABLE, where),
+                       params + [settings.SEARCH_CANDIDATES + 1])
+        ids = [row[0] for row in cursor.fetchall()]
+        if len(ids) > settings.SEARCH_CANDIDATES:
+            ids = ids[:settings.SEARCH_CANDIDATES][offset:offset + page_size + 1]     # bm25 has to read every match, for words that are in most questions the newest come first
+        else:
+            cursor.execute('SELECT rowid FROM %s WHERE %s ORDER BY rank, rowid DESC LIMIT %%s OFFSET %%s' % (FTS_TABLE, where),
+                           params + [page_size + 1, offset])            # rank is FTS5's bm25 score
+            ids = [row[0] for row in cursor.fetchall()]
+    rows = QuesModel.objects.in_bulk(ids)
+    questions = [rows[pk] for pk in ids if pk in rows]
+    return questions[:page_size], len(questions) > page_size
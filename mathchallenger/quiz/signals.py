@@ -0,0 +1,89 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Profile, QuesModel, Leaderboard, Statistic
+from .versions import bump_version_on_commit
+from .ratings import initial_rating
+from .histograms import add_scores, remove_score
+from .periods import add_period_scores, refresh_period_scores
+from .ranking import get_ranking, refresh_best_scores
+from .roles import store_role
+
+
+@receiver(pre_save, sender=QuesModel)
+def set_content_hash(sender, instance, **kwargs):               # also runs for questions loaded from fixtures
+    instance.content_hash = instance.make_content_hash()
+    if instance.rating is None:
+        instance.rating = initial_rating(instance.difficulty)
+
+
+@receiver(pre_save, sender=QuesModel)
+def remember_difficulty(sender, instance, raw=False, **kwargs):
+    if instance.pk is not None and not raw:                         # the stored difficulty, a question moved to another difficulty leaves the old one
+        instance._stored_difficulty = QuesModel.objects.filter(pk=instance.pk).values_list('difficulty', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=QuesModel)
+def question_changed(sender, instance, **kwargs):
+    bump_version_on_commit('questions', instance.difficulty)      # invalidates the cached question ids of this difficulty
+    stored = getattr(instance, '_stored_difficulty', None)
+    if stored is not None and stored != instance.difficulty:
+        bump_version_on_commit('questions', stored)               # and of the difficulty it had before
+
+
+@receiver([post_save, post_delete], sender=Leaderboard)
+def leaderboard_changed(sender, instance, **kwargs):
+    bump_version_on_commit('leaderboard', instance.difficulty)    # the leaderboard pages of this difficulty
+    bump_version_on_commit('leaderboard', 'all')                  # and the leaderboard pages of all difficulties
+
+
+@receiver(pre_save, sender=Leaderboard)
+def remember_score(sender, instance, raw=False, **kwargs):
+    if instance.pk is not None and not raw:                     # an edit in the admin: the periods, bucket and ranking the score was in before
+        instance._stored_score = Leaderboard.objects.filter(pk=instance.pk).values_list('difficulty', 'created_at', 'score').first()
+
+
+@receiver(post_save, sender=Leaderboard)
+def leaderboard_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or (created and instance.difficulty is None):
+        return
+    if created:
+        if instance.created_at is not None:
+            add_period_scores([(instance.user_id, instance.difficulty, instance.score, instance.created_at)])      # today's and this week's leaderboards
+        add_scores([(instance.difficulty, instance.score)])                                   # the score histogram of the difficulty
+        difficulty, user_id, score = instance.difficulty, instance.user_id, instance.score
+        transaction.on_commit(lambda: get_ranking().add(difficulty, user_id, score))       # keep the ranking in sync with the Leaderboard table
+        return
+    stored = getattr(instance, '_stored_score', None)
+    refresh_period_scores(instance.user_id, [(instance.difficulty, instance.created_at)] + ([stored[:2]] if stored else []))
+    if stored is not None and (stored[0], stored[2]) != (instance.difficulty, instance.score):
+        remove_score(stored[0], stored[2])                      # the score moves to another histogram bucket
+        if instance.difficulty is not None:
+            add_scores([(instance.difficulty, instance.score)])
+        user_id, changed = instance.user_id, [instance.difficulty, stored[0]]
+        transaction.on_commit(lambda: refresh_best_scores(user_id, changed))     # a lowered best score moves the player down
+
+
+@receiver(post_delete, sender=Leaderboard)
+def leaderboard_deleted(sender, instance, **kwargs):
+    remove_score(instance.difficulty, instance.score)            # take the score out of its histogram bucket
+    refresh_period_scores(instance.user_id, [(instance.difficulty, instance.created_at)])
+    user_id, changed = instance.user_id, [instance.difficulty]
+    transaction.on_commit(lambda: refresh_best_scores(user_id, changed))
+
+
+@receiver([post_save, post_delete], sender=Statistic)
+def statistic_changed(sender, instance, **kwargs):
+    bump_version_on_commit('statistics', instance.difficulty)     # the participants pages
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def profile_changed(sender, instance, **kwargs):
+    bump_version_on_commit('profile', instance.user_id)          # the role cached in the user's sessions (quiz/roles.py)
+
+
+@receiver(user_logged_in)
+def remember_role(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, 'session'):
+        store_role(request.session, user.id)                    # saved with the new session that login() creates
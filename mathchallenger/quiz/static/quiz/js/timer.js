@@ -0,0 +1,9 @@
+// Counts the seconds since the quiz page was opened, shown in #displayed_timer.
+(function () {
+    const displayTimer = document.getElementById('displayed_timer');
+    let time_counter = 0;
+    setInterval(() => {
+        time_counter += 1;
+        displayTimer.innerHTML = "<b>Timer: " + time_counter + " seconds</b>";
+    }, 1000);
+})();
@@ -0,0 +1,169 @@
+import gzip
+import json
+import mimetypes
+import os
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli           # optional, brotli files are about a quarter smaller than the gzip ones
+except ImportError:
+    brotli = None
+
+
+# Static files without a CDN, for the offline classroom servers.
+# collectstatic copies the files of quiz/static/ to STATIC_ROOT under content-hashed names (bootstrap.min.css ->
+# bootstrap.min.<hash>.css, through ManifestStaticFilesStorage) and writes a .gz and, with brotli installed, a .br
+# file next to every text file. StaticFilesApplication (wsgi.py) serves STATIC_ROOT before Django: it picks the
+# precompressed file the client accepts and lets browsers cache hashed names forever, since their content can't change.
+
+COMPRESSED_EXTENSIONS = ('.css', '.js', '.svg', '.txt', '.html', '.json', '.map', '.xml')
+MIN_SIZE = 256                  # bytes, smaller files gain nothing from compression
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]            # the order of preference
+HASHED_MAX_AGE = 365 * 24 * 3600                        # a year, the longest time HTTP caches honour
+UNHASHED_MAX_AGE = 60                                   # files requested by their plain name can change at the next deployment
+CHUNK_SIZE = 64 * 1024
+
+
+def compress_file(path):            # writes the compressed variants of a text file, returns their paths
+    if not path.endswith(COMPRESSED_EXTENSIONS):
+        return []
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < MIN_SIZE:
+        return []
+    variants = [(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))]      # mtime=0: the same file gives the same bytes
+    if brotli is not None:
+        variants.append((path + '.br', brotli.compress(data, quality=11)))
+    written = []
+    for compressed_path, compressed in variants:
+        if len(compressed) < len(data) * 0.95:
+            with open(compressed_path, 'wb') as f:
+                f.write(compressed)
+            written.append(compressed_path)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def stored_name(self, name):
+        if not self.hashed_files:           # collectstatic has not run (development, tests): the files keep their names
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(paths) | set(self.hashed_files.values())):     # the hashed copies and the originals
+            for compressed_path in compress_file(self.path(name)):
+                yield name, os.path.relpath(compressed_path, self.location), True
+
+
+class StaticFile:
+    def __init__(self, path, immutable):
+        self.path = path
+        self.size = os.path.getsize(path)
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type == 'application/javascript':
+            content_type += '; charset=utf-8'
+        self.headers = [
+            ('Content-Type', content_type),
+            ('Cache-Control', 'public, max-age=%d, immutable' % HASHED_MAX_AGE if immutable else 'public, max-age=%d' % UNHASHED_MAX_AGE),
+        ]
+        tag = '%x-%x' % (int(os.path.getmtime(path)), self.size)
+        self.etag = '"%s"' % tag
+        self.variants = [(encoding, path + suffix, os.path.getsize(path + suffix), '"%s-%s"' % (tag, encoding))     # (Content-Encoding, path, size, ETag)
+                         for encoding, suffix in ENCODINGS if os.path.exists(path + suffix)]
+        if self.variants:
+            self.headers.append(('Vary', 'Accept-Encoding'))
+
+    def choose(self, accept_encoding):      # the smallest variant the client accepts, every variant has its own ETag
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, path, size, etag in self.variants:
+            if encoding in accepted:
+                return encoding, path, size, etag
+        return None, self.path, self.size, self.etag
+
+
+def accepted_encodings(header):
+    accepted = set()
+    for part in header.split(','):
+        encoding, _, params = part.partition(';')
+        params = params.replace(' ', '')
+        if params in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):           # "gzip;q=0" refuses gzip
+            continue
+        accepted.add(encoding.strip().lower())
+    return accepted
+
+
+def etag_matches(header, etag):      # If-None-Match: "*" or a list of tags, compared weakly (a W/ prefix is ignored)
+    if header.strip() == '*':
+        return True
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def find_files(root, prefix):       # url path -> StaticFile for every file in STATIC_ROOT
+    manifest_path = os.path.join(root, ManifestStaticFilesStorage.manifest_name)
+    hashed = set()
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            hashed = set(json.load(f).get('paths', {}).values())
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.endswith(('.gz', '.br')):
+                continue
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, root).replace(os.sep, '/')
+            files[prefix + relative] = StaticFile(path, relative in hashed)
+    return files
+
+
+class StaticFilesApplication:
+    """WSGI middleware serving the collected static files, every other request goes to the Django application.
+
+    The files are listed once when the server starts, restart it after collectstatic.
+    """
+
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        root = root or settings.STATIC_ROOT
+        prefix = prefix or urlsplit(settings.STATIC_URL).path      # nothing to serve if STATIC_URL is on another host
+        self.files = find_files(str(root), '/' + prefix.strip('/') + '/') if root and os.path.isdir(root) else {}
+
+    def __call__(self, environ, start_response):
+        static_file = self.files.get(environ.get('PATH_INFO', ''))
+        if static_file is None or environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            return self.application(environ, start_response)
+        encoding, path, size, etag = static_file.choose(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        headers = static_file.headers + [('ETag', etag)]
+        if etag_matches(environ.get('HTTP_IF_NONE_MATCH', ''), etag):
+            start_response('304 Not Modified', headers)
+            return []
+        headers.append(('Content-Length', str(size)))
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        f = open(path, 'rb')
+        file_wrapper = environ.get('wsgi.file_wrapper')             # sendfile() on gunicorn and uWSGI
+        if file_wrapper is not None:
+            return file_wrapper(f, CHUNK_SIZE)
+        return read_chunks(f)
+
+
+def read_chunks(f):
+    with f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
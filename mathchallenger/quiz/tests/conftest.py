@@ -0,0 +1,14 @@
+import pytest
+from django.core.cache import caches
+from ..ranking import reset_ranking
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():          # cached version stamps must not leak between tests, since every test rolls back its database rows
+    for cache in caches.all():
+        cache.clear()
+    reset_ranking()                 # the in-memory ranking is rebuilt from the (empty) test database on first use
+    yield
+    for cache in caches.all():
+        cache.clear()
+    reset_ranking()
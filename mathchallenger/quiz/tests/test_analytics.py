@@ -0,0 +1,158 @@
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+from ..models import Profile, QuesModel, QuizAttempt, AnswerEvent, QuestionStats, RollupMark
+from ..analytics import rollup_question_stats, rollup_batch, hardest_questions, easiest_questions, MARK, RETRIES
+from ..scoring import record_submission, record_submissions
+
+
+@pytest.fixture(autouse=True)
+def no_delay(settings):
+    settings.ROLLUP_DELAY = 0           # the tests roll up events that were just written
+
+
+@pytest.fixture
+def student():
+    user = User.objects.create_user(username='student', password='password123')
+    Profile.objects.create(user=user, user_type='student')
+    return user
+
+
+@pytest.fixture
+def questions():
+    return [QuesModel.objects.create(question='What is %d + %d?' % (i, i), op1='1', op2='2', op3='3', op4=str(2 * i), ans=str(2 * i),
+                                     difficulty='beginner') for i in range(3, 6)]
+
+
+def log(user, question, correct, count, seconds=10):
+    AnswerEvent.objects.bulk_create([AnswerEvent(user=user, question_id=question.id, correct=correct, seconds=seconds) for _ in range(count)])
+
+
+@pytest.mark.django_db
+def test_submission_logs_its_answers_in_one_insert(student, questions, django_assert_num_queries):
+    outcomes = [(questions[0].id, True), (questions[1].id, False), (None, True)]        # the generated question is not logged
+    record_submission(student, 'beginner', 20, 66, outcomes, seconds=30)
+    events = list(AnswerEvent.objects.order_by('id').values_list('question_id', 'correct', 'seconds'))
+    assert events == [(questions[0].id, True, 15), (questions[1].id, False, 15)]       # the 30 seconds of the quiz, shared by the logged answers
+
+    with django_assert_num_queries(1):
+        AnswerEvent.objects.bulk_create([AnswerEvent(user=student, question_id=q.id, correct=True, seconds=1) for q in questions])
+
+
+@pytest.mark.django_db
+def test_buffered_submissions_log_their_answers(student, questions):
+    record_submissions([[student.id, 'beginner', 10, 100, [[questions[0].id, True]], 4],
+                        [student.id, 'beginner', 0, 0, [[questions[0].id, False]]]])       # spooled before answers were logged: no time
+    assert list(AnswerEvent.objects.order_by('id').values_list('correct', 'seconds')) == [(True, 4), (False, 0)]
+
+
+@pytest.mark.django_db
+def test_rollup_reads_only_new_events(student, questions):
+    log(student, questions[0], True, 3, seconds=6)
+    log(student, questions[0], False, 1, seconds=2)
+    assert rollup_question_stats() == 4
+    stats = QuestionStats.objects.get(question=questions[0])
+    assert (stats.attempts, stats.correct, stats.correct_rate, stats.mean_seconds) == (4, 3, 0.75, 5)
+
+    assert rollup_question_stats() == 0                 # nothing new
+    log(student, questions[0], False, 4, seconds=5)
+    assert rollup_question_stats() == 4
+    stats.refresh_from_db()
+    assert (stats.attempts, stats.correct, stats.correct_rate, stats.mean_seconds) == (8, 3, 0.375, 5)
+    assert RollupMark.objects.get(name=MARK).last_id == AnswerEvent.objects.latest('id').id
+
+
+@pytest.mark.django_db
+def test_rollup_in_batches(student, questions):
+    for question in questions:
+        log(student, question, True, 5)
+    assert rollup_question_stats(batch_size=4) == 15
+    assert sorted(QuestionStats.objects.values_list('attempts', flat=True)) == [5, 5, 5]
+
+
+@pytest.mark.django_db
+def test_rollup_leaves_young_events(settings, student, questions):
+    settings.ROLLUP_DELAY = 60
+    log(student, questions[0], True, 2)
+    assert rollup_question_stats() == 0
+    assert not QuestionStats.objects.exists()
+
+
+@pytest.mark.django_db
+def test_rollup_skips_deleted_questions(student, questions):
+    log(student, questions[0], True, 2)
+    questions[0].delete()
+    assert rollup_question_stats() == 2
+    assert not QuestionStats.objects.exists()
+    assert AnswerEvent.objects.count() == 2             # the log is append-only
+
+
+@pytest.mark.django_db
+def test_rollup_drops_its_batch_when_the_mark_moved(student, questions, monkeypatch):
+    log(student, questions[0], True, 2)
+    RollupMark.objects.create(name=MARK)
+    bulk_create = QuestionStats.objects.bulk_create
+
+    def concurrent_rollup(rows, **kwargs):              # another process rolls up the same events meanwhile
+        RollupMark.objects.filter(name=MARK).update(last_id=AnswerEvent.objects.latest('id').id)
+        return bulk_create(rows, **kwargs)
+    monkeypatch.setattr(QuestionStats.objects, 'bulk_create', concurrent_rollup)
+    assert rollup_batch(10) is None
+    assert not QuestionStats.objects.exists()           # rolled back, the events are not counted twice
+
+
+@pytest.mark.django_db
+def test_rollup_gives_up_to_a_busy_concurrent_rollup(student, questions, monkeypatch):
+    log(student, questions[0], True, 2)
+    calls = []
+
+    def mark_always_moved(batch_size):
+        calls.append(batch_size)
+        return None
+    monkeypatch.setattr('quiz.analytics.rollup_batch', mark_always_moved)
+    assert rollup_question_stats() == 0
+    assert len(calls) == RETRIES + 1
+
+
+@pytest.mark.django_db
+def test_hardest_and_easiest_questions(settings, student, questions):
+    settings.QUESTION_STATS_MIN_ATTEMPTS = 3
+    log(student, questions[0], True, 5)
+    log(student, questions[1], False, 5)
+    log(student, questions[2], False, 2)                # too few answers
+    rollup_question_stats()
+    assert [stats.question_id for stats in hardest_questions()] == [questions[1].id, questions[0].id]
+    assert [stats.question_id for stats in easiest_questions(count=1)] == [questions[0].id]
+    assert hardest_questions('advanced') == []
+
+
+@pytest.mark.django_db
+def test_question_stats_page(student, questions, django_assert_max_num_queries):
+    teacher = User.objects.create_user(username='teacher', password='password123')
+    Profile.objects.create(user=teacher, user_type='teacher')
+    client = Client()
+    client.login(username='teacher', password='password123')
+    log(student, questions[0], False, 10, seconds=12)
+    call_command('rollup_answers')
+
+    with django_assert_max_num_queries(5):              # session, user, profile (teacher pages check the role in the database with a per-process cache) and the two tables, the log is not read
+        response = client.get(reverse('question-stats'))
+    assert response.status_code == 200
+    assert b'What is 3 + 3?' in response.content
+    assert b'12.0 s' in response.content
+
+    client.login(username='student', password='password123')
+    assert client.get(reverse('question-stats')).status_code == 302
+
+
+@pytest.mark.django_db
+def test_play_quiz_logs_answers(student, questions):
+    client = Client()
+    client.login(username='student', password='password123')
+    client.get(reverse('play-quiz'), {'skill': 'beginner'})
+    attempt = QuizAttempt.objects.get(user=student)
+    client.post(reverse('play-quiz'), {'attempt': attempt.id, **{'q%d' % q.id: q.ans for q in questions}})
+    assert sorted(AnswerEvent.objects.values_list('question_id', flat=True)) == sorted(q.id for q in questions)
+    assert all(AnswerEvent.objects.values_list('correct', flat=True))
@@ -0,0 +1,111 @@
+import json
+import pytest
+from django.contrib.auth.models import User
+from django.core import signing
+from django.test import Client
+from django.urls import reverse
+from ..models import Profile, QuesModel, Leaderboard, QuizAttempt
+from ..api import TOKEN_SALT
+from ..generator import generate_questions
+
+
+@pytest.fixture
+def student():
+    user = User.objects.create_user(username='student', password='password123')
+    Profile.objects.create(user=user, user_type='student')
+    client = Client()
+    client.login(username='student', password='password123')
+    return client
+
+
+@pytest.fixture
+def questions():
+    return [
+        QuesModel.objects.create(question='What is 2 + 2?', op1='3', op2='4', op3='5', op4='6', ans='4', difficulty='beginner'),
+        QuesModel.objects.create(question='What is 10 * 5?', op1='40', op2='50', op3='60', op4='70', ans='50', difficulty='beginner'),
+        QuesModel.objects.create(question='What is 5 - 3?', op1='1', op2='2', op3='3', op4='4', ans='2', difficulty='beginner'),
+    ]
+
+
+def post(client, data):
+    return client.post(reverse('api-quiz'), data=json.dumps(data), content_type='application/json')
+
+
+@pytest.mark.django_db
+def test_api_get_quiz(student, questions):
+    response = student.get(reverse('api-quiz'), {'skill': 'beginner'})
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/json'
+
+    data = response.json()
+    assert data['difficulty'] == 'beginner'
+    assert sorted(q['id'] for q in data['questions']) == sorted(q.id for q in questions)
+    question = next(q for q in data['questions'] if q['id'] == questions[0].id)
+    assert question == {'id': questions[0].id, 'question': 'What is 2 + 2?', 'options': ['3', '4', '5', '6']}     # the answer is not sent
+    assert QuizAttempt.objects.get(id=signing.loads(data['attempt'], salt=TOKEN_SALT)).question_ids == [q['id'] for q in data['questions']]
+
+
+@pytest.mark.django_db
+def test_api_submit_quiz(student, questions):
+    data = student.get(reverse('api-quiz'), {'skill': 'beginner'}).json()
+    answers = {str(questions[0].id): 1, str(questions[1].id): 1, str(questions[2].id): 0}      # two right, one wrong
+
+    response = post(student, {'attempt': data['attempt'], 'answers': answers})
+
+    assert response.status_code == 200
+    result = response.json()
+    assert (result['score'], result['correct'], result['wrong'], result['total']) == (20, 2, 1, 3)
+    assert (result['rank'], result['players']) == (1, 1)
+    assert Leaderboard.objects.get().score == 20
+    assert post(student, {'attempt': data['attempt'], 'answers': answers}).status_code == 409       # an attempt is only graded once
+
+
+@pytest.mark.django_db
+def test_api_generated_quiz(student):
+    data = student.get(reverse('api-quiz'), {'skill': 'medium', 'generated': 1}).json()
+    assert len(data['questions']) == 10
+
+    attempt = QuizAttempt.objects.get(id=signing.loads(data['attempt'], salt=TOKEN_SALT))
+    key = {q['id']: [q['op1'], q['op2'], q['op3'], q['op4']].index(q['ans']) for q in generate_questions('medium', attempt.seed, 10)}
+    result = post(student, {'attempt': data['attempt'], 'answers': {str(pk): index for pk, index in key.items()}}).json()
+    assert result['correct'] == 10
+
+
+@pytest.mark.django_db
+def test_api_rejects_bad_requests(student, questions):
+    assert student.get(reverse('api-quiz'), {'skill': 'impossible'}).status_code == 400
+    assert post(student, {'attempt': 'forged', 'answers': {}}).status_code == 400
+    assert post(student, {'answers': {}}).status_code == 400
+    assert post(student, {'attempt': signing.dumps('abc', salt=TOKEN_SALT), 'answers': {}}).status_code == 400
+    assert student.post(reverse('api-quiz'), data='not json', content_type='application/json').status_code == 400
+
+    other = User.objects.create(username='other')
+    attempt = QuizAttempt.objects.create(user=other, difficulty='beginner', question_ids=[questions[0].id])
+    response = post(student, {'attempt': signing.dumps(attempt.id, salt=TOKEN_SALT), 'answers': {}})
+    assert response.status_code == 409          # the attempt of another player
+
+
+@pytest.mark.django_db
+def test_api_requires_student(django_assert_num_queries):
+    with django_assert_num_queries(0):
+        assert Client().get(reverse('api-quiz'), {'skill': 'beginner'}).status_code == 401
+
+    teacher = User.objects.create_user(username='teacher', password='password123')
+    Profile.objects.create(user=teacher, user_type='teacher')
+    client = Client()
+    client.login(username='teacher', password='password123')
+    assert client.get(reverse('api-quiz'), {'skill': 'beginner'}).status_code == 403
+
+
+@pytest.mark.django_db
+def test_api_reads_the_role_from_the_session(student, questions, django_assert_num_queries):
+    student.get(reverse('api-quiz'), {'skill': 'beginner'})                     # caches the question ids
+    with django_assert_num_queries(4):                  # session, user, the drawn questions and the new attempt, no Profile
+        assert student.get(reverse('api-quiz'), {'skill': 'beginner'}).status_code == 200
+
+
+@pytest.mark.django_db
+def test_api_payload_smaller_than_html(student, questions):
+    html = student.get(reverse('play-quiz'), {'skill': 'beginner'})
+    api = student.get(reverse('api-quiz'), {'skill': 'beginner'})
+    assert len(api.content) * 5 < len(html.content)
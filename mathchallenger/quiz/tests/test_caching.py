@@ -0,0 +1,151 @@
+import asyncio
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import Client
+from django.urls import reverse
+from ..caching import cached_page
+from ..models import Leaderboard, Profile, Statistic
+from ..scoring import record_submission
+
+
+@pytest.fixture
+def player():
+    return User.objects.create_user(username='player', password='password123')
+
+
+@pytest.fixture
+def teacher_client():               # the participants page is only shown to teachers
+    teacher = User.objects.create_user(username='teacher', password='password123')
+    Profile.objects.create(user=teacher, user_type='teacher')
+    client = Client()
+    client.login(username='teacher', password='password123')
+    return client
+
+
+@pytest.mark.django_db
+def test_leaderboard_is_served_from_cache(client, player, django_assert_num_queries):
+    Leaderboard.objects.create(user=player, score=50, difficulty='beginner')
+    client.get(reverse('leaderboard'))
+
+    with django_assert_num_queries(0):
+        response = client.get(reverse('leaderboard'))
+    assert 'player' in response.content.decode()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_submission_invalidates_only_its_difficulty(client, player, django_assert_num_queries):
+    client.get(reverse('leaderboard') + '?difficulty=beginner')
+    client.get(reverse('leaderboard') + '?difficulty=medium')
+
+    record_submission(player, 'beginner', 80, 80)
+
+    with django_assert_num_queries(0):
+        client.get(reverse('leaderboard') + '?difficulty=medium')            # other difficulties keep their cached page
+    with django_assert_num_queries(1):
+        response = client.get(reverse('leaderboard') + '?difficulty=beginner')
+    assert 'player' in response.content.decode()
+    assert '80' in client.get(reverse('leaderboard')).content.decode()      # the page of all difficulties was invalidated as well
+
+
+@pytest.mark.django_db(transaction=True)
+def test_participants_invalidated_by_statistic_update(teacher_client, player):
+    client = teacher_client
+    record_submission(player, 'advanced', 100, 100)
+    assert '100%' in client.get(reverse('participants')).content.decode()
+
+    record_submission(player, 'advanced', 50, 50)                   # updates the statistic with update(), which sends no post_save
+
+    assert '75%' in client.get(reverse('participants')).content.decode()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_participants_invalidated_on_admin_edit(teacher_client, player):
+    client = teacher_client
+    statistic = Statistic.objects.create(user=player, score_sum=40, entries=1, difficulty='medium')
+    assert '40%' in client.get(reverse('participants')).content.decode()
+
+    statistic.score_sum = 90
+    statistic.save()
+
+    assert '90%' in client.get(reverse('participants')).content.decode()
+
+
+def test_burst_of_readers_renders_once():           # stampede guard: concurrent misses of the same page cause one render
+    renders = []
+
+    async def render_page():
+        renders.append(1)
+        await asyncio.sleep(0.05)
+        return HttpResponse(b'page')
+
+    async def burst():
+        return await asyncio.gather(*[cached_page('test-page', [1], render_page) for _ in range(20)])
+
+    responses = async_to_sync(burst)()
+
+    assert len(renders) == 1
+    assert all(response.content == b'page' for response in responses)
+
+
+def test_readers_get_previous_copy_while_rendering():
+    async def render(content, delay):
+        await asyncio.sleep(delay)
+        return HttpResponse(content)
+
+    async def scenario():
+        await cached_page('test-page', [1], lambda: render(b'old', 0))
+        slow = asyncio.ensure_future(cached_page('test-page', [2], lambda: render(b'new', 0.05)))      # the data changed, one reader re-renders
+        await asyncio.sleep(0.01)
+        meanwhile = await cached_page('test-page', [2], lambda: render(b'should not render', 0))
+        return meanwhile, await slow
+
+    meanwhile, rendered = async_to_sync(scenario)()
+
+    assert meanwhile.content == b'old'
+    assert rendered.content == b'new'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_leaderboard_not_modified(client, player, django_assert_num_queries):
+    first = client.get(reverse('leaderboard'))
+    etag = first['ETag']
+    assert first['Last-Modified']
+
+    with django_assert_num_queries(0):
+        response = client.get(reverse('leaderboard'), HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response['ETag'] == etag
+    assert client.get(reverse('leaderboard'), HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code == 304
+
+    record_submission(player, 'medium', 60, 60)
+    response = client.get(reverse('leaderboard'), HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200                      # a new score changes the version and with it the ETag
+    assert response['ETag'] != etag
+
+    beginner = client.get(reverse('leaderboard') + '?difficulty=beginner')['ETag']
+    record_submission(player, 'medium', 70, 70)
+    assert client.get(reverse('leaderboard') + '?difficulty=beginner', HTTP_IF_NONE_MATCH=beginner).status_code == 304     # other difficulties keep their ETag
+
+
+@pytest.mark.django_db(transaction=True)
+def test_participants_not_modified(teacher_client, player, django_assert_num_queries):
+    client = teacher_client
+    etag = client.get(reverse('participants'))['ETag']
+    with django_assert_num_queries(3):                  # the session, the user and the profile, for the role check
+        assert client.get(reverse('participants'), HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    record_submission(player, 'advanced', 100, 100)
+    assert client.get(reverse('participants'), HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+@pytest.mark.django_db
+def test_cached_pages_outlive_many_sessions(client, player, django_assert_num_queries):
+    client.get(reverse('leaderboard'))
+    for i in range(1000):                       # more than Django's default MAX_ENTRIES of 300, e.g. cached_db sessions and profile stamps
+        cache.set('filler:%d' % i, i)
+
+    with django_assert_num_queries(0):
+        client.get(reverse('leaderboard'))      # neither the page nor its version stamps were culled
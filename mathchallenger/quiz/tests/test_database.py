@@ -0,0 +1,31 @@
+import pytest
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+
+
+def pragma(cursor, name):
+    cursor.execute('PRAGMA %s' % name)
+    return cursor.fetchone()[0]
+
+
+@pytest.mark.django_db
+def test_sqlite_pragmas_are_set():
+    if connection.vendor != 'sqlite':
+        pytest.skip('SQLite profile only')
+    with connection.cursor() as cursor:
+        assert pragma(cursor, 'synchronous') == 1               # NORMAL
+        assert pragma(cursor, 'cache_size') == -64000
+
+
+@pytest.mark.django_db
+def test_sqlite_file_uses_wal(tmp_path):
+    if connection.vendor != 'sqlite':
+        pytest.skip('SQLite profile only')
+    settings_dict = dict(connection.settings_dict, NAME=str(tmp_path / 'wal.sqlite3'))
+    wrapper = DatabaseWrapper(settings_dict, alias='wal_test')
+    try:
+        with wrapper.cursor() as cursor:
+            assert pragma(cursor, 'journal_mode') == 'wal'     # an in-memory test database can't use WAL, a file can
+            assert pragma(cursor, 'busy_timeout') == 20000
+    finally:
+        wrapper.close()
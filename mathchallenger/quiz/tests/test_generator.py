@@ -0,0 +1,59 @@
+import pytest
+from django.urls import reverse
+from django.contrib.auth.models import User
+from ..models import Profile, QuesModel, QuizAttempt
+from ..generator import generate_questions, answer_key, LEVELS
+
+
+@pytest.mark.parametrize('difficulty', [difficulty for difficulty, label in QuesModel.SELECTION])
+def test_every_difficulty_has_a_generator(difficulty):
+    assert difficulty in LEVELS
+    assert len(generate_questions(difficulty, 1, 5)) == 5
+
+
+def test_same_seed_same_questions():
+    assert generate_questions('medium', 42, 50) == generate_questions('medium', 42, 50)
+    assert generate_questions('medium', 42, 50) != generate_questions('medium', 43, 50)
+
+
+@pytest.mark.parametrize('difficulty', list(LEVELS))
+def test_generated_questions_are_valid(difficulty):          # every question follows the rules of QuesModel.validation_errors
+    for question in generate_questions(difficulty, 7, 500):
+        options = [question['op1'], question['op2'], question['op3'], question['op4']]
+        assert question['ans'] in options
+        assert len(set(options)) == 4                       # the distractors differ from each other and from the answer
+        assert QuesModel(difficulty=difficulty, **{key: value for key, value in question.items() if key != 'id'}).validation_errors() == []
+
+
+def test_answers_are_correct():
+    for question in generate_questions('advanced', 3, 200):
+        expression = question['question'][len('What is '):-1]
+        assert str(int(eval(expression))) == question['ans']
+
+
+def test_answer_key_from_seed():
+    questions = generate_questions('human_calculator', 99, 20)
+    assert answer_key('human_calculator', 99, 20) == {question['id']: question['ans'] for question in questions}
+
+
+@pytest.mark.django_db
+def test_play_generated_quiz(client, settings):
+    settings.QUIZ_LENGTH = {'beginner': 6}
+    user = User.objects.create_user(username='student1', password='password123')
+    Profile.objects.create(user=user, user_type='student')
+    client.login(username='student1', password='password123')
+
+    quiz_url = reverse('play-quiz') + '?skill=beginner&generated=1'
+    response = client.get(quiz_url)
+    attempt = response.context['attempt']
+    assert attempt.seed is not None
+    assert QuesModel.objects.count() == 0                   # no question rows are needed
+
+    answers = {'attempt': attempt.id}
+    for q in response.context['questions']:
+        answers['q%d' % q['id']] = q['ans']
+    submission = client.post(quiz_url, data=answers)
+
+    assert 'Total questions: 6' in submission.content.decode()
+    assert 'Correct answers: 6' in submission.content.decode()
+    assert QuizAttempt.objects.get(id=attempt.id).submitted_at is not None
@@ -0,0 +1,95 @@
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+from ..models import Profile, QuesModel, Leaderboard, QuizAttempt, ScoreHistogram
+from ..histograms import add_scores, score_position
+from ..scoring import record_submission, record_submissions
+
+
+@pytest.fixture
+def player():
+    return User.objects.create(username='player')
+
+
+def histogram(difficulty='beginner'):
+    return dict(ScoreHistogram.objects.filter(difficulty=difficulty).values_list('score', 'count'))
+
+
+@pytest.mark.django_db
+def test_submissions_fill_the_histogram(player):
+    for score in [10, 30, 30, 50]:
+        record_submission(player, 'beginner', score, score)
+    record_submission(player, 'medium', 30, 30)
+    record_submission(player, 'adaptive', 30, 30)
+    record_submissions([[player.id, 'beginner', 50, 50], [player.id, 'beginner', 0, 0]])
+    assert histogram() == {0: 1, 10: 1, 30: 2, 50: 2}
+    assert histogram('medium') == {30: 1}
+    assert histogram('adaptive') == {}
+
+
+@pytest.mark.django_db
+def test_score_position(django_assert_num_queries):
+    add_scores([('beginner', score) for score in [0, 10, 10, 20, 30, 30, 30, 40, 50, 100]])
+    with django_assert_num_queries(1):
+        assert score_position('beginner', 30) == (40, 4, 10)        # 4 of 10 scores are lower, 3 are higher
+    assert score_position('beginner', 100) == (90, 1, 10)
+    assert score_position('beginner', 0) == (0, 10, 10)
+    assert score_position('beginner', 60) == (90, 2, 10)            # a score nobody had before
+    assert score_position('medium', 30) == (None, None, 0)
+    assert score_position('beginner', 30, unwritten=True) == (36, 4, 11)       # the player's own score, not written yet
+    assert score_position('medium', 30, unwritten=True) == (0, 1, 1)
+
+
+@pytest.mark.django_db
+def test_histogram_matches_counting(player):
+    scores = [(i * 37) % 11 * 10 for i in range(200)]
+    Leaderboard.objects.bulk_create([Leaderboard(user=player, score=score, difficulty='advanced') for score in scores])
+    call_command('rebuild_histograms')
+    for score in range(0, 110, 10):
+        lower = Leaderboard.objects.filter(difficulty='advanced', score__lt=score).count()
+        higher = Leaderboard.objects.filter(difficulty='advanced', score__gt=score).count()
+        assert score_position('advanced', score) == (round(lower / 200 * 100), higher + 1, 200)
+
+
+@pytest.mark.django_db
+def test_deleted_scores_leave_the_histogram(player):
+    record_submission(player, 'beginner', 20, 20)
+    record_submission(player, 'beginner', 20, 20)
+    Leaderboard.objects.first().delete()
+    assert histogram() == {20: 1}
+
+
+@pytest.mark.django_db
+def test_edited_scores_move_to_their_new_bucket(player):
+    record_submission(player, 'beginner', 20, 20)
+    record_submission(player, 'beginner', 40, 40)
+    entry = Leaderboard.objects.get(score=40)
+    entry.score = 30                            # e.g. in the admin
+    entry.save()
+    assert histogram() == {20: 1, 30: 1, 40: 0}
+    entry.difficulty = 'medium'
+    entry.save()
+    assert histogram() == {20: 1, 30: 0, 40: 0}
+    assert histogram('medium') == {30: 1}
+    Leaderboard.objects.create(user=player, score=50, difficulty='medium')      # added in the admin
+    assert histogram('medium') == {30: 1, 50: 1}
+
+
+@pytest.mark.django_db
+def test_statistics_page_shows_the_percentile():
+    user = User.objects.create_user(username='student', password='password123')
+    Profile.objects.create(user=user, user_type='student')
+    other = User.objects.create(username='other')
+    for score in [0, 0, 0]:
+        record_submission(other, 'beginner', score, score)
+    question = QuesModel.objects.create(question='What is 2 + 2?', op1='3', op2='4', op3='5', op4='6', ans='4', difficulty='beginner')
+    client = Client()
+    client.login(username='student', password='password123')
+    client.get(reverse('play-quiz'), {'skill': 'beginner'})
+    attempt = QuizAttempt.objects.get(user=user)
+
+    response = client.post(reverse('play-quiz'), {'attempt': attempt.id, 'q%d' % question.id: '4'})
+    assert response.context['beaten'] == 75
+    assert 'This score beats 75% of the 4 quizzes played at this difficulty (#1).' in response.content.decode()
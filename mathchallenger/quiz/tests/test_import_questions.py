@@ -0,0 +1,87 @@
+import json
+import pytest
+from io import StringIO
+from django.core.management import call_command
+from ..models import QuesModel
+from ..sampling import question_ids
+
+
+def write_jsonl(path, rows):
+    path.write_text('\n'.join(json.dumps(row) for row in rows) + '\n')
+    return str(path)
+
+
+def question_row(number, difficulty='beginner', **fields):
+    row = {'question': 'What is %d + %d?' % (number, number), 'op1': str(number), 'op2': str(2 * number),
+           'op3': str(3 * number), 'op4': str(4 * number), 'ans': str(2 * number), 'difficulty': difficulty}
+    row.update(fields)
+    return row
+
+
+def run_import(*args):
+    out = StringIO()
+    err = StringIO()
+    call_command('import_questions', *args, stdout=out, stderr=err)
+    return out.getvalue(), err.getvalue()
+
+
+@pytest.mark.django_db
+def test_import_jsonl_in_batches(tmp_path):
+    path = write_jsonl(tmp_path / 'questions.jsonl', [question_row(i) for i in range(1, 26)])
+
+    out, err = run_import(path, '--batch-size', '10')
+
+    assert QuesModel.objects.count() == 25
+    assert '25 imported' in out
+    assert 'rows/s' in out
+
+
+@pytest.mark.django_db
+def test_import_csv(tmp_path):
+    path = tmp_path / 'questions.csv'
+    path.write_text('question,op1,op2,op3,op4,ans,difficulty\n'
+                    'What is 2 + 2?,3,4,5,6,4,medium\n'
+                    '"What is 1,5 + 1?",2,"2,5",3,4,"2,5",advanced\n')
+
+    run_import(str(path))
+
+    assert QuesModel.objects.filter(difficulty='medium', ans='4').count() == 1
+    assert QuesModel.objects.filter(difficulty='advanced', ans='2,5').count() == 1
+
+
+@pytest.mark.django_db
+def test_import_skips_duplicates(tmp_path):
+    QuesModel.objects.create(**question_row(1))                     # a question a teacher added by hand
+    rows = [question_row(1), question_row(2), question_row(2), question_row(2, difficulty='medium')]
+    path = write_jsonl(tmp_path / 'questions.jsonl', rows)
+
+    out, err = run_import(path)
+    assert '2 imported, 2 duplicates skipped' in out
+
+    out, err = run_import(path)                                   # running the import again adds nothing
+    assert '0 imported, 4 duplicates skipped' in out
+    assert QuesModel.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_import_rejects_invalid_rows(tmp_path):
+    path = tmp_path / 'questions.jsonl'
+    path.write_text(json.dumps(question_row(1, ans='99')) + '\n'        # the answer is not one of the options
+                    + json.dumps(question_row(2, op3='')) + '\n'
+                    + 'not json\n'
+                    + json.dumps(question_row(3)) + '\n')
+
+    out, err = run_import(str(path))
+
+    assert '1 imported' in out
+    assert '3 invalid' in out
+    assert 'line 1: Submitted answer must match an option!' in err
+    assert 'line 2: Please enter values for all fields!' in err
+
+
+@pytest.mark.django_db
+def test_import_invalidates_question_ids(tmp_path):
+    assert question_ids('beginner') == []
+    run_import(write_jsonl(tmp_path / 'questions.jsonl', [question_row(1)]))
+
+    assert len(question_ids('beginner')) == 1
@@ -0,0 +1,56 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Q
+from django.db.utils import IntegrityError
+from ..models import QuesModel, Leaderboard, Statistic
+
+
+pytestmark = pytest.mark.skipif(connection.vendor != 'sqlite', reason='the EXPLAIN output checked here is SQLite specific')
+
+
+def query_plan(queryset):
+    return queryset.explain()           # e.g. 'SEARCH quiz_quesmodel USING COVERING INDEX quesmodel_difficulty_id (difficulty=?)'
+
+
+@pytest.mark.django_db
+def test_question_ids_use_index():              # query of quiz.sampling.question_ids
+    plan = query_plan(QuesModel.objects.filter(difficulty='beginner').values_list('id', flat=True))
+
+    assert 'quesmodel_difficulty_id' in plan
+
+
+@pytest.mark.django_db
+def test_leaderboard_by_difficulty_uses_index():        # query of the leaderboard view with a difficulty filter and a cursor
+    queryset = (Leaderboard.objects.select_related('user').filter(difficulty='beginner')
+                .filter(Q(score__lt=100) | Q(score=100, id__lt=500)).order_by('-score', '-id')[:51])       # the keyset filter of the view
+    plan = query_plan(queryset)
+
+    assert 'leaderboard_difficulty_score' in plan
+    assert 'TEMP B-TREE' not in plan                      # rows come out of the index already sorted
+
+
+@pytest.mark.django_db
+def test_leaderboard_all_difficulties_uses_index():
+    plan = query_plan(Leaderboard.objects.select_related('user').order_by('-score', '-id')[:51])
+
+    assert 'leaderboard_score' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+@pytest.mark.django_db
+def test_statistic_lookup_uses_index():                 # the statistic of a player is fetched on every quiz submission
+    user = User.objects.create(username='statuser')
+    plan = query_plan(Statistic.objects.filter(user=user, difficulty='beginner'))
+
+    assert 'USING INDEX' in plan                          # SQLite backs the unique constraint with its own automatic index
+    assert 'user_id=? AND difficulty=?' in plan
+
+
+@pytest.mark.django_db
+def test_statistic_unique_per_user_and_difficulty():
+    user = User.objects.create(username='statuser')
+    Statistic.objects.create(user=user, score_sum=50, entries=1, difficulty='beginner')
+
+    with pytest.raises(IntegrityError):
+        Statistic.objects.create(user=user, score_sum=70, entries=1, difficulty='beginner')
@@ -0,0 +1,79 @@
+import gc
+import re
+import threading
+import pytest
+from django.urls import reverse
+from .. import metrics
+
+
+def metric_value(text, line_start):
+    for line in text.splitlines():
+        if line.startswith(line_start):
+            return float(line.rsplit(' ', 1)[1])
+    return 0
+
+
+def scrape(client):
+    response = client.get(reverse('metrics'))
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    return response.content.decode()
+
+
+@pytest.mark.django_db
+def test_metrics_count_requests_per_url_name(client):
+    before = scrape(client)
+    client.get(reverse('leaderboard'))
+    client.get(reverse('leaderboard'))
+    after = scrape(client)
+
+    count = 'mathchallenger_request_duration_seconds_count{url_name="leaderboard"}'
+    assert metric_value(after, count) - metric_value(before, count) == 2
+    assert '# TYPE mathchallenger_request_duration_seconds histogram' in after
+
+
+@pytest.mark.django_db
+def test_metrics_count_sql_queries(client):
+    before = scrape(client)
+    client.get(reverse('leaderboard'))                  # one query for the page of scores
+    after = scrape(client)
+
+    queries = 'mathchallenger_request_sql_queries_sum{url_name="leaderboard"}'
+    assert metric_value(after, queries) - metric_value(before, queries) == 1
+
+
+@pytest.mark.django_db
+def test_metrics_buckets_are_cumulative(client):
+    client.get(reverse('landing-page'))
+    text = scrape(client)
+
+    buckets = [float(value) for value in re.findall(r'response_size_bytes_bucket\{url_name="landing-page",le="[^"]+"\} (\S+)', text)]
+    assert buckets == sorted(buckets)
+    assert buckets[-1] == metric_value(text, 'mathchallenger_response_size_bytes_count{url_name="landing-page"}')
+
+
+@pytest.mark.django_db
+def test_metrics_of_several_processes_are_added_up(client, settings, tmp_path):
+    settings.METRICS_MULTIPROC_DIR = str(tmp_path)
+    (tmp_path / 'metrics-999999.json').write_text(           # counters dumped by another worker process
+        '[["request_duration_seconds", "leaderboard", [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0.004, 1]]]'
+    )
+    own = metrics.snapshot().get(('request_duration_seconds', 'leaderboard'), [0])[-1]
+
+    text = scrape(client)
+
+    assert metric_value(text, 'mathchallenger_request_duration_seconds_count{url_name="leaderboard"}') == own + 1
+    assert list(tmp_path.glob('metrics-*.json')) != []
+
+
+def test_counters_of_ended_threads_are_kept_and_dropped():
+    before = metrics.snapshot().get(('request_duration_seconds', 'ended-threads'), [0])[-1]
+    running = len(metrics._stores)
+    threads = [threading.Thread(target=metrics.record, args=('ended-threads', 0.01, 1, 0.001, 100)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+        thread.join()
+    gc.collect()
+
+    assert len(metrics._stores) == running
+    assert metrics.snapshot()[('request_duration_seconds', 'ended-threads')][-1] - before == 20
@@ -1,6 +1,7 @@
 import pytest
 from django.contrib.auth.models import User
 from ..models import Profile, QuesModel, Statistic, Leaderboard
+from django.core.exceptions import ValidationError
 from django.db.utils import IntegrityError  # exception for violating database integrity constraints
 
 
@@ -114,6 +115,16 @@ def test_question_filter():
     assert questions.count() == 1
 
 
+@pytest.mark.django_db
+def test_same_question_is_stored_once():
+    fields = dict(question="What is 2 + 2?", op1="2", op2="3", op3="4", op4="5", ans="4", difficulty="beginner")
+    QuesModel.objects.create(**fields)
+    with pytest.raises(ValidationError):                # what the admin shows
+        QuesModel(**fields).full_clean()
+    with pytest.raises(IntegrityError):
+        QuesModel.objects.create(**fields)
+
+
 
 @pytest.mark.django_db
 def test_get_question():
@@ -186,10 +197,10 @@ def test_delete_beginner_question():           # this test is for admin purposes
 @pytest.mark.django_db
 def test_create_statistic_entry():
     user = User.objects.create(username='statuser')
-    statistic = Statistic.objects.create(user=user, average=75, entries=4, difficulty='medium')
+    statistic = Statistic.objects.create(user=user, score_sum=300, entries=4, difficulty='medium')
 
     assert statistic.user == user
-    assert statistic.average == 75
+    assert statistic.average == 75                  # the average is derived from the sum of the scores and the number of entries
     assert statistic.entries == 4
     assert statistic.difficulty == 'medium'
 
@@ -203,13 +214,13 @@ def test_statistic_update():
     user = User.objects.create_user(username='testuser', password='testpassword')
     statistic = Statistic.objects.create(
         user=user,
-        average=75,
+        score_sum=75,
         entries=1,
         difficulty='beginner'
     )
     new_average = 85
     new_entries = 2
-    statistic.average = new_average
+    statistic.score_sum = 170
     statistic.entries = new_entries
     statistic.save()
     updated_statistic = Statistic.objects.get(pk=statistic.pk)
@@ -224,7 +235,7 @@ def test_statistic_string_representation():
     user = User.objects.create_user(username='johnsmith', password='testpassword')
     statistic = Statistic.objects.create(
         user=user,
-        average=75,
+        score_sum=75,
         entries=1,
         difficulty='beginner'
     )
@@ -240,7 +251,7 @@ def test_statistic_delete():                    # this test only usable for admi
     user = User.objects.create_user(username='testuser', password='testpassword')
     statistic = Statistic.objects.create(
         user=user,
-        average=75,
+        score_sum=75,
         entries=1,
         difficulty='beginner'
     )
@@ -0,0 +1,162 @@
+import datetime
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from ..models import Leaderboard, PeriodScore
+from ..periods import period_starts, add_period_scores, compact, rebuild
+from ..scoring import record_submission, record_submissions
+
+
+@pytest.fixture
+def players():
+    return [User.objects.create(username='player%d' % i) for i in range(3)]
+
+
+def rows(period='week', difficulty='beginner'):
+    return {row.user.username: (row.best, row.total, row.entries)
+            for row in PeriodScore.objects.filter(period=period, difficulty=difficulty).select_related('user')}
+
+
+def test_period_starts():
+    sunday = timezone.make_aware(datetime.datetime(2024, 3, 10, 12))
+    assert period_starts(sunday) == {'day': datetime.date(2024, 3, 10), 'week': datetime.date(2024, 3, 4)}      # weeks start on Monday (ISO)
+    monday = timezone.make_aware(datetime.datetime(2024, 3, 11, 0, 30))
+    assert period_starts(monday)['week'] == datetime.date(2024, 3, 11)
+
+
+@pytest.mark.django_db
+def test_submissions_update_the_period_rows(players):
+    record_submission(players[0], 'beginner', 30, 30)
+    record_submission(players[0], 'beginner', 50, 50)
+    record_submission(players[0], 'beginner', 40, 40)
+    record_submission(players[0], 'medium', 90, 90)
+    record_submission(players[1], 'beginner', 20, 20)
+    record_submission(players[1], 'adaptive', 100, 100)          # adaptive quizzes are not on the leaderboards
+    assert rows('day') == rows('week') == {'player0': (50, 120, 3), 'player1': (20, 20, 1)}
+    assert rows('week', 'all') == {'player0': (90, 210, 4), 'player1': (20, 20, 1)}
+    assert Leaderboard.objects.filter(created_at=None).count() == 0
+
+
+@pytest.mark.django_db
+def test_buffered_submissions_update_the_period_rows(players, django_assert_max_num_queries):
+    batch = [[players[i % 3].id, 'beginner', score, score] for i, score in enumerate(range(0, 300, 10))]
+    record_submissions(batch)
+    assert rows() == {'player0': (270, 1350, 10), 'player1': (280, 1450, 10), 'player2': (290, 1550, 10)}
+
+    with django_assert_max_num_queries(1):
+        add_period_scores([(player.id, 'beginner', 10, timezone.now()) for player in players])      # one upsert for all rows
+    assert rows()['player0'] == (270, 1360, 11)
+
+
+@pytest.mark.django_db
+def test_weekly_leaderboard(client, players, django_assert_num_queries):
+    for player, score in zip(players, [40, 70, 10]):
+        record_submission(player, 'beginner', score, score)
+    record_submission(players[0], 'beginner', 80, 80)
+    last_week = period_starts()['week'] - datetime.timedelta(days=7)
+    PeriodScore.objects.create(period='week', start=last_week, difficulty='beginner', user=players[2], best=100, total=100, entries=1)
+
+    cache.clear()
+    with django_assert_num_queries(1):                  # one indexed query on the small table
+        response = Client().get(reverse('leaderboard') + '?period=week&difficulty=beginner')
+    assert [(score.user.username, score.score) for score in response.context['scores']] == [('player0', 80), ('player1', 70), ('player2', 10)]
+    assert 'Best of 2 quizzes' in response.content.decode()
+
+    all_time = Client().get(reverse('leaderboard') + '?difficulty=beginner')
+    assert [score.score for score in all_time.context['scores']] == [80, 70, 40, 10]       # every score
+
+
+@pytest.mark.django_db
+def test_period_leaderboard_pagination(players, settings):
+    settings.LEADERBOARD_PAGE_SIZE = 2
+    users = [User.objects.create(username='extra%d' % i) for i in range(4)] + players
+    for user, score in zip(users, [50, 40, 40, 30, 10, 40, 20]):
+        record_submission(user, 'medium', score, score)
+
+    client = Client()
+    seen = []
+    url = reverse('leaderboard') + '?period=day'
+    while True:
+        response = client.get(url)
+        seen += [score.score for score in response.context['scores']]
+        if not response.context['next_cursor']:
+            break
+        url = reverse('leaderboard') + '?period=day&after=' + response.context['next_cursor']
+    assert seen == [50, 40, 40, 40, 30, 20, 10]
+
+
+@pytest.mark.django_db
+def test_compact_and_rebuild(players):
+    record_submission(players[0], 'beginner', 30, 30)
+    old = timezone.now() - datetime.timedelta(days=8)
+    Leaderboard.objects.create(user=players[1], score=90, difficulty='beginner', created_at=old)      # added to its periods by the post_save handler
+    Leaderboard.objects.create(user=players[2], score=80, difficulty='beginner', created_at=None)     # saved before scores had a time
+    assert set(rows('day')) == {'player0', 'player1'}
+
+    assert compact() == 4                               # the day and week rows of player1, for beginner and all
+    assert set(rows('day')) == set(rows('week')) == {'player0'}
+
+    Leaderboard.objects.filter(user=players[0]).delete()                 # e.g. in the admin
+    Leaderboard.objects.create(user=players[2], score=60, difficulty='beginner')
+    call_command('compact_leaderboards', '--rebuild')
+    assert rows() == {'player2': (60, 60, 1)}
+    assert rows('day', 'all') == {'player2': (60, 60, 1)}
+
+
+@pytest.mark.django_db
+def test_rebuild_reads_the_scores_inside_its_transaction(players):
+    record_submission(players[0], 'beginner', 30, 30)
+    with CaptureQueriesContext(connection) as queries:
+        rebuild()
+    statements = [query['sql'] for query in queries]
+    delete = next(i for i, sql in enumerate(statements) if sql.startswith('DELETE FROM "quiz_periodscore"'))
+    read = next(i for i, sql in enumerate(statements) if 'FROM "quiz_leaderboard"' in sql)
+    assert delete < read                        # SQLite's write lock is taken before the scores are read, so no submission falls in between
+    assert rows() == {'player0': (30, 30, 1)}
+
+
+@pytest.mark.django_db
+def test_admin_changes_update_the_period_rows(players):
+    for score in [30, 50, 40]:
+        record_submission(players[0], 'beginner', score, score)
+    record_submission(players[0], 'medium', 70, 70)
+    best = Leaderboard.objects.get(score=50)
+
+    best.delete()                                           # e.g. in the admin
+    assert rows() == rows('day') == {'player0': (40, 70, 2)}
+    assert rows('week', 'all') == {'player0': (70, 140, 3)}
+
+    moved = Leaderboard.objects.get(score=40)
+    moved.difficulty = 'medium'
+    moved.score = 45
+    moved.save()
+    assert rows() == {'player0': (30, 30, 1)}
+    assert rows('week', 'medium') == {'player0': (70, 115, 2)}
+    assert rows('day', 'all') == {'player0': (70, 145, 3)}
+
+    Leaderboard.objects.filter(difficulty='beginner').get().delete()
+    assert rows() == rows('day') == {}
+
+
+@pytest.mark.django_db
+def test_daily_leaderboard_changes_at_midnight(players, monkeypatch):
+    evening = timezone.make_aware(datetime.datetime(2024, 3, 10, 23, 59))
+    monkeypatch.setattr(timezone, 'now', lambda: evening)
+    add_period_scores([(players[0].id, 'beginner', 50, evening)])
+    client = Client()
+    url = reverse('leaderboard') + '?period=day'
+    first = client.get(url)
+    assert [score.score for score in first.context['scores']] == [50]
+    assert client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code == 304
+
+    monkeypatch.setattr(timezone, 'now', lambda: evening + datetime.timedelta(minutes=2))      # no new score, but a new day
+    response = client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+    assert response.status_code == 200
+    assert response['ETag'] != first['ETag']
+    assert list(response.context['scores']) == []
@@ -0,0 +1,280 @@
+import random
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from ..checks import check_shared_ranking
+from ..models import Profile, QuesModel, Leaderboard, QuizAttempt
+from ..ranking import SkipList, RankingBackend, MemoryRanking, RedisRanking, get_ranking
+from ..scoring import record_submission
+
+
+class FakeRedis:                # the commands RedisRanking uses, sorted sets ordered like Redis does
+    def __init__(self):
+        self.sets = {}
+        self.values = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def exists(self, key):
+        return int(key in self.values or key in self.sets)
+
+    def rename(self, source, destination):
+        self.sets[destination] = self.sets.pop(source)
+
+    def zunionstore(self, destination, keys, aggregate=None):
+        union = {}
+        for key in keys:
+            for member, score in self.sets.get(key, {}).items():
+                union[member] = max(score, union.get(member, score))
+        self.sets[destination] = union
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def zadd(self, key, mapping, gt=False):
+        scores = self.sets.setdefault(key, {})
+        for member, score in mapping.items():
+            if not gt or member not in scores or score > scores[member]:
+                scores[member] = score
+
+    def zrem(self, key, member):
+        self.sets.get(key, {}).pop(member, None)
+
+    def _ordered(self, key):
+        scores = self.sets.get(key, {})
+        return sorted(scores.items(), key=lambda item: (item[1], item[0]), reverse=True)
+
+    def zrevrank(self, key, member):
+        members = [m for m, s in self._ordered(key)]
+        return members.index(member) if member in members else None
+
+    def zrevrange(self, key, start, end, withscores=False):
+        rows = self._ordered(key)[start:end + 1]
+        return [(m.encode(), float(s)) for m, s in rows]
+
+    def zcard(self, key):
+        return len(self.sets.get(key, {}))
+
+    def delete(self, *keys):
+        for key in keys:
+            self.sets.pop(key, None)
+            self.values.pop(key, None)
+
+
+class FakePipeline:             # queues the commands and runs them on execute(), like MULTI/EXEC
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((getattr(self.client, name), args, kwargs))
+
+    def execute(self):
+        return [command(*args, **kwargs) for command, args, kwargs in self.commands]
+
+
+@pytest.fixture(params=['memory', 'redis'])
+def ranking(request):
+    if request.param == 'memory':
+        return MemoryRanking()
+    return RedisRanking(client=FakeRedis())
+
+
+def brute_force(submissions):           # (rank, user_id, best score), ordered the way both backends break ties
+    best = {}
+    for user_id, score in submissions:
+        best[user_id] = max(score, best.get(user_id, score))
+    ordered = sorted(best.items(), key=lambda item: (-item[1], item[0]))
+    return [(i + 1, user_id, score) for i, (user_id, score) in enumerate(ordered)]
+
+
+def test_skiplist_matches_sorted_list():
+    rng = random.Random(7)
+    skiplist, expected = SkipList(), []
+    for step in range(2000):
+        key = (rng.randrange(50), rng.randrange(50))
+        if key in expected and rng.random() < 0.5:
+            assert skiplist.delete(key)
+            expected.remove(key)
+        elif key not in expected:
+            skiplist.insert(key)
+            expected.append(key)
+        expected.sort()
+    assert len(skiplist) == len(expected)
+    assert skiplist.slice(1, len(expected)) == expected
+    for i, key in enumerate(expected):
+        assert skiplist.rank(key) == i + 1
+    assert skiplist.slice(5, 3) == expected[4:7]
+    assert skiplist.rank((99, 99)) is None
+    assert not skiplist.delete((99, 99))
+
+
+def test_ranking_matches_brute_force(ranking):
+    rng = random.Random(1)
+    submissions = [(user_id, rng.randrange(0, 20) * 100 + user_id) for user_id in (rng.randrange(1, 60) for i in range(500))]      # no ties: Redis orders tied members by name, the memory backend by user id
+    for user_id, score in submissions:
+        ranking.add('beginner', user_id, score)
+
+    expected = brute_force(submissions)
+    assert ranking.count('beginner') == len(expected)
+    assert ranking.top('beginner', 10) == expected[:10]
+    for rank, user_id, score in expected:
+        assert ranking.rank('beginner', user_id) == rank
+    rank, user_id, score = expected[20]
+    assert ranking.around('beginner', user_id, 3) == expected[17:24]
+    assert ranking.around('beginner', expected[0][1], 2) == expected[:3]         # the window is cut at the top
+
+
+def test_ranking_keeps_best_score(ranking):
+    ranking.add('medium', 1, 80)
+    ranking.add('medium', 2, 60)
+    ranking.add('medium', 2, 40)                # a worse score doesn't lower the player
+    assert ranking.top('medium', 5) == [(1, 1, 80), (2, 2, 60)]
+    ranking.add('medium', 2, 90)
+    assert ranking.rank('medium', 2) == 1
+    assert ranking.count('medium') == 2
+
+
+def test_ranking_replace_lowers_or_removes(ranking):
+    ranking.add('medium', 1, 80)
+    ranking.add('medium', 2, 60)
+    ranking.replace('medium', 1, 50)            # the best score was lowered in the admin
+    assert ranking.top('medium', 5) == [(1, 2, 60), (2, 1, 50)]
+    ranking.replace('medium', 2, None)          # and every score of this player deleted
+    assert ranking.top('medium', 5) == [(1, 1, 50)]
+    assert ranking.count('medium') == 1
+    ranking.replace('medium', 3, 70)
+    assert ranking.rank('medium', 3) == 1
+
+
+def test_ranking_per_difficulty(ranking):
+    ranking.add('beginner', 1, 50)
+    assert ranking.rank('advanced', 1) is None
+    assert ranking.count('advanced') == 0
+    assert ranking.top('advanced', 5) == []
+    assert ranking.around('advanced', 1, 5) == []
+    ranking.clear()
+    assert ranking.count('beginner') == 0
+
+
+@pytest.mark.django_db
+def test_ranking_rebuilt_from_leaderboard():
+    first = User.objects.create(username='first')
+    second = User.objects.create(username='second')
+    Leaderboard.objects.bulk_create([
+        Leaderboard(user=first, score=40, difficulty='beginner'),
+        Leaderboard(user=first, score=70, difficulty='beginner'),
+        Leaderboard(user=second, score=60, difficulty='beginner'),
+        Leaderboard(user=second, score=90, difficulty='medium'),
+    ])
+
+    ranking = get_ranking()
+    assert ranking.top('beginner', 5) == [(1, first.id, 70), (2, second.id, 60)]
+    assert ranking.rank('medium', second.id) == 1
+
+    Leaderboard.objects.filter(score=70).delete()         # dropped after the commit by the post_delete handler, here by the rebuild
+    call_command('rebuild_rankings', stdout=open('/dev/null', 'w'))
+    assert ranking.top('beginner', 5) == [(1, second.id, 60), (2, first.id, 40)]
+
+
+@pytest.mark.django_db
+def test_admin_changes_update_the_ranking(django_capture_on_commit_callbacks):
+    first = User.objects.create(username='first')
+    second = User.objects.create(username='second')
+    with django_capture_on_commit_callbacks(execute=True):
+        best = Leaderboard.objects.create(user=first, score=70, difficulty='beginner')
+        Leaderboard.objects.create(user=first, score=40, difficulty='beginner')
+        Leaderboard.objects.create(user=second, score=60, difficulty='beginner')
+    ranking = get_ranking()
+    assert ranking.top('beginner', 5) == [(1, first.id, 70), (2, second.id, 60)]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        best.score = 50                                 # e.g. edited in the admin
+        best.save()
+    assert ranking.top('beginner', 5) == [(1, second.id, 60), (2, first.id, 50)]
+    with django_capture_on_commit_callbacks(execute=True):
+        best.difficulty = 'medium'
+        best.save()
+    assert ranking.top('beginner', 5) == [(1, second.id, 60), (2, first.id, 40)]
+    assert ranking.top('medium', 5) == [(1, first.id, 50)]
+    with django_capture_on_commit_callbacks(execute=True):
+        best.delete()
+    assert ranking.count('medium') == 0
+
+
+def test_backends_implement_every_method():
+    with pytest.raises(TypeError):
+        RankingBackend()
+
+
+def test_redis_ranking_is_filled_once_for_all_processes():
+    client = FakeRedis()
+    first = RedisRanking(client=client)
+    first.load([('beginner', 1, 50), ('beginner', 2, 70)])
+    first.add('beginner', 3, 90)
+    second = RedisRanking(client=client)            # another process starting later
+    second.load([('beginner', 1, 50), ('beginner', 2, 70)])
+    assert second.top('beginner', 5) == [(1, 3, 90), (2, 2, 70), (3, 1, 50)]
+
+
+def test_redis_ranking_is_not_filled_while_another_process_fills_it():
+    client = FakeRedis()
+    client.set('mathchallenger:ranking:lock', 1)
+    ranking = RedisRanking(client=client)
+    ranking.load([('beginner', 1, 50)])
+    assert ranking.count('beginner') == 0
+    client.delete('mathchallenger:ranking:lock')
+    ranking.add('beginner', 2, 30)                  # added while the ranking is filled, kept by the merge
+    ranking.load([('beginner', 1, 50)])
+    assert ranking.top('beginner', 5) == [(1, 1, 50), (2, 2, 30)]
+
+
+def test_redis_rebuild_replaces_the_sets_at_once():
+    client = FakeRedis()
+    ranking = RedisRanking(client=client)
+    ranking.BATCH_SIZE = 2
+    ranking.load([('beginner', 1, 50), ('medium', 2, 60)])
+    ranking.rebuild([('beginner', 1, 40), ('beginner', 3, 45), ('beginner', 4, 20)])
+    assert ranking.top('beginner', 5) == [(1, 3, 45), (2, 1, 40), (3, 4, 20)]
+    assert ranking.count('medium') == 0
+    assert not [key for key in client.sets if ':rebuild:' in key]       # no temporary keys left
+
+
+@pytest.mark.django_db
+def test_submission_updates_ranking_after_commit(django_capture_on_commit_callbacks):
+    ranking = get_ranking()
+    user = User.objects.create(username='player')
+    with django_capture_on_commit_callbacks(execute=True):
+        record_submission(user, 'advanced', 50, 50)
+    assert ranking.rank('advanced', user.id) == 1
+
+
+@pytest.mark.django_db
+def test_play_quiz_shows_rank(client):
+    for i, score in enumerate([90, 80, 0]):
+        other = User.objects.create(username='other%d' % i)
+        Leaderboard.objects.create(user=other, score=score, difficulty='beginner')
+    user = User.objects.create_user(username='student', password='password123')
+    Profile.objects.create(user=user, user_type='student')
+    client.login(username='student', password='password123')
+
+    question = QuesModel.objects.create(question='What is 2 + 2?', op1='3', op2='4', op3='5', op4='6', ans='4', difficulty='beginner')
+    attempt = QuizAttempt.objects.create(user=user, difficulty='beginner', question_ids=[question.id])
+    response = client.post(reverse('play-quiz') + '?skill=beginner', data={'attempt': attempt.id, 'q%d' % question.id: '4'})
+
+    assert 'ranks you #3 of 4 players' in response.content.decode()
+
+
+def test_memory_ranking_warns_with_several_workers(settings):
+    settings.WORKER_PROCESSES = 4
+    assert [warning.id for warning in check_shared_ranking(None)] == ['quiz.W001']
+    settings.RANKING_BACKEND = 'quiz.ranking.RedisRanking'
+    assert check_shared_ranking(None) == []
+    settings.RANKING_BACKEND = 'quiz.ranking.MemoryRanking'
+    settings.WORKER_PROCESSES = 1
+    assert check_shared_ranking(None) == []
@@ -0,0 +1,140 @@
+import itertools
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from ..models import Profile, QuesModel, Leaderboard, Statistic, QuizAttempt
+from ..ratings import expected_score, apply_ratings, initial_rating, START_RATINGS, STUDENT_K
+from ..sampling import asample_adaptive_ids
+from ..search import search_questions
+
+
+numbers = itertools.count()
+
+
+def make_question(difficulty='beginner', rating=None, text=None):
+    text = text or 'What is 2 + 2? (%d)' % next(numbers)          # a stored question can't be stored again
+    return QuesModel.objects.create(question=text, op1='3', op2='4', op3='5', op4='6', ans='4', difficulty=difficulty, rating=rating)
+
+
+@pytest.fixture
+def student():
+    user = User.objects.create_user(username='student', password='password123')
+    Profile.objects.create(user=user, user_type='student')
+    client = Client()
+    client.login(username='student', password='password123')
+    client.user = user
+    return client
+
+
+def test_expected_score():
+    assert expected_score(1200, 1200) == 0.5
+    assert expected_score(1600, 1200) == pytest.approx(10 / 11)
+    assert expected_score(1200, 1600) == pytest.approx(1 / 11)
+
+
+@pytest.mark.django_db
+def test_new_questions_get_the_rating_of_their_difficulty():
+    assert abs(make_question('beginner').rating - START_RATINGS['beginner']) <= 0.5
+    assert abs(make_question('human_calculator').rating - START_RATINGS['human_calculator']) <= 0.5
+    assert make_question(rating=1234).rating == 1234
+    assert abs(initial_rating('advanced') - 1400) <= 0.5
+
+
+@pytest.mark.django_db
+def test_apply_ratings_moves_student_and_question(student):
+    question = make_question(rating=1200)
+    apply_ratings([(student.user.id, 'beginner', [(question.id, True)])])
+    assert Profile.objects.get(user=student.user).rating == pytest.approx(1200 + STUDENT_K / 2)
+    question.refresh_from_db()
+    assert question.rating == pytest.approx(1200 - 8)
+
+    apply_ratings([(student.user.id, 'beginner', [(question.id, False), (None, False)])])       # generated questions only move the student
+    question.refresh_from_db()
+    assert question.rating > 1200 - 8
+    assert Profile.objects.get(user=student.user).rating < 1200 + STUDENT_K / 2
+
+
+@pytest.mark.django_db
+def test_apply_ratings_batch(student):
+    question = make_question(rating=1200)
+    apply_ratings([(student.user.id, 'beginner', [(question.id, True)]),
+                   (student.user.id, 'beginner', [(question.id, True)])])       # both quizzes are rated against the ratings before the batch
+    assert Profile.objects.get(user=student.user).rating == pytest.approx(1200 + STUDENT_K)
+    question.refresh_from_db()
+    assert question.rating == pytest.approx(1200 - 16)
+
+
+@pytest.mark.django_db
+def test_adaptive_sampling_picks_questions_near_the_rating(settings):
+    settings.ADAPTIVE_BAND = 10
+    for rating in range(800, 1800, 10):
+        make_question(rating=rating)
+    ids = async_to_sync(asample_adaptive_ids)(1300, 5)
+    ratings = QuesModel.objects.filter(id__in=ids).values_list('rating', flat=True)
+    assert len(ids) == 5
+    assert all(abs(rating - 1300) <= 20 for rating in ratings)         # 3 questions within 10 points, so the band is doubled once
+
+
+@pytest.mark.django_db
+def test_adaptive_sampling_draws_from_the_whole_band(settings):
+    settings.ADAPTIVE_BAND = 50
+    in_band = {make_question(rating=rating).id for rating in range(1250, 1351, 5)}
+    for rating in (1000, 1600):
+        make_question(rating=rating)
+    seen = set()
+    for i in range(100):
+        seen.update(async_to_sync(asample_adaptive_ids)(1300, 5))
+    assert seen == in_band
+
+
+@pytest.mark.django_db
+def test_adaptive_sampling_with_few_questions(settings):
+    settings.ADAPTIVE_BAND = 10
+    far = {make_question(rating=rating).id for rating in (500, 2500)}
+    assert set(async_to_sync(asample_adaptive_ids)(1300, 5)) == far
+
+
+@pytest.mark.django_db
+def test_adaptive_quiz_changes_only_ratings(student):
+    questions = [make_question(rating=1200 + i) for i in range(3)]
+    response = student.get(reverse('play-quiz'), {'skill': 'adaptive'})
+    assert response.status_code == 200
+    attempt = QuizAttempt.objects.get(user=student.user)
+    assert sorted(attempt.question_ids) == sorted(q.id for q in questions)
+    attempt.full_clean()                            # 'adaptive' is one of the choices, e.g. for the admin
+    assert attempt.get_difficulty_display() == 'Adaptive'
+
+    answers = {'q%d' % q.id: '4' for q in questions}
+    response = student.post(reverse('play-quiz'), {'attempt': attempt.id, **answers})
+    assert response.status_code == 200
+    assert b'Your rating:' in response.content
+    assert not Leaderboard.objects.exists()         # a mix of difficulties has no place on the leaderboard
+    assert not Statistic.objects.exists()
+    assert Profile.objects.get(user=student.user).rating > 1200
+    assert all(q.rating < 1200 for q in QuesModel.objects.all())
+
+
+@pytest.mark.django_db
+def test_api_adaptive_quiz(student):
+    question = make_question(rating=1200)
+    data = student.get(reverse('api-quiz'), {'skill': 'adaptive'}).json()
+    assert [q['id'] for q in data['questions']] == [question.id]
+    result = student.post(reverse('api-quiz'), data={'attempt': data['attempt'], 'answers': {str(question.id): 0}},
+                          content_type='application/json').json()
+    assert result['rating'] < 1200
+
+
+@pytest.mark.django_db
+def test_rating_updates_leave_the_search_index_alone(student):
+    if connection.vendor != 'sqlite':
+        pytest.skip('the FTS5 triggers are SQLite only')
+    question = make_question(rating=1200, text='What is seventeen times three?')
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'quiz_quesmodel_fts_update'")
+        assert 'rating' not in cursor.fetchone()[0]         # the trigger only fires for the searched columns
+    apply_ratings([(student.user.id, 'beginner', [(question.id, True)])])
+    questions, more = search_questions('seventeen')
+    assert [q.id for q in questions] == [question.id]
@@ -0,0 +1,179 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client, AsyncClient
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from ..checks import check_shared_cache
+from ..models import Profile, QuesModel
+from ..roles import SESSION_KEY
+
+TEACHER_PAGES = ['teachersite', 'participants', 'add-question', 'question-search', 'question-stats']
+STUDENT_PAGES = ['play-quiz']
+
+ENGINES = {                 # engine -> queries before a view's own work: the session row (db only) and the User, no Profile
+    'django.contrib.sessions.backends.db': 2,
+    'django.contrib.sessions.backends.cached_db': 1,
+    'django.contrib.sessions.backends.signed_cookies': 1,
+}
+
+
+def login(username, user_type):
+    user = User.objects.create_user(username=username, password='password123')
+    Profile.objects.create(user=user, user_type=user_type)
+    client = Client()
+    client.login(username=username, password='password123')
+    return client
+
+
+@pytest.fixture
+def questions():
+    return [QuesModel.objects.create(question='What is %d + 1?' % i, op1=str(i + 1), op2='0', op3='-1', op4='-2', ans=str(i + 1),
+                                     difficulty='beginner') for i in range(10)]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('engine', ENGINES)
+def test_views_read_the_role_from_the_session(settings, engine, questions, django_assert_num_queries):
+    settings.SESSION_ENGINE = engine
+    student = login('student', 'student')
+    teacher = login('teacher', 'teacher')
+    assert student.session[SESSION_KEY][0] == 'student'            # stored by the login
+
+    with django_assert_num_queries(ENGINES[engine]):
+        assert student.get(reverse('skills-page')).status_code == 200
+    with django_assert_num_queries(ENGINES[engine] + 1):                        # teacher pages read the role again with a per-process cache
+        assert teacher.get(reverse('add-question')).status_code == 200
+    with django_assert_num_queries(ENGINES[engine]):
+        assert teacher.get(reverse('skills-page')).url == reverse('teachersite')
+    student.get(reverse('play-quiz'), {'skill': 'beginner'})                    # caches the question ids
+    with django_assert_num_queries(ENGINES[engine] + 2):                        # the drawn questions and the new attempt
+        assert student.get(reverse('play-quiz'), {'skill': 'beginner'}).status_code == 200
+
+
+@pytest.mark.django_db
+def test_profile_changes_replace_the_stored_role(django_capture_on_commit_callbacks, django_assert_num_queries):
+    client = login('user', 'student')
+    profile = Profile.objects.get(user__username='user')
+    with django_capture_on_commit_callbacks(execute=True):
+        profile.user_type = 'teacher'
+        profile.save()
+
+    with django_assert_num_queries(6):          # session, user, profile, and the session saved with the new role (savepoint, update, release)
+        assert client.get(reverse('skills-page')).url == reverse('teachersite')
+    with django_assert_num_queries(3):
+        assert client.get(reverse('add-question')).status_code == 200
+
+    with django_capture_on_commit_callbacks(execute=True):
+        profile.delete()
+    assert client.get(reverse('add-question')).url == reverse('landing-page')
+    assert client.session[SESSION_KEY][0] is None
+
+
+@pytest.mark.django_db
+def test_teacher_pages_see_a_role_changed_in_another_process():
+    client = login('teacher', 'teacher')
+    Profile.objects.filter(user__username='teacher').update(user_type='student')       # no signal: the stamp is only bumped in the other process
+    assert client.get(reverse('add-question')).url == reverse('landing-page')
+    assert client.session[SESSION_KEY][0] == 'student'
+
+
+@pytest.mark.django_db
+def test_teacher_pages_trust_the_session_with_a_shared_cache(monkeypatch, django_assert_num_queries):
+    monkeypatch.setattr('quiz.roles.versions_shared', lambda: True)
+    client = login('teacher', 'teacher')
+    with django_assert_num_queries(2):
+        assert client.get(reverse('add-question')).status_code == 200
+
+
+def test_per_process_cache_fails_the_check_with_several_workers(settings):
+    settings.WORKER_PROCESSES = 4
+    assert [error.id for error in check_shared_cache(None)] == ['quiz.E001']
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache', 'LOCATION': '127.0.0.1:11211'}}
+    assert check_shared_cache(None) == []
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                       'versions': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379'}}
+    assert check_shared_cache(None) == []                   # only the stamps need to be shared
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    settings.WORKER_PROCESSES = 1
+    assert check_shared_cache(None) == []
+
+
+@pytest.mark.django_db
+def test_stored_roles_outlive_a_full_cache(settings):
+    settings.SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    settings.CACHES = dict(settings.CACHES, default={'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'OPTIONS': {'MAX_ENTRIES': 50}})
+    users = User.objects.bulk_create([User(username='student%d' % i) for i in range(200)])
+    Profile.objects.bulk_create([Profile(user=user, user_type='student') for user in users])
+    clients = []
+    for user in users:                          # 200 sessions cull the default cache several times
+        client = Client()
+        client.force_login(user)
+        client.get(reverse('skills-page'))
+        clients.append(client)
+
+    with CaptureQueriesContext(connection) as queries:
+        for client in clients:
+            assert client.get(reverse('skills-page')).status_code == 200
+    assert not [query for query in queries if 'quiz_profile' in query['sql']]         # the profile stamps are kept in the 'versions' cache
+
+
+@pytest.mark.django_db
+def test_landing_page_shows_the_role(django_assert_num_queries):
+    client = login('teacher', 'teacher')
+    with django_assert_num_queries(2):
+        response = client.get(reverse('landing-page'))
+    assert 'MathChallenger is here to make teaching math engaging' in response.content.decode()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', TEACHER_PAGES + STUDENT_PAGES + ['skills-page'])
+def test_anonymous_users_are_sent_to_the_login_without_a_query(name, django_assert_num_queries):
+    with django_assert_num_queries(0):
+        response = Client().get(reverse(name))
+    assert response.url == reverse('login-page') + '?next=' + reverse(name)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', TEACHER_PAGES)
+def test_teacher_pages_reject_students(name):
+    assert login('student', 'student').get(reverse(name)).url == reverse('landing-page')
+    assert login('teacher', 'teacher').get(reverse(name)).status_code == 200
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', TEACHER_PAGES + STUDENT_PAGES + ['skills-page'])
+def test_superusers_without_a_profile_are_redirected(name):
+    User.objects.create_superuser(username='admin', password='password123')
+    client = Client()
+    client.login(username='admin', password='password123')
+    assert client.get(reverse(name)).url == reverse('landing-page')
+
+
+@pytest.mark.django_db
+def test_the_role_is_resolved_once_per_request(settings):
+    client = login('teacher', 'teacher')
+    session = client.session
+    del session[SESSION_KEY]                    # e.g. a session from before the role was stored
+    session.save()
+    with CaptureQueriesContext(connection) as queries:
+        assert client.get(reverse('teachersite')).status_code == 200        # checked by the middleware and the decorator
+    assert len([query for query in queries if 'quiz_profile' in query['sql']]) == 1
+
+    settings.MIDDLEWARE = [name for name in settings.MIDDLEWARE if name != 'quiz.roles.RoleMiddleware']
+    assert login('student', 'student').get(reverse('teachersite')).url == reverse('landing-page')     # the decorator alone
+
+
+@pytest.mark.django_db
+def test_async_views_load_the_user_once(questions):
+    student = User.objects.create_user(username='student', password='password123')
+    Profile.objects.create(user=student, user_type='student')
+    client = AsyncClient()
+    async_to_sync(client.aforce_login)(student)
+    async_to_sync(client.get)(reverse('play-quiz'), {'skill': 'beginner'})
+    with CaptureQueriesContext(connection) as queries:
+        response = async_to_sync(client.get)(reverse('play-quiz'), {'skill': 'beginner'})
+    assert response.status_code == 200
+    assert len([query for query in queries if 'FROM "auth_user"' in query['sql']]) == 1
+    assert not [query for query in queries if 'quiz_profile' in query['sql']]
@@ -0,0 +1,100 @@
+import pytest
+from django.urls import reverse
+from django.contrib.auth.models import User
+from ..models import Profile, QuesModel
+from ..sampling import question_ids, sample_question_ids, sample_questions
+
+
+def create_questions(count, difficulty='beginner'):
+    return QuesModel.objects.bulk_create([
+        QuesModel(question='What is %d + 1?' % i, op1=str(i), op2=str(i + 1), op3=str(i + 2), op4=str(i + 3),
+                  ans=str(i + 1), difficulty=difficulty)
+        for i in range(count)
+    ])
+
+
+@pytest.mark.django_db
+def test_sample_respects_quiz_length(settings):
+    settings.QUIZ_LENGTH = {'beginner': 5}
+    create_questions(30)
+
+    ids = sample_question_ids('beginner')
+
+    assert len(ids) == 5
+    assert len(set(ids)) == 5                   # no question is drawn twice
+
+
+@pytest.mark.django_db
+def test_sample_smaller_pool_than_quiz_length(settings):
+    settings.QUIZ_LENGTH = {'beginner': 10}
+    create_questions(3)
+
+    assert len(sample_questions('beginner')) == 3
+
+
+@pytest.mark.django_db
+def test_id_index_is_reused_until_a_question_changes(django_assert_num_queries, django_capture_on_commit_callbacks):
+    create_questions(10)
+    question_ids('beginner')
+
+    with django_assert_num_queries(0):          # the second draw is served from the cached id index
+        sample_question_ids('beginner', 3)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        new_question = QuesModel.objects.create(question='What is 1 + 1?', op1='1', op2='2', op3='3', op4='4',
+                                                ans='2', difficulty='beginner')     # saving a question invalidates the index after the commit
+    assert new_question.id in question_ids('beginner')
+
+
+@pytest.mark.django_db
+def test_question_moved_to_another_difficulty_leaves_the_old_index(django_capture_on_commit_callbacks):
+    questions = create_questions(3, 'beginner')
+    create_questions(3, 'advanced')
+    question_ids('beginner')
+    question_ids('advanced')
+
+    moved = QuesModel.objects.get(pk=questions[0].pk)
+    moved.difficulty = 'advanced'
+    with django_capture_on_commit_callbacks(execute=True):
+        moved.save()
+    assert moved.id not in question_ids('beginner')
+    assert moved.id in question_ids('advanced')
+
+
+@pytest.mark.django_db
+def test_sample_skips_questions_moved_since_the_index_was_built(settings):
+    settings.QUIZ_LENGTH = {'beginner': 10}
+    questions = create_questions(3, 'beginner')
+    question_ids('beginner')
+    QuesModel.objects.filter(pk=questions[0].pk).update(difficulty='advanced')      # not seen by the cached index
+
+    assert questions[0].id not in [q.id for q in sample_questions('beginner')]
+
+
+@pytest.mark.django_db
+def test_sample_only_uses_selected_difficulty():
+    beginner = create_questions(5, 'beginner')
+    create_questions(5, 'advanced')
+
+    assert set(question_ids('beginner')) == {q.id for q in beginner}
+
+
+@pytest.mark.django_db
+def test_play_quiz_only_grades_drawn_questions(client, settings):
+    settings.QUIZ_LENGTH = {'beginner': 4}
+    create_questions(20)
+    user = User.objects.create_user(username='student1', password='password123')
+    Profile.objects.create(user=user, user_type='student')
+    client.login(username='student1', password='password123')
+
+    quiz_url = reverse('play-quiz') + '?skill=beginner'
+    response = client.get(quiz_url)
+    assert len(response.context['questions']) == 4
+
+    answers = {'attempt': response.context['attempt'].id}
+    for q in response.context['questions']:
+        answers['q%d' % q.id] = q.ans
+    submission = client.post(quiz_url, data=answers)
+
+    assert 'Total questions: 4' in submission.content.decode()
+    assert 'Correct answers: 4' in submission.content.decode()
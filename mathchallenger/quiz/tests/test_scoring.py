@@ -0,0 +1,87 @@
+import threading
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection, OperationalError
+from ..models import Leaderboard, Statistic
+from ..scoring import record_submission, record_submissions
+
+
+@pytest.mark.django_db
+def test_first_submission_creates_statistic():
+    user = User.objects.create(username='player')
+    record_submission(user, 'beginner', 70, 70.0)
+
+    statistic = Statistic.objects.get(user=user, difficulty='beginner')
+    assert statistic.entries == 1
+    assert statistic.average == 70
+    assert Leaderboard.objects.filter(user=user, score=70).count() == 1
+
+
+@pytest.mark.django_db
+def test_average_is_exact():            # the old (average + percent) // 2 gave 65 here instead of the real average
+    user = User.objects.create(username='player')
+    for percent in [100, 40, 55]:
+        record_submission(user, 'medium', percent, percent)
+
+    statistic = Statistic.objects.get(user=user, difficulty='medium')
+    assert statistic.entries == 3
+    assert statistic.score_sum == 195
+    assert statistic.average == 65
+
+
+@pytest.mark.django_db
+def test_percentages_are_only_rounded_for_display():       # rounding every quiz gave 0.6 + 0.6 + 0.3 -> 1 + 1 + 0, an average of 1
+    user = User.objects.create(username='player')
+    for percent in [0.6, 0.6, 0.3]:
+        record_submission(user, 'medium', 0, percent)
+    record_submissions([[user.id, 'beginner', 50, 100 / 3], [user.id, 'beginner', 50, 100 / 3], [user.id, 'beginner', 50, 100 / 3]])
+
+    assert Statistic.objects.get(user=user, difficulty='medium').score_sum == pytest.approx(1.5)
+    assert Statistic.objects.get(user=user, difficulty='medium').average == 0
+    assert Statistic.objects.get(user=user, difficulty='beginner').score_sum == pytest.approx(100)
+
+
+@pytest.mark.django_db
+def test_statistics_are_kept_per_difficulty():
+    user = User.objects.create(username='player')
+    record_submission(user, 'beginner', 100, 100)
+    record_submission(user, 'advanced', 20, 20)
+
+    assert Statistic.objects.get(user=user, difficulty='beginner').average == 100
+    assert Statistic.objects.get(user=user, difficulty='advanced').average == 20
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_submissions_lose_no_update():
+    user = User.objects.create(username='player')
+    threads_count = 8
+    submissions_per_thread = 25
+    barrier = threading.Barrier(threads_count)
+    errors = []
+
+    def submit():
+        barrier.wait()                          # start all threads at once to provoke the race of the first insert
+        try:
+            for _ in range(submissions_per_thread):
+                for retry in range(1000):
+                    try:
+                        record_submission(user, 'beginner', 10, 10)
+                        break
+                    except OperationalError:        # SQLite's single writer lock was busy, the transaction was rolled back and is tried again
+                        continue
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=submit) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    statistic = Statistic.objects.get(user=user, difficulty='beginner')          # exactly one row, MultipleObjectsReturned is impossible
+    assert statistic.entries == threads_count * submissions_per_thread
+    assert statistic.score_sum == 10 * threads_count * submissions_per_thread
+    assert Leaderboard.objects.filter(user=user).count() == threads_count * submissions_per_thread
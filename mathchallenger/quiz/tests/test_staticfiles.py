@@ -0,0 +1,102 @@
+import gzip
+import json
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.test import Client
+from django.urls import reverse
+from ..models import Profile
+from ..staticfiles import StaticFilesApplication, accepted_encodings, etag_matches, brotli
+
+
+@pytest.fixture
+def collected(settings, tmp_path):
+    settings.STATIC_ROOT = tmp_path
+    call_command('collectstatic', interactive=False, verbosity=0, ignore_patterns=['admin'])       # the admin's files only slow the test down
+    with open(tmp_path / 'staticfiles.json') as f:
+        return json.load(f)['paths']
+
+
+def django_app(environ, start_response):
+    start_response('404 Not Found', [('Content-Type', 'text/plain')])
+    return [b'django']
+
+
+def get(app, path, **environ):
+    response = {}
+
+    def start_response(status, headers):
+        response['status'] = status
+        response['headers'] = dict(headers)
+    body = b''.join(app({'REQUEST_METHOD': 'GET', 'PATH_INFO': path, **environ}, start_response))
+    return response['status'], response['headers'], body
+
+
+@pytest.mark.django_db
+def test_pages_use_the_local_files():
+    user = User.objects.create_user(username='student', password='password123')
+    Profile.objects.create(user=user, user_type='student')
+    client = Client()
+    client.login(username='student', password='password123')
+    for name in ['landing-page', 'leaderboard', 'skills-page']:
+        content = client.get(reverse(name)).content.decode()
+        assert '/static/quiz/css/' in content
+        assert 'bootstrapcdn' not in content
+    content = client.get(reverse('play-quiz'), {'skill': 'beginner'}).content.decode()
+    assert '<script src="/static/quiz/js/timer.js" defer></script>' in content
+    assert 'setInterval' not in content                 # the timer is cached by the browser, not sent with every quiz
+
+
+def test_collectstatic_hashes_and_compresses(collected, tmp_path):
+    css = collected['quiz/css/bootstrap.min.css']
+    assert css != 'quiz/css/bootstrap.min.css' and css.startswith('quiz/css/bootstrap.min.')
+    original = (tmp_path / css).read_bytes()
+    assert gzip.decompress((tmp_path / (css + '.gz')).read_bytes()) == original
+    assert (tmp_path / (css + '.br')).exists() == (brotli is not None)
+    assert (tmp_path / 'quiz/css/bootstrap.min.css.gz').exists()          # for old links to the plain name
+    assert static('quiz/css/bootstrap.min.css') == '/static/' + css
+
+
+def test_static_files_are_served_before_django(collected, tmp_path):
+    app = StaticFilesApplication(django_app, root=tmp_path, prefix='static/')
+    css = '/static/' + collected['quiz/css/bootstrap.min.css']
+
+    status, headers, body = get(app, css, HTTP_ACCEPT_ENCODING='gzip, deflate')
+    assert status == '200 OK'
+    assert headers['Content-Encoding'] == 'gzip'
+    assert headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert headers['Content-Type'] == 'text/css; charset=utf-8'
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(body) == (tmp_path / collected['quiz/css/bootstrap.min.css']).read_bytes()
+    assert int(headers['Content-Length']) == len(body)
+
+    gzip_etag = headers['ETag']
+    status, headers, body = get(app, css, HTTP_ACCEPT_ENCODING='gzip;q=0')
+    assert 'Content-Encoding' not in headers
+    assert body.startswith(b'/*!')
+    assert headers['ETag'] != gzip_etag                                 # each encoding of the file has its own ETag
+    assert get(app, css, HTTP_IF_NONE_MATCH=headers['ETag'])[0] == '304 Not Modified'
+    assert get(app, css, HTTP_IF_NONE_MATCH=gzip_etag)[0] == '200 OK'
+    assert get(app, css, HTTP_IF_NONE_MATCH=gzip_etag, HTTP_ACCEPT_ENCODING='gzip')[0] == '304 Not Modified'
+    assert get(app, css, HTTP_IF_NONE_MATCH='"other", W/%s' % gzip_etag, HTTP_ACCEPT_ENCODING='gzip')[0] == '304 Not Modified'
+
+    status, headers, body = get(app, '/static/quiz/css/bootstrap.min.css')
+    assert headers['Cache-Control'] == 'public, max-age=60'            # the plain name changes at the next deployment
+
+    assert get(app, '/static/missing.css')[2] == b'django'
+    assert get(app, '/leaderboard/')[2] == b'django'
+    assert get(app, css, REQUEST_METHOD='POST')[2] == b'django'
+
+
+def test_accepted_encodings():
+    assert accepted_encodings('gzip, deflate, br') == {'gzip', 'deflate', 'br'}
+    assert accepted_encodings('br;q=0, gzip;q=0.8') == {'gzip'}
+
+
+def test_etag_matches():
+    assert etag_matches('"a-1-gzip"', '"a-1-gzip"')
+    assert etag_matches('"b", W/"a-1-gzip"', '"a-1-gzip"')
+    assert etag_matches('*', '"a-1"')
+    assert not etag_matches('"a-1"', '"a-1-gzip"')
+    assert not etag_matches('', '"a-1"')
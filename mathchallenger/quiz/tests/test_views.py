@@ -1,8 +1,10 @@
 import pytest
 from django.urls import reverse
 from django.contrib.auth.models import User
-from django.test import Client
-from ..models import Profile, QuesModel, Leaderboard, Statistic
+from django.test import Client, AsyncClient
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from ..models import Profile, QuesModel, Leaderboard, Statistic, QuizAttempt
 
 @pytest.fixture
 def client():
@@ -85,6 +87,17 @@ def test_add_question_view(client, create_user):
     assert 'Add Question' in response.content.decode()
 
 
+@pytest.mark.django_db
+def test_add_question_twice(client, create_user):
+    create_user('teacher1', 'password123', 'teacher')
+    client.login(username='teacher1', password='password123')
+    question = {'question': 'What is 2 + 2?', 'op1': '3', 'op2': '4', 'op3': '5', 'op4': '6', 'ans': '4', 'difficulty': 'beginner'}
+    assert client.post(reverse('add-question'), question).url == reverse('teachersite')
+    response = client.post(reverse('add-question'), question)
+    assert 'This question already exists!' in response.content.decode()
+    assert QuesModel.objects.count() == 1
+
+
 
 @pytest.mark.django_db
 def test_play_quiz_view(client, create_user):
@@ -154,9 +167,9 @@ def test_play_quiz_and_see_stats(client, create_user, create_math_quiz_questions
     response_get = client.get(quiz_url)                                # user gets redirected to the quiz page with its url and its query parameter obtained from the previous page
     assert response_get.status_code == 200
 
-    answers = {}                            # create a dic with questions and user's (correct) answers as key, value pairs
+    answers = {'attempt': response_get.context['attempt'].id}              # the attempt stores which questions were drawn for this quiz
     for question in create_math_quiz_questions:
-        answers[question.question] = question.ans
+        answers['q%d' % question.id] = question.ans                         # answers are keyed by the question ids
 
 
     submission = client.post(quiz_url, data=answers)
@@ -170,3 +183,198 @@ def test_play_quiz_and_see_stats(client, create_user, create_math_quiz_questions
 
     with pytest.raises(AssertionError):
         assert 'Total questions: 20' in str(submission.content.decode())    # since the fixtures only have 4 and not 20 questions, this should raise the exception AssertionError
+
+
+
+@pytest.mark.django_db
+def test_play_quiz_duplicate_question_text(client, create_user):      # questions with the same text are graded separately since answers are keyed by id
+    create_user('student', 'password123', 'student')
+    client.login(username='student', password='password123')
+    first = QuesModel.objects.create(question='Pick the even number', op1='1', op2='2', op3='3', op4='5', ans='2', difficulty='medium')
+    second = QuesModel.objects.create(question='Pick the even number', op1='4', op2='7', op3='9', op4='11', ans='4', difficulty='medium')
+
+    quiz_url = reverse('play-quiz') + '?skill=medium'
+    attempt = client.get(quiz_url).context['attempt']
+    submission = client.post(quiz_url, data={'attempt': attempt.id, 'q%d' % first.id: '2', 'q%d' % second.id: '4'})
+
+    assert 'Correct answers: 2' in submission.content.decode()
+
+
+
+@pytest.mark.django_db
+def test_play_quiz_attempt_only_submitted_once(client, create_user, create_math_quiz_questions):
+    create_user('student', 'password123', 'student')
+    client.login(username='student', password='password123')
+
+    quiz_url = reverse('play-quiz') + '?skill=beginner'
+    attempt = client.get(quiz_url).context['attempt']
+    assert client.post(quiz_url, data={'attempt': attempt.id}).status_code == 200
+
+    resubmission = client.post(quiz_url, data={'attempt': attempt.id})          # submitting the same attempt again is redirected to the skills page
+    assert resubmission.status_code == 302
+    assert Leaderboard.objects.count() == 1
+
+
+
+@pytest.mark.django_db
+def test_play_quiz_failed_submission_keeps_the_attempt_open(client, create_user, create_math_quiz_questions, monkeypatch):
+    create_user('student', 'password123', 'student')
+    client.login(username='student', password='password123')
+
+    quiz_url = reverse('play-quiz') + '?skill=beginner'
+    attempt = client.get(quiz_url).context['attempt']
+    with monkeypatch.context() as patch:
+        patch.setattr('quiz.scoring.add_to_statistic', lambda *args: 1 / 0)       # the score can't be written
+        with pytest.raises(ZeroDivisionError):
+            client.post(quiz_url, data={'attempt': attempt.id})
+    assert QuizAttempt.objects.get(id=attempt.id).submitted_at is None         # the claim was rolled back with the score
+
+    assert client.post(quiz_url, data={'attempt': attempt.id}).status_code == 200
+    assert Leaderboard.objects.count() == 1
+
+
+
+@pytest.mark.django_db
+def test_play_quiz_attempt_of_other_user(client, create_user, create_math_quiz_questions):
+    other = create_user('student2', 'password123', 'student')
+    attempt = QuizAttempt.objects.create(user=other, difficulty='beginner', question_ids=[q.id for q in create_math_quiz_questions])
+    create_user('student', 'password123', 'student')
+    client.login(username='student', password='password123')
+
+    submission = client.post(reverse('play-quiz'), data={'attempt': attempt.id})
+
+    assert submission.status_code == 302
+    assert Leaderboard.objects.count() == 0
+
+
+
+@pytest.mark.django_db
+def test_play_quiz_malformed_attempt(client, create_user):
+    create_user('student', 'password123', 'student')
+    client.login(username='student', password='password123')
+    for value in ['abc', '1.5', '']:
+        response = client.post(reverse('play-quiz'), data={'attempt': value})        # treated like an unknown attempt, not a server error
+        assert response.url == reverse('skills-page')
+    assert client.post(reverse('play-quiz')).url == reverse('skills-page')
+
+
+
+@pytest.mark.django_db
+def test_play_quiz_unknown_difficulty(client, create_user):
+    create_user('student', 'password123', 'student')
+    client.login(username='student', password='password123')
+    assert client.get(reverse('play-quiz')).url == reverse('skills-page')
+    assert client.get(reverse('play-quiz'), {'skill': 'foo', 'generated': 1}).url == reverse('skills-page')
+    assert QuizAttempt.objects.count() == 0
+
+
+
+@pytest.mark.django_db
+def test_leaderboard_constant_query_count(client, create_user, django_assert_num_queries, settings):     # the page costs one query no matter how many rows the table has
+    settings.LEADERBOARD_PAGE_SIZE = 10
+    user = create_user('user1', 'password123', 'student')
+
+    for rows in [5, 50, 500]:
+        Leaderboard.objects.bulk_create([Leaderboard(user=user, score=i * 10, difficulty='beginner') for i in range(rows)])
+        cache.clear()                               # measure rendering the page, not the page cache
+        with django_assert_num_queries(1):
+            response = client.get(reverse('leaderboard'))
+        assert response.status_code == 200
+
+
+
+@pytest.mark.django_db
+def test_leaderboard_keyset_pagination(client, create_user, settings):
+    settings.LEADERBOARD_PAGE_SIZE = 2
+    user = create_user('user1', 'password123', 'student')
+    entries = [Leaderboard.objects.create(user=user, score=score, difficulty='beginner') for score in [50, 40, 40, 30, 10]]
+    Leaderboard.objects.create(user=user, score=100, difficulty='medium')
+
+    seen = []
+    url = reverse('leaderboard') + '?difficulty=beginner'
+    while True:
+        response = client.get(url)
+        seen += [score.id for score in response.context['scores']]
+        if not response.context['next_cursor']:
+            break
+        url = reverse('leaderboard') + '?difficulty=beginner&after=' + response.context['next_cursor']
+
+    expected = sorted(entries, key=lambda entry: (-entry.score, -entry.id))
+    assert seen == [entry.id for entry in expected]                  # every beginner row exactly once, ties on the score included
+
+
+
+@pytest.mark.django_db
+def test_participants_query_count(client, create_user, django_assert_num_queries):      # one count and one page query, whatever the number of participants, after the session, the user and the profile
+    teacher = create_user('teacher1', 'password123', 'teacher')
+    client.login(username='teacher1', password='password123')
+    for i in range(20):
+        student = User.objects.create(username='student%d' % i)
+        Statistic.objects.create(user=student, score_sum=50 * (i + 1), entries=i + 1, difficulty=['beginner', 'medium', 'advanced', 'human_calculator'][i % 4])
+    with django_assert_num_queries(5):
+        response = client.get(reverse('participants'))
+
+    assert response.status_code == 200
+    assert sum(len(section['stats']) for section in response.context['sections']) == 20
+
+
+
+@pytest.mark.django_db
+def test_participants_pages_and_sorting(client, create_user, settings):
+    settings.PARTICIPANTS_PAGE_SIZE = 2
+    create_user('teacher1', 'password123', 'teacher')
+    client.login(username='teacher1', password='password123')
+    for name, score_sum, entries in [('anna', 90, 1), ('ben', 120, 4), ('carl', 70, 1), ('dora', 160, 2)]:
+        Statistic.objects.create(user=User.objects.create(username=name), score_sum=score_sum, entries=entries, difficulty='beginner')
+    Statistic.objects.create(user=User.objects.create(username='eve'), score_sum=10, entries=1, difficulty='medium')
+
+    response = client.get(reverse('participants'), {'sort': 'average', 'beginner_page': 2})
+    beginner, medium = response.context['sections'][:2]
+
+    assert [stat['user__username'] for stat in beginner['stats']] == ['carl', 'ben']     # averages 90, 80 | 70, 30
+    assert [stat['average'] for stat in beginner['stats']] == [70, 30]
+    assert beginner['num_pages'] == 2
+    assert [stat['user__username'] for stat in medium['stats']] == ['eve']               # the other difficulties stay on their first page
+    assert beginner['previous_url'] == '?sort=average'
+    assert beginner['next_url'] is None
+
+    response = client.get(reverse('participants'), {'sort': 'entries'})
+    assert [stat['user__username'] for stat in response.context['sections'][0]['stats']] == ['ben', 'dora']
+
+
+
+@pytest.mark.django_db
+def test_participants_links_keep_only_known_parameters(client, create_user, settings):     # the page is cached for every request with the same sort and pages
+    settings.PARTICIPANTS_PAGE_SIZE = 1
+    create_user('teacher1', 'password123', 'teacher')
+    client.login(username='teacher1', password='password123')
+    for name in ['anna', 'ben', 'carl']:
+        Statistic.objects.create(user=User.objects.create(username=name), score_sum=50, entries=1, difficulty='medium')
+
+    response = client.get(reverse('participants'), {'medium_page': 2, 'next': '"><script>alert(1)</script>', 'beginner_page': 7})
+    medium = response.context['sections'][1]
+    assert (medium['previous_url'], medium['next_url']) == ('?sort=user', '?sort=user&medium_page=3')
+    assert 'alert' not in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_quiz_views_under_asgi(create_user, create_math_quiz_questions):      # play_quiz, leaderboard and participants are async views, this runs them through the ASGI request path
+    student = create_user('student', 'password123', 'student')
+    client = AsyncClient()
+
+    async def play():
+        await client.aforce_login(student)
+        quiz_url = reverse('play-quiz') + '?skill=beginner'
+        attempt = (await client.get(quiz_url)).context['attempt']
+        answers = {'attempt': attempt.id}
+        for question in create_math_quiz_questions:
+            answers['q%d' % question.id] = question.ans
+        submission = await client.post(quiz_url, data=answers)
+        board = await client.get(reverse('leaderboard'))
+        return submission, board
+
+    submission, board = async_to_sync(play)()
+
+    assert 'Correct answers: 4' in submission.content.decode()
+    assert 'student' in board.content.decode()
+    assert Statistic.objects.get(user=student, difficulty='beginner').average == 100
@@ -0,0 +1,190 @@
+import json
+import os
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import OperationalError
+from django.urls import reverse
+from .. import writebehind
+from ..models import Profile, QuesModel, Leaderboard, Statistic, QuizAttempt
+from ..scoring import record_submission
+from ..versions import get_version
+from ..writebehind import SubmissionBuffer, process_alive
+
+
+@pytest.fixture
+def buffer(settings, monkeypatch):          # a buffer without its background thread, the tests flush it themselves
+    settings.SUBMISSION_BUFFER = True
+    buffer = SubmissionBuffer(rows=100)
+    monkeypatch.setattr(writebehind, '_buffer', buffer)
+    return buffer
+
+
+def dead_pid():
+    pid = 4000000
+    while process_alive(pid):
+        pid -= 1
+    return pid
+
+
+@pytest.mark.django_db
+def test_submissions_written_on_flush(buffer, django_capture_on_commit_callbacks):
+    first = User.objects.create(username='first')
+    second = User.objects.create(username='second')
+    record_submission(first, 'beginner', 80, 80)
+    record_submission(first, 'beginner', 40, 40)
+    record_submission(second, 'medium', 100, 100)
+    assert Leaderboard.objects.count() == 0            # only queued so far
+    version = get_version('leaderboard', 'beginner')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert buffer.flush() == 3
+
+    assert sorted(Leaderboard.objects.values_list('user__username', 'score')) == [('first', 40), ('first', 80), ('second', 100)]
+    statistic = Statistic.objects.get(user=first, difficulty='beginner')
+    assert (statistic.entries, statistic.score_sum) == (2, 120)
+    assert Statistic.objects.get(user=second).entries == 1
+    assert get_version('leaderboard', 'beginner') != version         # bulk_create sends no signals, the flush bumps the versions
+    assert buffer.flush() == 0
+
+
+@pytest.mark.django_db
+def test_flush_adds_to_existing_statistic(buffer):
+    user = User.objects.create(username='player')
+    Statistic.objects.create(user=user, difficulty='advanced', score_sum=50, entries=1)
+    record_submission(user, 'advanced', 100, 100)
+    buffer.flush()
+    statistic = Statistic.objects.get(user=user)
+    assert (statistic.entries, statistic.score_sum) == (2, 150)
+
+
+@pytest.mark.django_db
+def test_play_quiz_shows_score_before_flush(buffer, client):
+    user = User.objects.create_user(username='student', password='password123')
+    Profile.objects.create(user=user, user_type='student')
+    client.login(username='student', password='password123')
+    question = QuesModel.objects.create(question='What is 2 + 2?', op1='3', op2='4', op3='5', op4='6', ans='4', difficulty='beginner')
+    attempt = QuizAttempt.objects.create(user=user, difficulty='beginner', question_ids=[question.id])
+
+    response = client.post(reverse('play-quiz'), data={'attempt': attempt.id, 'q%d' % question.id: '4'})
+
+    assert 'Correct answers: 1' in response.content.decode()
+    assert 'ranks you #1 of 1 players' in response.content.decode()
+    assert Leaderboard.objects.count() == 0
+    buffer.flush()
+    assert Leaderboard.objects.get().score == 10
+
+
+@pytest.mark.django_db
+def test_failed_flush_keeps_results(buffer, monkeypatch):
+    user = User.objects.create(username='player')
+    record_submission(user, 'beginner', 60, 60)
+
+    def locked(submissions):
+        raise OperationalError('database is locked')
+    monkeypatch.setattr(writebehind, 'record_submissions', locked)
+    with pytest.raises(OperationalError):
+        buffer.flush()
+    assert buffer.pending == [[user.id, 'beginner', 60, 60, None, None]]
+
+    monkeypatch.undo()
+    buffer.flush()
+    assert Leaderboard.objects.get().score == 60
+
+
+@pytest.mark.django_db(transaction=True)
+def test_invalid_row_does_not_block_the_batch(tmp_path):
+    user = User.objects.create(username='player')
+    gone = User.objects.create(username='gone')
+    buffer = SubmissionBuffer(tmp_path)
+    buffer.add(user.id, 'beginner', 30, 30)
+    buffer.add(gone.id, 'beginner', 40, 40)
+    buffer.add(user.id, 'beginner', 50, 50)
+    gone_id = gone.id
+    gone.delete()                                       # deleted while the result was queued: the whole batch fails on its foreign key
+
+    assert buffer.flush() == 2
+    assert sorted(Leaderboard.objects.values_list('score', flat=True)) == [30, 50]
+    assert buffer.pending == []
+    assert os.path.getsize(buffer.path) == 0
+    with open(tmp_path / ('failed-submissions-%d.jsonl' % os.getpid())) as file:
+        assert [json.loads(line) for line in file] == [[gone_id, 'beginner', 40, 40, None, None]]
+
+
+def test_flush_thread_survives_errors(monkeypatch):
+    buffer = SubmissionBuffer(interval=0.01)
+    calls = []
+
+    def broken():
+        calls.append(1)
+        if len(calls) >= 3:
+            buffer.stopped = True
+        raise RuntimeError('broken signal handler')
+    monkeypatch.setattr(buffer, 'flush', broken)
+    buffer.run()                                        # returns only because it was stopped, not on the first error
+    assert len(calls) == 3
+
+
+def test_full_buffer_wakes_the_flush():
+    buffer = SubmissionBuffer(rows=2)
+    buffer.add(1, 'beginner', 10, 10)
+    assert not buffer.wakeup.is_set()
+    buffer.add(1, 'beginner', 20, 20)
+    assert buffer.wakeup.is_set()
+
+
+@pytest.mark.django_db
+def test_spool_file_is_kept_in_sync(tmp_path):
+    user = User.objects.create(username='player')
+    buffer = SubmissionBuffer(tmp_path)
+    buffer.add(user.id, 'beginner', 30, 30)
+    with open(buffer.path) as file:
+        assert [json.loads(line) for line in file] == [[user.id, 'beginner', 30, 30, None, None]]     # on disk before record_submission returns
+
+    buffer.flush()
+    assert os.path.getsize(buffer.path) == 0
+    buffer.stop()
+    assert not os.path.exists(buffer.path)
+
+
+@pytest.mark.django_db
+def test_spool_of_crashed_process_is_recovered(tmp_path, settings):
+    settings.SUBMISSION_BUFFER_SPOOL_DIR = str(tmp_path)
+    user = User.objects.create(username='player')
+    with open(tmp_path / ('submissions-%d.jsonl' % dead_pid()), 'w') as file:
+        file.write(json.dumps([user.id, 'medium', 70, 70]) + '\n')
+        file.write(json.dumps([user.id, 'medium', 90, 90]) + '\n')
+        file.write('[%d, "med' % user.id)                          # cut off by the crash
+
+    call_command('flush_submissions', stdout=open(os.devnull, 'w'))
+
+    assert sorted(Leaderboard.objects.values_list('score', flat=True)) == [70, 90]
+    assert Statistic.objects.get(user=user).entries == 2
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.django_db
+def test_spool_of_running_process_is_left_alone(tmp_path):
+    path = tmp_path / ('submissions-%d.jsonl' % os.getppid())
+    path.write_text(json.dumps([1, 'medium', 70, 70]) + '\n')
+
+    buffer = SubmissionBuffer(tmp_path)
+    assert buffer.pending == []
+    assert path.exists()
+    buffer.stop()
+
+
+@pytest.mark.django_db
+def test_result_page_counts_the_queued_score(buffer, client):
+    user = User.objects.create_user(username='student', password='password123')
+    Profile.objects.create(user=user, user_type='student')
+    other = User.objects.create(username='other')
+    record_submission(other, 'beginner', 0, 0)
+    buffer.flush()
+    question = QuesModel.objects.create(question='What is 2 + 2?', op1='3', op2='4', op3='5', op4='6', ans='4', difficulty='beginner')
+    client.login(username='student', password='password123')
+    client.get(reverse('play-quiz'), {'skill': 'beginner'})
+    attempt = QuizAttempt.objects.get(user=user)
+
+    response = client.post(reverse('play-quiz'), {'attempt': attempt.id, 'q%d' % question.id: '4'})
+    assert (response.context['beaten'], response.context['score_rank'], response.context['scores_count']) == (50, 1, 2)
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth.views import LoginView,LogoutView
-from . import views
+from . import views, metrics, api
 from mathchallenger import settings
 from django.shortcuts import redirect, render
 
@@ -15,6 +15,10 @@ urlpatterns = [
     path('play_quiz/', views.play_quiz, name='play-quiz'),
     path('leaderboard/', views.leaderboard, name='leaderboard'),
     path('teachersite/',views.teachersite, name='teachersite'),
-    path('participants/',views.participants, name='participants')
+    path('teachersite/search/', views.question_search, name='question-search'),
+    path('teachersite/questions/', views.question_stats, name='question-stats'),
+    path('participants/',views.participants, name='participants'),
+    path('metrics', metrics.metrics_view, name='metrics'),
+    path('api/quiz/', api.quiz, name='api-quiz'),
 ]
 
@@ -0,0 +1,53 @@
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+# Version stamps are small values kept in the cache, one per kind of data and difficulty.
+# A stamp changes whenever a row of that kind is written, so anything derived from the
+# table (id indexes, rendered pages, ...) can be reused for as long as the stamp is unchanged.
+# The stamps are only seen by all worker processes with a shared cache backend (checked in quiz/checks.py).
+# They are kept in the 'versions' cache if settings.CACHES has one, apart from the pages and sessions: a stamp
+# dropped by a full cache is replaced by a new one, which re-renders its pages and re-reads the roles it stamps.
+
+PER_PROCESS_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache')
+
+def versions_cache():            # the alias of the cache that keeps the stamps
+    return 'versions' if 'versions' in settings.CACHES else 'default'
+
+
+def _key(kind, difficulty):
+    return 'quiz:version:%s:%s' % (kind, difficulty)
+
+
+def get_version(kind, difficulty):
+    cache = caches[versions_cache()]
+    version = cache.get(_key(kind, difficulty))
+    if version is None:
+        version = time.time_ns()                            # nothing stored yet (or evicted), start a new stamp
+        if not cache.add(_key(kind, difficulty), version, None):
+            version = cache.get(_key(kind, difficulty), version)
+    return version
+
+
+async def aget_version(kind, difficulty):
+    cache = caches[versions_cache()]
+    version = await cache.aget(_key(kind, difficulty))
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(_key(kind, difficulty), version, None):
+            version = await cache.aget(_key(kind, difficulty), version)
+    return version
+
+
+def bump_version(kind, difficulty):
+    caches[versions_cache()].set(_key(kind, difficulty), time.time_ns(), None)
+
+
+def bump_version_on_commit(kind, difficulty):             # readers must not cache the old rows under the new stamp, so bump after the commit
+    transaction.on_commit(lambda: bump_version(kind, difficulty))
+
+
+def versions_shared():             # False if a stamp bumped in one worker process is not seen by the others
+    return settings.CACHES[versions_cache()]['BACKEND'] not in PER_PROCESS_BACKENDS
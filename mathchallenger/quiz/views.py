@@ -1,14 +1,31 @@
 from django.shortcuts import render, redirect
-from django.http import HttpResponse
+from django.http import HttpResponse, QueryDict
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
 from django.contrib.auth.models import User
-from .models import Profile,Leaderboard,QuesModel,Statistic
+from django.db import IntegrityError, transaction
+from django.db.models import Q, F, Count, Window
+from django.db.models.functions import RowNumber
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from .models import Profile,Leaderboard,QuesModel,Statistic,QuizAttempt,PeriodScore
+from .sampling import asample_questions, asample_adaptive_questions, quiz_length
+from .scoring import aopen_attempt, submit_attempt, grade
+from .versions import aget_version
+from .caching import cached_page
+from .ranking import player_position
+from .search import search_questions
+from .analytics import hardest_questions, easiest_questions
+from .periods import PERIODS, ALL, period_starts, period_stamp
+from .histograms import score_position
+from .roles import user_role, require_role
+from .ratings import ADAPTIVE
+from .generator import generate_questions, answer_key, LEVELS
 import random
 
 
 def home(request):
-    return render(request,'quiz/landingpage.html')
+    return render(request,'quiz/landingpage.html', {'role': user_role(request)})
 
 
 def register(request):
@@ -33,135 +50,284 @@ def register(request):
 
 
 
+@require_role('student', 'teacher')
 def skills(request):
-    if request.user.profile.user_type == 'teacher':
+    if request.role == 'teacher':
         return redirect('teachersite')
     return render(request, 'quiz/skills.html')
 
 
+@require_role('teacher')                # Only teachers can add questions
 def add_question(request):
-    if request.user.profile.user_type != 'teacher':     # Only teachers can add questions
-        return redirect('landing-page')
-
     error_message= []
     if request.method == 'POST':
-        wrong_answer= False
-        empty_field = False
-        
-        question=request.POST['question']
-        op1=request.POST['op1']
-        op2=request.POST['op2']
-        op3=request.POST['op3']
-        op4=request.POST['op4']
-        ans=request.POST['ans']
-
-        if ans not in [op1,op2,op3,op4]:
-            wrong_answer = True                                # if teacher's answer doesn't match any options, display an error
-        
-        for field in [question,op1,op2,op3,op4]:
-            if field == '':
-                empty_field = True                             # if an empty field is entered, display an error
-        
-        if wrong_answer:
-            error_message.append('Submitted answer must match an option!')
-        if empty_field:
-            error_message.append('Please enter values for all fields!')
+        question = QuesModel(
+        question=request.POST['question'],
+        op1=request.POST['op1'],
+        op2=request.POST['op2'],
+        op3=request.POST['op3'],
+        op4=request.POST['op4'],
+        ans=request.POST['ans'],
+        difficulty=request.POST['difficulty']
+        )
+        error_message = question.validation_errors()           # the answer has to match an option and no field may be empty
 
         if len(error_message) == 0:
-            question = QuesModel(
-            question=request.POST['question'],
-            op1=request.POST['op1'],
-            op2=request.POST['op2'],
-            op3=request.POST['op3'],
-            op4=request.POST['op4'],
-            ans=request.POST['ans'],
-            difficulty=request.POST['difficulty']
-            )
-            question.save()
-            return redirect('teachersite')   # if the question was entered successfully, save the question to the database
+            try:
+                with transaction.atomic():
+                    question.save()
+            except IntegrityError:                                      # the content_hash is unique
+                error_message = ['This question already exists!']
+            else:
+                return redirect('teachersite')   # if the question was entered successfully, save the question to the database
 
                 
     return render(request, 'quiz/add_question.html', {'errors':error_message})
 
 
 
-def play_quiz(request):
-    if request.user.profile.user_type != 'student':
-        return redirect('landing-page')
-
+@require_role('student')
+async def play_quiz(request):
+    user = await request.auser()
     skill = request.GET.get('skill')
-    questions = list(QuesModel.objects.filter(difficulty=skill))          # After selecting difficulty, retrieve all questions for that difficulty in random order
-    
-    random.shuffle(questions)
 
     if request.method == 'POST':
+        attempt = await aopen_attempt(user, request.POST.get('attempt'))
+        if attempt is None:
+            return redirect('skills-page')          # unknown attempt or an attempt that was already submitted
+        skill = attempt.difficulty
 
-        score = 0
-        wrong = 0
-        correct = 0
-        total = 0
-        for q in questions:
-            total += 1
-            selected_answer = request.POST.get(q.question)
-
-            if q.ans == selected_answer:
-                score += 10
-                correct += 1
-            else:
-                wrong += 1
+        if attempt.seed is not None:
+            answers = answer_key(skill, attempt.seed, len(attempt.question_ids))       # generated quizzes are graded from the seed alone
+        else:
+            answers = {pk: ans async for pk, ans in QuesModel.objects.filter(id__in=attempt.question_ids).values_list('id', 'ans')}     # one fetch of just the drawn rows
+        selected = {question_id: request.POST.get('q%d' % question_id) for question_id in attempt.question_ids}
+        score, correct, wrong, total, outcomes = grade(attempt.question_ids, answers, selected)
+        if attempt.seed is not None:
+            outcomes = [(None, right) for question_id, right in outcomes]          # generated questions have no rating of their own
+        if total == 0:
+            return redirect('skills-page')
         percent = (score/total) * 10
+        seconds = (attempt.submitted_at - attempt.started_at).total_seconds()          # measured on the server from the stored start time
         context = {
             'score': score,
             'percent': round(percent),
-            'time': request.POST.get('timer', 0),               # retrieve the total time from the JS timer (return 0 if error happens)
+            'time': round(seconds),
             'correct': correct,
             'wrong': wrong,
             'total': total
 
         }
-        stats = Leaderboard(user=request.user,score=score,difficulty=skill)
-        stats.save()
-
-        try:
-            x = Statistic.objects.get(user=request.user,difficulty=skill)                                      # If the player has played the quiz before, retrieve the stats
-        except Statistic.DoesNotExist:
-            statistics = Statistic(user=request.user, average=percent, entries=1, difficulty= skill)           # If it's the player's first quiz, make a new Statistics object with entry set to 1
-            statistics.save()
-        else:
-            x.average = (x.average + percent)//2                                                               # update the player's previous stats, if they played before
-            x.entries += 1
-            x.save()
-        finally:
-            return render(request, 'quiz/statistics.html', context)
-
-    context = {'questions': questions, 'difficulty': skill}
+        if not await sync_to_async(submit_attempt)(attempt, user, score, percent, outcomes, seconds):     # mark the attempt as submitted, save the score to the leaderboard, update the player's statistic and ratings and log the answers (one transaction, which the async ORM can't run)
+            return redirect('skills-page')          # a concurrent request submitted the same attempt first
+        context['rank'], context['players'] = await sync_to_async(player_position)(skill, user.id)
+        context['beaten'], context['score_rank'], context['scores_count'] = await sync_to_async(score_position)(skill, score, settings.SUBMISSION_BUFFER and skill != ADAPTIVE)     # from the score histogram, no COUNT over the Leaderboard
+        context['rating'] = await Profile.objects.filter(user_id=user.id).values_list('rating', flat=True).afirst()
+        return render(request, 'quiz/statistics.html', context)
+
+    if skill not in dict(QuesModel.SELECTION) and skill != ADAPTIVE:
+        return redirect('skills-page')                  # no attempt for a missing or unknown difficulty
+    if skill == ADAPTIVE:
+        rating = await Profile.objects.filter(user_id=user.id).values_list('rating', flat=True).afirst()
+        questions = await asample_adaptive_questions(rating, quiz_length(skill))        # questions near the student's rating
+        attempt = await QuizAttempt.objects.acreate(user=user, difficulty=skill, question_ids=[q.id for q in questions])
+    elif request.GET.get('generated') and skill in LEVELS:
+        seed = random.randrange(2 ** 62)
+        questions = generate_questions(skill, seed, quiz_length(skill))     # arithmetic questions generated on the fly
+        attempt = await QuizAttempt.objects.acreate(user=user, difficulty=skill, seed=seed, question_ids=[q['id'] for q in questions])
+    else:
+        questions = await asample_questions(skill)                  # draw a random quiz of the configured length for the selected difficulty
+        attempt = await QuizAttempt.objects.acreate(user=user, difficulty=skill, question_ids=[q.id for q in questions])
+    context = {'questions': questions, 'difficulty': skill, 'attempt': attempt}
     return render(request, 'quiz/play_quiz.html', context=context)
 
 
 
 
-def leaderboard(request):
-    scores = Leaderboard.objects.order_by('-score')                         # retrieve the Leaderboard scores in decreasing order
-    return render(request, 'quiz/leaderboard.html', {'scores': scores})
+async def leaderboard(request):
+    difficulty = request.GET.get('difficulty')
+    if difficulty not in dict(QuesModel.SELECTION):
+        difficulty = None
+    period = request.GET.get('period')
+    if period not in PERIODS:
+        period = None                                                       # all-time leaderboard
+    cursor = parse_cursor(request.GET.get('after'))
+
+    versions = [await aget_version('leaderboard', difficulty or 'all')]      # changes when a score of this difficulty is saved
+    start = period_starts()[period] if period else None
+    if start:
+        versions.append(period_stamp(start))                                # a new day or week gets its own page, ETag and Last-Modified
+    page = 'leaderboard:%s:%s:%s' % (difficulty, period, '%d_%d' % cursor if cursor else '')
+    return await cached_page(page, versions, lambda: render_leaderboard(request, difficulty, period, start, cursor), request)
+
+
+async def render_leaderboard(request, difficulty, period, start, cursor):
+    if period:
+        scores = (PeriodScore.objects.select_related('user').filter(period=period, start=start, difficulty=difficulty or ALL)
+                  .annotate(score=F('best')).order_by('-best', '-id'))     # the best score of every player in the period, from the periodscore_best index
+        score_field = 'best'
+    else:
+        scores = Leaderboard.objects.select_related('user').order_by('-score', '-id')     # retrieve the Leaderboard scores in decreasing order, the id breaks ties
+        score_field = 'score'
+        if difficulty:
+            scores = scores.filter(difficulty=difficulty)
+
+    if cursor:
+        after_score, after_id = cursor
+        scores = scores.filter(Q(**{score_field + '__lt': after_score}) | Q(**{score_field: after_score, 'id__lt': after_id}))     # keyset pagination: seek past the last row of the previous page
+
+    page_size = settings.LEADERBOARD_PAGE_SIZE
+    page = [score async for score in scores[:page_size + 1]]         # one extra row tells us if there is a next page
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = '%d_%d' % (page[-1].score, page[-1].id)
+
+    context = {
+        'scores': page,
+        'difficulty': difficulty,
+        'difficulties': QuesModel.SELECTION,
+        'period': period,
+        'periods': PeriodScore.PERIODS,
+        'next_cursor': next_cursor,
+        'is_first_page': cursor is None,
+    }
+    return render(request, 'quiz/leaderboard.html', context)
+
+
+def parse_cursor(value):                    # a cursor looks like '<score>_<id>', anything else starts from the first page
+    try:
+        score, pk = value.split('_')
+        return int(score), int(pk)
+    except (AttributeError, ValueError):
+        return None
 
 
+@require_role('teacher')
 def teachersite(request):
     return render(request,'quiz/teachersite.html')
 
 
+@require_role('teacher')
+def question_search(request):                         # teachers look up existing questions before adding new ones
+    text = request.GET.get('q', '')
+    difficulty = request.GET.get('difficulty')
+    if difficulty not in dict(QuesModel.SELECTION):
+        difficulty = None
+    page = positive_int(request.GET.get('page'))
+    questions, has_next = search_questions(text, difficulty, page, settings.SEARCH_PAGE_SIZE)
+
+    query = request.GET.copy()
+    query['page'] = page + 1
+    next_url = '?' + query.urlencode() if has_next else None
+    query['page'] = page - 1
+    previous_url = '?' + query.urlencode() if page > 1 else None
+    context = {
+        'questions': questions,
+        'q': text,
+        'difficulty': difficulty,
+        'difficulties': QuesModel.SELECTION,
+        'page': page,
+        'next_url': next_url,
+        'previous_url': previous_url,
+    }
+    return render(request, 'quiz/question_search.html', context)
 
-def participants(request):                                      # show all quiz participants for each difficulty
-    statistics = Statistic.objects.all()
-    beginner_stats = statistics.filter(difficulty='beginner')
-    medium_stats = statistics.filter(difficulty='medium')
-    advanced_stats = statistics.filter(difficulty='advanced')
-    human_calculator_stats = statistics.filter(difficulty='human_calculator')
 
+@require_role('teacher')
+def question_stats(request):                           # the counters are kept by the rollup_answers command, the log is not read here
+    difficulty = request.GET.get('difficulty')
+    if difficulty not in dict(QuesModel.SELECTION):
+        difficulty = None
     context = {
-        'beginner_stats': beginner_stats,
-        'medium_stats': medium_stats,
-        'advanced_stats': advanced_stats,
-        'human_calculator_stats': human_calculator_stats
+        'tables': [
+            ('Hardest questions', hardest_questions(difficulty, settings.QUESTION_STATS_ROWS)),
+            ('Easiest questions', easiest_questions(difficulty, settings.QUESTION_STATS_ROWS)),
+        ],
+        'difficulty': difficulty,
+        'difficulties': QuesModel.SELECTION,
+        'min_attempts': settings.QUESTION_STATS_MIN_ATTEMPTS,
+    }
+    return render(request, 'quiz/question_stats.html', context)
+
+
+
+PARTICIPANT_ORDERS = {                                         # sorting options of the participants tables, the id keeps the order stable
+    'user': [F('user__username').asc(), F('id').asc()],
+    'average': [F('average_score').desc(), F('id').asc()],
+    'entries': [F('entries').desc(), F('id').asc()],
+}
+
+
+@require_role('teacher')
+async def participants(request):                                      # show all quiz participants for each difficulty
+    sort = request.GET.get('sort')
+    if sort not in PARTICIPANT_ORDERS:
+        sort = 'user'
+    requested_pages = [positive_int(request.GET.get(difficulty + '_page')) for difficulty, label in QuesModel.SELECTION]
+
+    versions = [await aget_version('statistics', difficulty) for difficulty, label in QuesModel.SELECTION]     # the page shows the statistics of every difficulty
+    page = 'participants:%s:%s' % (sort, ','.join(str(number) for number in requested_pages))
+    return await cached_page(page, versions, lambda: render_participants(request, sort, requested_pages), request)
+
+
+async def render_participants(request, sort, requested_pages):
+    page_size = settings.PARTICIPANTS_PAGE_SIZE
+
+    counts = {difficulty: rows async for difficulty, rows in Statistic.objects.values_list('difficulty').annotate(rows=Count('id'))}     # number of participants per difficulty, for the page links
+
+    pages = {}
+    page_filter = Q()
+    for (difficulty, label), requested_page in zip(QuesModel.SELECTION, requested_pages):
+        num_pages = max(1, -(-counts.get(difficulty, 0) // page_size))
+        page = min(requested_page, num_pages)
+        pages[difficulty] = (page, num_pages)
+        page_filter |= Q(difficulty=difficulty, row__gt=(page - 1) * page_size, row__lte=page * page_size)
+
+    rows = (Statistic.objects
+            .annotate(average_score=F('score_sum') / F('entries'))
+            .annotate(row=Window(RowNumber(), partition_by=F('difficulty'), order_by=PARTICIPANT_ORDERS[sort]))
+            .filter(page_filter)                                 # one query returns the requested page of every difficulty
+            .order_by('difficulty', 'row')
+            .values('difficulty', 'user__username', 'average_score', 'entries'))
+
+    stats = {difficulty: [] for difficulty, label in QuesModel.SELECTION}
+    async for row in rows:
+        row['average'] = round(row['average_score'])
+        stats[row['difficulty']].append(row)
+
+    sections = []
+    for difficulty, label in QuesModel.SELECTION:
+        page, num_pages = pages[difficulty]
+        sections.append({
+            'label': label,
+            'stats': stats[difficulty],
+            'page': page,
+            'num_pages': num_pages,
+            'previous_url': page_url(sort, pages, difficulty, page - 1) if page > 1 else None,
+            'next_url': page_url(sort, pages, difficulty, page + 1) if page < num_pages else None,
+        })
+
+    context = {
+        'sections': sections,
+        'sort': sort,
     }
 
     return render(request, 'quiz/participants.html', context)
+
+
+def positive_int(value, default=1):
+    try:
+        return max(int(value), 1)
+    except (TypeError, ValueError):
+        return default
+
+
+def page_url(sort, pages, difficulty, page):        # keep the sorting and the pages of the other difficulties when switching one page
+    query = QueryDict(mutable=True)                 # only the known parameters, the page is cached for every request with the same ones
+    query['sort'] = sort
+    for other, (other_page, num_pages) in pages.items():
+        number = page if other == difficulty else other_page
+        if number > 1:
+            query[other + '_page'] = number
+    return '?' + query.urlencode()
@@ -0,0 +1,201 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+from django.conf import settings
+from django.db import OperationalError
+from .scoring import record_submissions
+
+
+# Opt-in write-behind of quiz results (settings.SUBMISSION_BUFFER). record_submission only queues the result,
+# and a background thread writes the queue with record_submissions() every SUBMISSION_BUFFER_INTERVAL seconds,
+# or as soon as SUBMISSION_BUFFER_ROWS results are queued. A burst of submissions then costs one write
+# transaction per flush instead of one per quiz, which is what SQLite's single writer lock needs.
+#
+# With SUBMISSION_BUFFER_SPOOL_DIR, every queued result is also appended to a spool file of the process
+# (submissions-<pid>.jsonl) before the request returns. The file is emptied after each flush. A process that
+# starts picks up the spool files of processes that are gone, so results survive a crash of the process.
+# A crash between the commit of a flush and emptying the spool can write that batch twice.
+#
+# A flush that fails with an OperationalError (e.g. "database is locked") keeps its batch queued for the next flush.
+# Any other error means a row can't be written at all (e.g. its user was deleted meanwhile), so the rows of the
+# batch are written one by one and those that still fail are logged and appended to failed-submissions-<pid>.jsonl
+# in the spool directory, where they can be looked at, instead of blocking all later results.
+
+logger = logging.getLogger(__name__)
+
+
+class SubmissionBuffer:
+    def __init__(self, spool_dir=None, rows=500, interval=0.5):
+        self.rows = rows
+        self.interval = interval
+        self.lock = threading.Lock()                # guards pending and the spool file
+        self.flush_lock = threading.Lock()          # one flush at a time
+        self.wakeup = threading.Event()
+        self.stopped = False
+        self.thread = None
+        self.pending = []
+        self.spool = None
+        self.path = None
+        if spool_dir:
+            os.makedirs(spool_dir, exist_ok=True)
+            self.path = os.path.join(spool_dir, 'submissions-%d.jsonl' % os.getpid())
+            recovered, claimed = recover_spools(spool_dir)
+            self.pending = read_spool(self.path) + recovered        # our own leftovers (a process with the same pid) and those of dead processes
+            self.spool = open(self.path, 'a')
+            self.rewrite_spool()
+            for path in claimed:
+                os.remove(path)                     # only now, the recovered results are in our own spool
+
+    def add(self, user_id, difficulty, score, percent, outcomes=None, seconds=None):
+        entry = [user_id, difficulty, score, percent, outcomes, seconds]
+        with self.lock:
+            if self.spool is not None:
+                self.spool.write(json.dumps(entry) + '\n')
+                self.spool.flush()                  # in the operating system before the response is sent, so a crash of the process loses nothing
+            self.pending.append(entry)
+            full = len(self.pending) >= self.rows
+        if full:
+            self.wakeup.set()
+
+    def flush(self):                # writes everything queued so far, returns the number of results written
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, []
+            if not batch:
+                return 0
+            try:
+                record_submissions(batch)
+                written = len(batch)
+            except OperationalError:
+                self.requeue(batch)                 # kept queued (and spooled) for the next flush
+                raise
+            except Exception:
+                logger.exception('Writing %d queued quiz results failed, writing them one by one', len(batch))
+                written = self.write_one_by_one(batch)
+            with self.lock:
+                self.rewrite_spool()
+            return written
+
+    def write_one_by_one(self, batch):      # so that one bad row can't hold back the others
+        written = 0
+        for position, entry in enumerate(batch):
+            try:
+                record_submissions([entry])
+                written += 1
+            except OperationalError:
+                self.requeue(batch[position:])
+                raise
+            except Exception:
+                logger.exception('Dropping the quiz result %s, it can\'t be written', json.dumps(entry))
+                self.write_failed(entry)
+        return written
+
+    def requeue(self, entries):
+        with self.lock:
+            self.pending[:0] = entries
+
+    def write_failed(self, entry):
+        if self.path is None:
+            return                                  # only logged without a spool directory
+        with open(os.path.join(os.path.dirname(self.path), 'failed-submissions-%d.jsonl' % os.getpid()), 'a') as file:
+            file.write(json.dumps(entry) + '\n')
+
+    def rewrite_spool(self):        # the spool keeps only the results that are still queued, called with the lock held
+        if self.spool is None:
+            return
+        with open(self.path + '.tmp', 'w') as file:
+            file.writelines(json.dumps(entry) + '\n' for entry in self.pending)
+        self.spool.close()
+        os.replace(self.path + '.tmp', self.path)
+        self.spool = open(self.path, 'a')
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='submission-buffer', daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)                  # flush on shutdown
+
+    def run(self):
+        while not self.stopped:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception:                       # the thread must keep running, whatever went wrong
+                logger.exception('Writing the queued quiz results failed, trying again with the next flush')
+
+    def stop(self):
+        self.stopped = True
+        self.wakeup.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.flush()
+        if self.spool is not None:
+            self.spool.close()
+            self.spool = None
+            if not self.pending:
+                os.remove(self.path)
+
+
+def read_spool(path):
+    entries = []
+    try:
+        with open(path) as file:
+            for line in file:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    pass                            # the last line of a crashed process can be cut off
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def recover_spools(spool_dir):      # takes over the spool files of processes that are no longer running, returns their results and the claimed files
+    entries = []
+    claimed_paths = []
+    for path in glob.glob(os.path.join(spool_dir, 'submissions-*.jsonl')):
+        try:
+            pid = int(os.path.basename(path)[len('submissions-'):-len('.jsonl')])
+        except ValueError:
+            continue
+        if pid == os.getpid() or process_alive(pid):
+            continue
+        claimed = '%s.recovered-%d' % (path, os.getpid())
+        try:
+            os.rename(path, claimed)                # only one starting process can claim a file
+        except FileNotFoundError:
+            continue
+        entries.extend(read_spool(claimed))
+        claimed_paths.append(claimed)
+    return entries, claimed_paths
+
+
+def process_alive(pid):
+    if os.name != 'posix':
+        return True                                 # without kill(pid, 0), only the spool file of the own pid is recovered
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():               # the buffer of this process, started on first use
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                buffer = SubmissionBuffer(settings.SUBMISSION_BUFFER_SPOOL_DIR, settings.SUBMISSION_BUFFER_ROWS,
+                                          settings.SUBMISSION_BUFFER_INTERVAL)
+                buffer.start()
+                _buffer = buffer
+    return _buffer